@@ -0,0 +1,27 @@
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List
+
+
+class MammographyClassifier(ABC):
+    """Interface every inference backend implements.
+
+    ``classify_batch`` receives image paths as inference hands them over:
+    a cached ``.npy`` array from the preprocess cache, or the stored
+    original when no array is cached (``preprocess.load_array`` reads
+    both). Each result carries ``prediction``, ``confidence``, ``regions``,
+    ``model_version`` and ``image_quality`` (which may be None).
+    ``get_model_info`` must include ``model_version``, the key inference
+    results are cached under.
+    """
+
+    @abstractmethod
+    def classify_batch(self, image_paths: List[str]) -> List[Dict[str, Any]]:
+        """Classify several mammograms, one result per path in order"""
+
+    def classify(self, image_path: str) -> Dict[str, Any]:
+        """Classify a single mammogram"""
+        return self.classify_batch([image_path])[0]
+
+    @abstractmethod
+    def get_model_info(self) -> Dict[str, Any]:
+        """Describe the loaded model"""
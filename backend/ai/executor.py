@@ -0,0 +1,141 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Environment variables honoured by the common native math libraries
+THREAD_ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+)
+
+# Warm-up tasks hold their worker briefly so each process picks one up
+WARM_UP_HOLD = 0.05
+WARM_UP_ROUNDS = 20
+
+# Classifier owned by the current worker process, loaded once by _init_worker
+_worker_classifier = None
+
+
+def _init_worker(factory: Callable[[], Any], threads_per_worker: int) -> None:
+    """Process initializer: pin thread counts, then load the model once"""
+    global _worker_classifier
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(threads_per_worker)
+    started = time.perf_counter()
+    _worker_classifier = factory()
+    logger.info(
+        f"Inference worker {os.getpid()} loaded model in {time.perf_counter() - started:.3f}s "
+        f"({threads_per_worker} threads)"
+    )
+
+
+def _warm_up(hold: float) -> int:
+    """Near no-op task used to force worker start-up; returns the worker pid"""
+    time.sleep(hold)
+    return os.getpid()
+
+
+def _classify_batch(image_paths: List[str]) -> List[Dict[str, Any]]:
+    return _worker_classifier.classify_batch(image_paths)
+
+
+class InferencePool:
+    """Pool of worker processes that each hold a preloaded classifier.
+
+    ``factory`` must be picklable (a class or module-level function) since
+    it is sent to every worker, which calls it once at start-up.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        workers: int = 1,
+        threads_per_worker: int = 1,
+        start_method: str = "spawn"
+    ):
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.factory = factory
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker
+        self.start_method = start_method
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._worker_pids: List[int] = []
+        self._restarts = 0
+
+    @property
+    def running(self) -> bool:
+        return self._pool is not None
+
+    def start(self) -> None:
+        """Spawn all workers and block until each has loaded its model"""
+        if self._pool is not None:
+            return
+        started = time.perf_counter()
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context(self.start_method),
+            initializer=_init_worker,
+            initargs=(self.factory, self.threads_per_worker)
+        )
+        # Workers only run their initializer once they receive work, so hand
+        # every slot a short task until each process has answered; this takes
+        # model loading off the first real requests.
+        pids = set()
+        for _ in range(WARM_UP_ROUNDS):
+            futures = [self._pool.submit(_warm_up, WARM_UP_HOLD) for _ in range(self.workers)]
+            wait(futures)
+            pids.update(future.result() for future in futures)
+            if len(pids) >= self.workers:
+                break
+        self._worker_pids = sorted(pids)
+        logger.info(
+            f"Inference pool ready: {self.workers} workers x {self.threads_per_worker} threads "
+            f"in {time.perf_counter() - started:.3f}s"
+        )
+
+    def shutdown(self) -> None:
+        """Stop all worker processes"""
+        if self._pool is None:
+            return
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        self._pool = None
+        self._worker_pids = []
+        logger.info("Inference pool stopped")
+
+    async def classify_batch(self, image_paths: List[str]) -> List[Dict[str, Any]]:
+        """Run a batch on the next free worker without blocking the event loop"""
+        pool = self._pool
+        if pool is None:
+            raise RuntimeError("Inference pool not started")
+        try:
+            return await asyncio.wrap_future(pool.submit(_classify_batch, image_paths))
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM); replace the pool once so later batches recover
+            if self._pool is pool:
+                logger.error("Inference worker died, restarting pool")
+                self._restarts += 1
+                self._pool = None
+                pool.shutdown(wait=False, cancel_futures=True)
+                await asyncio.get_running_loop().run_in_executor(None, self.start)
+            raise
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "workers": self.workers,
+            "threads_per_worker": self.threads_per_worker,
+            "start_method": self.start_method,
+            "worker_pids": self._worker_pids,
+            "restarts": self._restarts
+        }
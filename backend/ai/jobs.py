@@ -0,0 +1,202 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+FINISHED_STATES = {COMPLETED, FAILED}
+
+
+class Job:
+    """A background analysis job for one study (or one batch of studies)"""
+
+    def __init__(self, study_id: str):
+        self.job_id = str(uuid.uuid4())
+        self.study_id = study_id
+        self.status = QUEUED
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.progress: Optional[Dict[str, Any]] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.attached = 0  # requests that joined this job instead of starting their own
+        self.task: Optional[asyncio.Task] = None
+        self._subscribers: List[asyncio.Queue] = []
+        # Set once finished; jobs adopted by a batch have no task of their own to await
+        self._done = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    def subscribe(self) -> asyncio.Queue:
+        """Receive an ``(event, snapshot)`` pair on every state change or progress report"""
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        if queue in self._subscribers:
+            self._subscribers.remove(queue)
+
+    def _publish(self, event: str) -> None:
+        snapshot = self.to_dict()
+        for queue in self._subscribers:
+            queue.put_nowait((event, snapshot))
+
+    def _set_status(self, status: str) -> None:
+        self.status = status
+        if status in FINISHED_STATES:
+            self._done.set()
+        self._publish(status)
+
+    def report_progress(self, **progress: Any) -> None:
+        """Record progress of a running job and notify subscribers"""
+        self.progress = progress
+        self._publish("progress")
+
+    async def wait(self) -> "Job":
+        """Wait for the job to finish"""
+        if self.task is not None and not self.finished:
+            await asyncio.shield(self.task)
+        elif not self.finished:
+            await self._done.wait()
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "study_id": self.study_id,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "progress": self.progress,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "attached_requests": self.attached
+        }
+
+
+class JobManager:
+    """Runs analysis jobs in the background with single-flight per study.
+
+    While a job for a study is queued or running, further submissions for
+    the same study attach to it instead of running the model again.
+    Finished jobs are kept for ``retention_seconds`` (at most ``max_jobs``)
+    so clients can still fetch their outcome.
+    """
+
+    def __init__(self, retention_seconds: float = 600.0, max_jobs: int = 10000):
+        self.retention_seconds = retention_seconds
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._active: Dict[str, Job] = {}
+
+    def submit(
+        self,
+        study_id: str,
+        work: Callable[[Job], Awaitable[Dict[str, Any]]]
+    ) -> Job:
+        """Start ``work(job)`` for a study, or return the job already in flight"""
+        active = self._active.get(study_id)
+        if active is not None and not active.finished:
+            active.attached += 1
+            logger.info("Attached to in-flight job %s for study %s", active.job_id, study_id)
+            return active
+
+        self._prune()
+        job = Job(study_id)
+        self._jobs[job.job_id] = job
+        self._active[study_id] = job
+        job.task = asyncio.get_running_loop().create_task(self._run(job, work))
+        return job
+
+    def adopt(self, study_id: str) -> Optional[Job]:
+        """Register a running job for a study that a larger job analyzes.
+
+        Returns None when the study already has a job in flight. Otherwise
+        later submissions for the study attach to the returned job until
+        ``settle`` finishes it.
+        """
+        active = self._active.get(study_id)
+        if active is not None and not active.finished:
+            return None
+        self._prune()
+        job = Job(study_id)
+        self._jobs[job.job_id] = job
+        self._active[study_id] = job
+        job.started_at = time.time()
+        job._set_status(RUNNING)
+        return job
+
+    def settle(self, job: Job, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> None:
+        """Finish a job registered with ``adopt``: completed with ``result``, or failed with ``error``"""
+        if job.finished:
+            return
+        job.finished_at = time.time()
+        if error is None:
+            job.result = result
+            job._set_status(COMPLETED)
+        else:
+            job.error = error
+            job._set_status(FAILED)
+        if self._active.get(job.study_id) is job:
+            del self._active[job.study_id]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def get_active(self, study_id: str) -> Optional[Job]:
+        return self._active.get(study_id)
+
+    async def _run(self, job: Job, work: Callable[[Job], Awaitable[Dict[str, Any]]]) -> None:
+        job.started_at = time.time()
+        job._set_status(RUNNING)
+        try:
+            job.result = await work(job)
+            job.finished_at = time.time()
+            job._set_status(COMPLETED)
+        except Exception as e:
+            logger.error("Job %s for study %s failed: %s", job.job_id, job.study_id, e)
+            job.error = str(e) or e.__class__.__name__
+            job.finished_at = time.time()
+            job._set_status(FAILED)
+        finally:
+            if self._active.get(job.study_id) is job:
+                del self._active[job.study_id]
+
+    def _prune(self) -> None:
+        """Drop finished jobs past retention, oldest first"""
+        cutoff = time.time() - self.retention_seconds
+        for job_id, job in list(self._jobs.items()):
+            if not job.finished:
+                continue
+            if job.finished_at >= cutoff and len(self._jobs) < self.max_jobs:
+                break
+            del self._jobs[job_id]
+
+    async def shutdown(self) -> None:
+        """Cancel jobs that are still running"""
+        tasks = [job.task for job in self._active.values() if job.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for job in list(self._active.values()):
+            self.settle(job, error="Shut down")
+        self._active.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "active_jobs": len(self._active),
+            "tracked_jobs": len(self._jobs)
+        }
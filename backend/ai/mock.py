@@ -0,0 +1,87 @@
+import os
+import random
+import time
+import logging
+from typing import Dict, Any, List
+
+from backend.ai.base import MammographyClassifier
+
+logger = logging.getLogger(__name__)
+
+# Simulated inference latency (seconds) for a single forward pass
+MOCK_MIN_DELAY = float(os.getenv("MOCK_MIN_DELAY", "1.0"))
+MOCK_MAX_DELAY = float(os.getenv("MOCK_MAX_DELAY", "3.0"))
+# Extra cost of each additional image in a batch, as a fraction of one forward pass
+MOCK_BATCH_ITEM_COST = float(os.getenv("MOCK_BATCH_ITEM_COST", "0.15"))
+
+LESION_TYPES = ["mass", "calcification", "asymmetry", "architectural_distortion"]
+SEVERITIES = ["low", "moderate", "high"]
+IMAGE_QUALITIES = ["excellent", "good", "adequate"]
+
+
+class MockMammographyClassifier(MammographyClassifier):
+    """Mock mammography classifier producing realistic-looking results"""
+
+    def __init__(self, min_delay: float = MOCK_MIN_DELAY, max_delay: float = MOCK_MAX_DELAY):
+        self.name = "MockMammographyClassifier"
+        self.version = "1.0.0"
+        self.model_version = f"mock-v{self.version}"
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+
+    def _simulate_latency(self, batch_size: int = 1) -> None:
+        """Sleep for one forward pass plus the marginal cost of extra batch items"""
+        delay = random.uniform(self.min_delay, self.max_delay)
+        time.sleep(delay * (1 + MOCK_BATCH_ITEM_COST * (batch_size - 1)))
+
+    def _predict(self, image_path: str) -> Dict[str, Any]:
+        """Generate a single mock prediction"""
+        suspicious = random.random() < 0.3
+        confidence = round(random.uniform(0.60, 0.95), 3)
+
+        regions = []
+        if suspicious:
+            for index in range(random.randint(1, 3)):
+                regions.append({
+                    "id": f"region_{index + 1}",
+                    "x": random.randint(50, 400),
+                    "y": random.randint(50, 400),
+                    "width": random.randint(20, 100),
+                    "height": random.randint(20, 100),
+                    "confidence": round(random.uniform(0.60, 0.95), 3),
+                    "type": random.choice(LESION_TYPES),
+                    "severity": random.choice(SEVERITIES),
+                    "description": "Simulated region of interest"
+                })
+
+        return {
+            "prediction": "suspicious" if suspicious else "normal",
+            "confidence": confidence,
+            "regions": regions,
+            "model_version": self.model_version,
+            "image_quality": random.choice(IMAGE_QUALITIES)
+        }
+
+    def classify(self, image_path: str) -> Dict[str, Any]:
+        """Classify a single mammogram"""
+        self._simulate_latency()
+        return self._predict(image_path)
+
+    def classify_batch(self, image_paths: List[str]) -> List[Dict[str, Any]]:
+        """Classify several mammograms in one forward pass"""
+        if not image_paths:
+            return []
+        self._simulate_latency(len(image_paths))
+        return [self._predict(path) for path in image_paths]
+
+    def get_model_info(self) -> Dict[str, Any]:
+        """Get model information"""
+        return {
+            "name": self.name,
+            "version": self.version,
+            "model_version": self.model_version,
+            "model_type": "mock",
+            "supported_formats": [".png", ".jpg", ".jpeg", ".dcm", ".dicom"],
+            "lesion_types": LESION_TYPES,
+            "description": "Mock classifier returning simulated results for demonstration purposes"
+        }
@@ -0,0 +1,168 @@
+import asyncio
+import functools
+import importlib
+import logging
+import os
+import shutil
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Inference backends by MODEL_BACKEND name, as "module:attribute"
+MODEL_BACKENDS = {
+    "mock": "backend.ai.mock:MockMammographyClassifier",
+    "onnx": "backend.ai.onnx_runtime:OnnxMammographyClassifier",
+}
+# A backend name, or a "module:attribute" reference to any MammographyClassifier
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "mock")
+# Classifier to serve; the module is only imported when the model loads
+MODEL_CLASS = MODEL_BACKENDS.get(MODEL_BACKEND.lower(), MODEL_BACKEND)
+# Run one inference on a synthetic image before accepting traffic
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "true").lower() not in ("0", "false", "no")
+MODEL_WARMUP_SIDE = int(os.getenv("MODEL_WARMUP_SIDE", "512"))
+
+# Model states
+NOT_LOADED = "not_loaded"
+LOADING = "loading"
+WARMING_UP = "warming_up"
+READY = "ready"
+FAILED = "failed"
+
+
+def import_object(spec: str) -> Any:
+    """Resolve a "package.module:attribute" reference"""
+    module_name, _, attribute = spec.partition(":")
+    if not attribute:
+        raise ValueError(
+            f"Unknown model backend {spec!r}: use one of {', '.join(MODEL_BACKENDS)} or \"module:attribute\""
+        )
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+def warm_up(classifier, side: int = MODEL_WARMUP_SIDE) -> None:
+    """Run one batch through the classifier so lazy initialization happens now"""
+    import numpy as np
+
+    directory = tempfile.mkdtemp(prefix="warmup-")
+    try:
+        # Same input format inference reads from the preprocess cache
+        path = os.path.join(directory, "warmup.npy")
+        np.save(path, np.zeros((side, side), dtype=np.float32), allow_pickle=False)
+        classifier.classify_batch([path])
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def load_classifier(spec: str = MODEL_CLASS, warmup: bool = MODEL_WARMUP):
+    """Build (and optionally warm up) a classifier; picklable as a worker-process factory"""
+    classifier = import_object(spec)()
+    if warmup:
+        warm_up(classifier)
+    return classifier
+
+
+def classifier_factory(spec: str = MODEL_CLASS, warmup: bool = MODEL_WARMUP) -> Callable[[], Any]:
+    return functools.partial(load_classifier, spec, warmup)
+
+
+class ModelManager:
+    """Owns the process's shared classifier.
+
+    Nothing is imported or built until ``load`` runs (from the app lifespan)
+    or ``preload`` runs (in a pre-fork master); either builds the model, runs
+    a warm-up inference and only then reports ready. Health checks and the
+    batching scheduler use this one instance instead of constructing their own.
+    """
+
+    def __init__(self, spec: str = MODEL_CLASS, warmup: bool = MODEL_WARMUP):
+        self.spec = spec
+        self.warmup = warmup
+        self.classifier = None
+        self.info: Optional[Dict[str, Any]] = None
+        self.state = NOT_LOADED
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self.warmup_seconds: Optional[float] = None
+        self._loading: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state == READY
+
+    @property
+    def version(self) -> Optional[str]:
+        """Model version results are cached under; None until loaded"""
+        return self.info["model_version"] if self.info else None
+
+    def _load(self) -> None:
+        started = time.perf_counter()
+        classifier = import_object(self.spec)()
+        info = classifier.get_model_info()
+        self.load_seconds = time.perf_counter() - started
+        logger.info("🧠 Model %s loaded in %.3fs", info['model_version'], self.load_seconds)
+
+        if self.warmup:
+            self.state = WARMING_UP
+            started = time.perf_counter()
+            warm_up(classifier)
+            self.warmup_seconds = time.perf_counter() - started
+            logger.info("🔥 Model warm-up inference took %.3fs", self.warmup_seconds)
+        self.classifier, self.info = classifier, info
+
+    def preload(self) -> bool:
+        """Load and warm up synchronously, e.g. in a pre-fork master.
+
+        Workers forked afterwards inherit the loaded model and share its
+        memory pages copy-on-write instead of each building their own.
+        """
+        if self.ready:
+            return True
+        self.state = LOADING
+        try:
+            self._load()
+        except Exception as e:
+            self.state, self.error = FAILED, str(e)
+            logger.error("❌ Model failed to load: %s", e)
+            return False
+        self.state = READY
+        return True
+
+    async def load(self) -> bool:
+        """Load and warm up the model once; concurrent callers share the same attempt"""
+        if self.ready:
+            return True
+        if self._loading is None:
+            self._loading = asyncio.get_running_loop().create_task(self._load_once())
+        return await asyncio.shield(self._loading)
+
+    async def _load_once(self) -> bool:
+        return await asyncio.get_running_loop().run_in_executor(None, self.preload)
+
+    def unload(self) -> None:
+        """Drop the model so the next ``load`` starts over"""
+        self.classifier, self.info = None, None
+        self.state, self.error = NOT_LOADED, None
+        self._loading = None
+
+    def classify_batch(self, image_paths: List[str]) -> List[Dict[str, Any]]:
+        if self.classifier is None:
+            raise RuntimeError(f"Model not ready ({self.state})")
+        return self.classifier.classify_batch(image_paths)
+
+    def get_model_info(self) -> Optional[Dict[str, Any]]:
+        return self.info
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "error": self.error,
+            "model_version": self.version,
+            "model_type": self.info.get("model_type") if self.info else None,
+            "load_seconds": round(self.load_seconds, 3) if self.load_seconds is not None else None,
+            "warmup_seconds": round(self.warmup_seconds, 3) if self.warmup_seconds is not None else None
+        }
+
+
+model = ModelManager()
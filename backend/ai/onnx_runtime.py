@@ -0,0 +1,315 @@
+"""Mammography classifier running an ONNX model on the ONNX Runtime CPU provider.
+
+The model takes one float32 image tensor, ``(batch, channels, height,
+width)`` with one or three channels, and returns per-image class scores
+as its first output: ``(batch, len(ONNX_LABELS))`` for softmax-style
+models or ``(batch, 1)`` for a single suspicious score. Images arrive as
+the preprocessed arrays in [0, 1]; they are resized to the model's input
+size and normalized with ``ONNX_INPUT_MEAN``/``ONNX_INPUT_STD``. Models are
+classification only, so results carry no regions.
+
+int8-quantized models (QDQ or integer-operator graphs) run as they are on
+the CPU provider. To quantize an fp32 model:
+
+    python -m backend.ai.onnx_runtime quantize model.onnx model.int8.onnx --calibration-dir uploads/.preprocessed
+
+With a calibration directory of preprocessed ``.npy`` arrays the weights
+and activations are quantized statically (QDQ format); without one only
+the weights are, dynamically.
+"""
+import argparse
+import glob
+import hashlib
+import logging
+import os
+import sys
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from backend.ai.base import MammographyClassifier
+from backend.ai.preprocess import load_array
+
+try:
+    import onnxruntime
+except ImportError:  # only needed when MODEL_BACKEND=onnx
+    onnxruntime = None
+
+logger = logging.getLogger(__name__)
+
+ONNX_MODEL_PATH = os.getenv("ONNX_MODEL_PATH", "models/mammography.onnx")
+# Threads used within one operator; 0 lets ONNX Runtime use every physical core.
+# Unset, it follows OMP_NUM_THREADS, which process-mode inference workers pin,
+# else each web worker takes an equal share of the cores (cpu_count // WEB_CONCURRENCY),
+# since every worker runs its own session and thread pool.
+ONNX_INTRA_OP_THREADS = os.getenv("ONNX_INTRA_OP_THREADS")
+# Threads running independent graph branches; only used in parallel execution mode
+ONNX_INTER_OP_THREADS = int(os.getenv("ONNX_INTER_OP_THREADS", "1"))
+ONNX_EXECUTION_MODE = os.getenv("ONNX_EXECUTION_MODE", "sequential").lower()
+ONNX_GRAPH_OPTIMIZATION = os.getenv("ONNX_GRAPH_OPTIMIZATION", "all").lower()
+# Class names in the order of the model's output columns
+ONNX_LABELS = [label.strip() for label in os.getenv("ONNX_LABELS", "normal,suspicious").split(",")]
+# Cut-off for single-score models; multi-column models take the top class
+ONNX_SUSPICIOUS_THRESHOLD = float(os.getenv("ONNX_SUSPICIOUS_THRESHOLD", "0.5"))
+# "auto" applies softmax to multi-column outputs and sigmoid to a single score;
+# "none" when the model already outputs probabilities
+ONNX_OUTPUT_ACTIVATION = os.getenv("ONNX_OUTPUT_ACTIVATION", "auto").lower()
+ONNX_INPUT_MEAN = float(os.getenv("ONNX_INPUT_MEAN", "0"))
+ONNX_INPUT_STD = float(os.getenv("ONNX_INPUT_STD", "1"))
+# Input side used when the model leaves height and width dynamic
+ONNX_INPUT_SIDE = int(os.getenv("ONNX_INPUT_SIDE", "512"))
+
+# Operators only found in quantized graphs, besides the QLinear* family
+QUANTIZED_OPERATORS = frozenset({
+    "QuantizeLinear", "DequantizeLinear", "DynamicQuantizeLinear", "ConvInteger", "MatMulInteger",
+    "MatMulIntegerToFloat", "DynamicQuantizeMatMul", "QGemm", "QAttention",
+})
+
+GRAPH_OPTIMIZATION_LEVELS = {
+    "disabled": "ORT_DISABLE_ALL",
+    "basic": "ORT_ENABLE_BASIC",
+    "extended": "ORT_ENABLE_EXTENDED",
+    "all": "ORT_ENABLE_ALL",
+}
+
+
+def _require_onnxruntime() -> None:
+    if onnxruntime is None:
+        raise RuntimeError("MODEL_BACKEND=onnx needs the onnxruntime package (pip install onnxruntime)")
+
+
+def _operator_types(graph) -> Iterator[str]:
+    """Operator types of a graph's nodes, including those in control-flow subgraphs"""
+    from onnx import AttributeProto
+
+    for node in graph.node:
+        yield node.op_type
+        for attribute in node.attribute:
+            if attribute.type == AttributeProto.GRAPH:
+                yield from _operator_types(attribute.g)
+            elif attribute.type == AttributeProto.GRAPHS:
+                for subgraph in attribute.graphs:
+                    yield from _operator_types(subgraph)
+
+
+def is_quantized(model_bytes: bytes) -> Optional[bool]:
+    """Whether a serialized model contains quantized operators; None without the onnx package"""
+    try:
+        import onnx
+    except ImportError:
+        return None
+
+    model = onnx.load_model_from_string(model_bytes)
+    operators = set(_operator_types(model.graph))
+    for function in model.functions:
+        operators.update(node.op_type for node in function.node)
+    return any(op in QUANTIZED_OPERATORS or op.startswith("QLinear") for op in operators)
+
+
+def _default_intra_op_threads() -> int:
+    value = ONNX_INTRA_OP_THREADS or os.getenv("OMP_NUM_THREADS")
+    if value:
+        return int(value)
+    # Read at load time: gunicorn_conf exports the worker count it forks
+    workers = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+def _static_dim(dim: Any) -> Optional[int]:
+    return dim if isinstance(dim, int) and dim > 0 else None
+
+
+class OnnxMammographyClassifier(MammographyClassifier):
+    """Classifier backed by an ONNX Runtime CPU session"""
+
+    def __init__(
+        self,
+        model_path: str = ONNX_MODEL_PATH,
+        intra_op_threads: Optional[int] = None,
+        inter_op_threads: int = ONNX_INTER_OP_THREADS,
+        execution_mode: str = ONNX_EXECUTION_MODE,
+        graph_optimization: str = ONNX_GRAPH_OPTIMIZATION,
+        labels: Optional[List[str]] = None
+    ):
+        _require_onnxruntime()
+        if not os.path.isfile(model_path):
+            raise FileNotFoundError(f"ONNX model not found: {model_path}")
+        if execution_mode not in ("sequential", "parallel"):
+            raise ValueError(f"ONNX_EXECUTION_MODE must be sequential or parallel, not {execution_mode!r}")
+        if graph_optimization not in GRAPH_OPTIMIZATION_LEVELS:
+            raise ValueError(f"ONNX_GRAPH_OPTIMIZATION must be one of {', '.join(GRAPH_OPTIMIZATION_LEVELS)}")
+
+        self.model_path = model_path
+        self.labels = labels or ONNX_LABELS
+        self.intra_op_threads = _default_intra_op_threads() if intra_op_threads is None else intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.execution_mode = execution_mode
+
+        with open(model_path, "rb") as f:
+            model_bytes = f.read()
+        self.quantized = is_quantized(model_bytes)
+        digest = hashlib.sha256(model_bytes).hexdigest()
+        # Keyed by the weights, so cached results never outlive a model swap
+        self.model_version = f"onnx-{os.path.splitext(os.path.basename(model_path))[0]}-{digest[:12]}"
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = self.intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        options.execution_mode = (
+            onnxruntime.ExecutionMode.ORT_PARALLEL if execution_mode == "parallel"
+            else onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+        )
+        options.graph_optimization_level = getattr(
+            onnxruntime.GraphOptimizationLevel, GRAPH_OPTIMIZATION_LEVELS[graph_optimization]
+        )
+        self.session = onnxruntime.InferenceSession(model_bytes, options, providers=["CPUExecutionProvider"])
+
+        model_input = self.session.get_inputs()[0]
+        if len(model_input.shape) != 4:
+            raise ValueError(f"Expected a (batch, channels, height, width) input, got {model_input.shape}")
+        self.input_name = model_input.name
+        batch, channels, height, width = (_static_dim(dim) for dim in model_input.shape)
+        self.channels = channels or 1
+        self.input_size: Tuple[int, int] = (height or ONNX_INPUT_SIDE, width or ONNX_INPUT_SIDE)
+        # Models exported with a fixed batch size are fed in chunks of that size
+        self.max_batch_size = batch
+        self.output_name = self.session.get_outputs()[0].name
+        logger.info(
+            f"🧠 ONNX model {self.model_path} ({self.precision}, "
+            f"input {self.channels}x{self.input_size[0]}x{self.input_size[1]}, "
+            f"{self.intra_op_threads or 'all'} intra-op threads)"
+        )
+
+    @property
+    def precision(self) -> str:
+        if self.quantized is None:
+            return "unknown"
+        return "int8" if self.quantized else "fp32"
+
+    def _prepare(self, image_path: str) -> "np.ndarray":
+        """Preprocessed array resized and normalized to one (channels, height, width) input"""
+        import numpy as np
+        from PIL import Image
+
+        pixels = np.asarray(load_array(image_path), dtype=np.float32)
+        height, width = self.input_size
+        if pixels.shape != (height, width):
+            pixels = np.asarray(Image.fromarray(pixels).resize((width, height), Image.BILINEAR))
+        pixels = (pixels - ONNX_INPUT_MEAN) / ONNX_INPUT_STD
+        return np.repeat(pixels[np.newaxis], self.channels, axis=0)
+
+    def prepare_batch(self, image_paths: List[str]) -> "np.ndarray":
+        import numpy as np
+
+        return np.stack([self._prepare(path) for path in image_paths]).astype(np.float32, copy=False)
+
+    def _scores(self, outputs: "np.ndarray") -> "np.ndarray":
+        import numpy as np
+
+        outputs = np.asarray(outputs, dtype=np.float64).reshape(len(outputs), -1)
+        if ONNX_OUTPUT_ACTIVATION == "none":
+            return outputs
+        if outputs.shape[1] == 1:
+            return 1.0 / (1.0 + np.exp(-outputs))
+        shifted = np.exp(outputs - outputs.max(axis=1, keepdims=True))
+        return shifted / shifted.sum(axis=1, keepdims=True)
+
+    def _result(self, scores: "np.ndarray") -> Dict[str, Any]:
+        if len(scores) == 1:
+            suspicious = float(scores[0])
+            prediction = "suspicious" if suspicious >= ONNX_SUSPICIOUS_THRESHOLD else "normal"
+            confidence = suspicious if prediction == "suspicious" else 1.0 - suspicious
+        else:
+            index = int(scores.argmax())
+            prediction = self.labels[index] if index < len(self.labels) else f"class_{index}"
+            confidence = float(scores[index])
+        return {
+            "prediction": prediction,
+            "confidence": round(confidence, 3),
+            "regions": [],
+            "model_version": self.model_version,
+            "image_quality": None
+        }
+
+    def classify_batch(self, image_paths: List[str]) -> List[Dict[str, Any]]:
+        """Classify several mammograms, one session run per batch (or per fixed-size chunk)"""
+        if not image_paths:
+            return []
+        chunk = self.max_batch_size or len(image_paths)
+        results = []
+        for start in range(0, len(image_paths), chunk):
+            batch = self.prepare_batch(image_paths[start:start + chunk])
+            outputs = self.session.run([self.output_name], {self.input_name: batch})[0]
+            results.extend(self._result(scores) for scores in self._scores(outputs))
+        return results
+
+    def get_model_info(self) -> Dict[str, Any]:
+        """Get model information"""
+        return {
+            "name": "OnnxMammographyClassifier",
+            "version": onnxruntime.__version__,
+            "model_version": self.model_version,
+            "model_type": "onnx",
+            "model_path": self.model_path,
+            "precision": self.precision,
+            "input_shape": [self.max_batch_size, self.channels, *self.input_size],
+            "labels": self.labels,
+            "providers": self.session.get_providers(),
+            "intra_op_threads": self.intra_op_threads,
+            "inter_op_threads": self.inter_op_threads,
+            "execution_mode": self.execution_mode,
+            "supported_formats": [".png", ".jpg", ".jpeg", ".dcm", ".dicom"],
+            "description": "ONNX Runtime CPU classifier"
+        }
+
+
+def quantize_model(source: str, target: str, calibration_dir: Optional[str] = None,
+                   calibration_limit: int = 64) -> Dict[str, Any]:
+    """Write an int8 copy of an fp32 model; statically calibrated when arrays are given"""
+    _require_onnxruntime()
+    from onnxruntime.quantization import (
+        CalibrationDataReader, QuantFormat, QuantType, quantize_dynamic, quantize_static
+    )
+
+    if not calibration_dir:
+        # The CPU provider has no ConvInteger kernel for int8 weights, only uint8
+        quantize_dynamic(source, target, weight_type=QuantType.QUInt8)
+        return {"source": source, "target": target, "mode": "dynamic", "calibration_images": 0}
+
+    paths = sorted(glob.glob(os.path.join(calibration_dir, "**", "*.npy"), recursive=True))[:calibration_limit]
+    if not paths:
+        raise ValueError(f"No preprocessed .npy arrays under {calibration_dir}")
+    # Calibrate on exactly what inference feeds the model
+    reference = OnnxMammographyClassifier(source, graph_optimization="disabled")
+
+    class _Reader(CalibrationDataReader):
+        def __init__(self):
+            self._paths = iter(paths)
+
+        def get_next(self) -> Optional[Dict[str, Any]]:
+            path = next(self._paths, None)
+            return None if path is None else {reference.input_name: reference.prepare_batch([path])}
+
+    quantize_static(source, target, _Reader(), quant_format=QuantFormat.QDQ,
+                    weight_type=QuantType.QInt8, activation_type=QuantType.QUInt8)
+    return {"source": source, "target": target, "mode": "static", "calibration_images": len(paths)}
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m backend.ai.onnx_runtime", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    quantize = commands.add_parser("quantize", help="write an int8-quantized copy of an fp32 model")
+    quantize.add_argument("source")
+    quantize.add_argument("target")
+    quantize.add_argument("--calibration-dir", help="preprocessed .npy arrays for static quantization")
+    quantize.add_argument("--calibration-limit", type=int, default=64)
+    args = parser.parse_args(argv)
+
+    summary = quantize_model(args.source, args.target, args.calibration_dir, args.calibration_limit)
+    print(f"Quantized {summary['source']} -> {summary['target']} ({summary['mode']}, "
+          f"{summary['calibration_images']} calibration images)")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
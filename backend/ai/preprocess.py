@@ -0,0 +1,351 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+from backend.storage.blobs import blob_store
+
+# numpy is imported where it is used, keeping it off the app's import path
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Where normalized arrays are cached, and how much disk they may use
+PREPROCESS_DIR = os.getenv("PREPROCESS_DIR", "uploads/.preprocessed")
+PREPROCESS_CACHE_MAX_BYTES = int(os.getenv("PREPROCESS_CACHE_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))  # 2GB
+# Longest side of the downsampled array, in pixels
+PREPROCESS_MAX_SIDE = int(os.getenv("PREPROCESS_MAX_SIDE", "1024"))
+PREPROCESS_WORKERS = int(os.getenv("PREPROCESS_WORKERS", "2"))
+# Arrays used this recently (seconds) are never evicted: a reader may be about to map them
+PREPROCESS_READ_GRACE = float(os.getenv("PREPROCESS_READ_GRACE", "60"))
+# Seconds before an image that failed to decode is tried again
+PREPROCESS_RETRY_AFTER = float(os.getenv("PREPROCESS_RETRY_AFTER", "300"))
+# Bump when the pipeline changes so stale arrays are never reused
+PREPROCESS_VERSION = "v1"
+
+DICOM_EXTENSIONS = {".dcm", ".dicom"}
+
+
+def _apply_dicom_luts(pixels: "np.ndarray", dataset) -> "np.ndarray":
+    """Modality LUT (rescale slope/intercept) then VOI LUT / windowing"""
+    try:
+        from pydicom.pixels import apply_modality_lut, apply_voi_lut
+    except ImportError:  # pydicom < 3
+        from pydicom.pixel_data_handlers.util import apply_modality_lut, apply_voi_lut
+    pixels = apply_modality_lut(pixels, dataset)
+    return apply_voi_lut(pixels, dataset)
+
+
+def _decode_dicom(path: str) -> "np.ndarray":
+    import numpy as np
+    import pydicom
+
+    dataset = pydicom.dcmread(path)
+    pixels = dataset.pixel_array
+    if pixels.ndim > 2:
+        # Multi-frame: keep the first frame
+        pixels = pixels[0]
+    pixels = _apply_dicom_luts(pixels, dataset).astype(np.float32)
+    if dataset.get("PhotometricInterpretation") == "MONOCHROME1":
+        # Bright means low attenuation; flip so every image reads the same way
+        pixels = pixels.max() - pixels
+    return pixels
+
+
+def _decode_raster(path: str) -> "np.ndarray":
+    import numpy as np
+    from PIL import Image
+
+    with Image.open(path) as image:
+        if image.mode in ("I;16", "I;16B", "I"):
+            return np.asarray(image, dtype=np.float32)
+        return np.asarray(image.convert("L"), dtype=np.float32)
+
+
+def decode_image(location: str, max_side: int = PREPROCESS_MAX_SIDE) -> "np.ndarray":
+    """Decode a stored mammogram to a 2-D float32 array in [0, 1], downsampled to ``max_side``"""
+    import numpy as np
+    from PIL import Image
+
+    # Remote blobs are streamed to a temporary file for the decoders
+    with blob_store.local_file(location) as path:
+        if os.path.splitext(path)[1].lower() in DICOM_EXTENSIONS:
+            pixels = _decode_dicom(path)
+        else:
+            pixels = _decode_raster(path)
+
+    height, width = pixels.shape
+    scale = max_side / max(height, width)
+    if scale < 1:
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        pixels = np.asarray(Image.fromarray(pixels).resize(size, Image.BILINEAR))
+
+    low, high = float(pixels.min()), float(pixels.max())
+    pixels = (pixels - low) / (high - low) if high > low else np.zeros_like(pixels)
+    return np.ascontiguousarray(pixels, dtype=np.float32)
+
+
+def load_array(path: str) -> "np.ndarray":
+    """Model input for an image path: a zero-copy memmap for cached arrays, else a fresh decode"""
+    import numpy as np
+
+    if path.endswith(".npy"):
+        return np.load(path, mmap_mode="r")
+    return decode_image(path)
+
+
+class PreprocessCache:
+    """Size-bounded on-disk cache of normalized arrays, keyed by content hash.
+
+    Arrays are written once as ``.npy`` files (atomically, via a temporary
+    file) and handed out as read-only memmaps, so inference reads straight
+    from the page cache instead of decoding the original again. When the
+    total size exceeds ``max_bytes`` the least recently used arrays are
+    deleted, except those handed out within ``read_grace`` seconds (their
+    mtime, shared by every worker process, records the last hand-out).
+    """
+
+    def __init__(
+        self,
+        directory: str = PREPROCESS_DIR,
+        max_bytes: int = PREPROCESS_CACHE_MAX_BYTES,
+        read_grace: float = PREPROCESS_READ_GRACE
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.read_grace = read_grace
+        self._lock = threading.Lock()
+        self._index: Optional["OrderedDict[str, int]"] = None
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def path_for(self, content_hash: str) -> str:
+        return os.path.join(self.directory, f"{content_hash}.{PREPROCESS_VERSION}.npy")
+
+    def _load_index(self) -> "OrderedDict[str, int]":
+        """Rebuild the LRU index from disk on first use, oldest first"""
+        if self._index is None:
+            os.makedirs(self.directory, exist_ok=True)
+            entries = []
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(f".{PREPROCESS_VERSION}.npy"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, entry.path, stat.st_size))
+            self._index = OrderedDict((path, size) for _, path, size in sorted(entries))
+            self._bytes = sum(self._index.values())
+        return self._index
+
+    def _touch(self, path: str) -> None:
+        index = self._load_index()
+        if path in index:
+            index.move_to_end(path)
+        try:
+            # mtime carries recency across restarts
+            os.utime(path)
+        except OSError:
+            pass
+
+    def get(self, content_hash: str) -> Optional[str]:
+        """Path of the cached array for this content, or None"""
+        path = self.path_for(content_hash)
+        with self._lock:
+            if os.path.exists(path):
+                self.hits += 1
+                self._touch(path)
+                return path
+            self._load_index().pop(path, None)
+            self.misses += 1
+            return None
+
+    def put(self, content_hash: str, array: "np.ndarray") -> str:
+        """Write an array for this content and evict down to the size limit"""
+        import numpy as np
+
+        path = self.path_for(content_hash)
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(temp_path, "wb") as f:
+                np.save(f, array, allow_pickle=False)
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        size = os.path.getsize(path)
+        with self._lock:
+            index = self._load_index()
+            self._bytes += size - index.pop(path, 0)
+            index[path] = size
+            self._evict(keep=path)
+        return path
+
+    def _in_use(self, path: str, cutoff: float) -> bool:
+        """Whether an array was handed out after ``cutoff``, possibly by another worker"""
+        if self.read_grace <= 0:
+            return False
+        try:
+            return os.stat(path).st_mtime > cutoff
+        except FileNotFoundError:
+            return False
+
+    def _evict(self, keep: str) -> None:
+        index = self._index
+        cutoff = time.time() - self.read_grace
+        for path in list(index):
+            if self._bytes <= self.max_bytes:
+                break
+            if path == keep or self._in_use(path, cutoff):
+                continue
+            self._bytes -= index.pop(path)
+            self.evictions += 1
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def discard(self, content_hash: str) -> int:
+        """Drop the cached array for this content; returns the bytes freed"""
+        path = self.path_for(content_hash)
+        with self._lock:
+            index = self._load_index()
+            size = index.pop(path, 0)
+            self._bytes -= size
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                return size
+        return size
+
+    def ensure(self, content_hash: str, source_path: str) -> str:
+        """Path of the cached array, decoding ``source_path`` on a miss (blocking)"""
+        path = self.get(content_hash)
+        if path is not None:
+            return path
+        started = time.perf_counter()
+        path = self.put(content_hash, decode_image(source_path))
+        logger.info("Preprocessed %s in %.3fs", source_path, time.perf_counter() - started)
+        return path
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            index = self._load_index()
+            lookups = self.hits + self.misses
+            return {
+                "directory": self.directory,
+                "entries": len(index),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else None
+            }
+
+
+class Preprocessor:
+    """Runs preprocessing in background threads, once per content hash.
+
+    ``submit`` is called right after upload so the array is usually ready
+    before analysis is requested; ``resolve`` returns the path inference
+    should read, waiting for an in-flight decode rather than starting a
+    second one. Images that cannot be decoded fall back to the original
+    until ``retry_after`` seconds have passed, then are decoded again.
+    """
+
+    def __init__(
+        self,
+        cache: PreprocessCache,
+        workers: int = PREPROCESS_WORKERS,
+        retry_after: float = PREPROCESS_RETRY_AFTER
+    ):
+        self.cache = cache
+        self.workers = workers
+        self.retry_after = retry_after
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        # content hash -> monotonic time its last decode failed, oldest first
+        self._failed: "OrderedDict[str, float]" = OrderedDict()
+        self.processed = 0
+
+    def _failed_recently(self, content_hash: str) -> bool:
+        failed_at = self._failed.get(content_hash)
+        if failed_at is None:
+            return False
+        if time.monotonic() - failed_at < self.retry_after:
+            return True
+        del self._failed[content_hash]
+        return False
+
+    async def _process(self, content_hash: str, source_path: str) -> Optional[str]:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+        try:
+            async with self._slots:
+                path = await asyncio.get_running_loop().run_in_executor(
+                    None, self.cache.ensure, content_hash, source_path
+                )
+            self.processed += 1
+            return path
+        except Exception as e:
+            logger.warning("Preprocessing failed for %s: %s", source_path, e)
+            self._failed.pop(content_hash, None)
+            self._failed[content_hash] = time.monotonic()
+            while len(self._failed) > 10000:
+                self._failed.popitem(last=False)
+            return None
+        finally:
+            self._in_flight.pop(content_hash, None)
+
+    def submit(self, content_hash: Optional[str], source_path: str) -> Optional[asyncio.Task]:
+        """Start preprocessing in the background unless cached, failed or already running"""
+        if not content_hash or self._failed_recently(content_hash):
+            return None
+        task = self._in_flight.get(content_hash)
+        if task is None:
+            if os.path.exists(self.cache.path_for(content_hash)):
+                return None
+            task = asyncio.get_running_loop().create_task(self._process(content_hash, source_path))
+            self._in_flight[content_hash] = task
+        return task
+
+    async def resolve(self, study: Dict[str, Any]) -> str:
+        """Path inference should read for a study: its cached array, or the original file"""
+        source_path = study.get("file_path", "")
+        content_hash = study.get("content_hash")
+        if not content_hash or self._failed_recently(content_hash):
+            return source_path
+        path = None if content_hash in self._in_flight else self.cache.get(content_hash)
+        if path is None:
+            # Joins the in-flight decode, or runs it now if upload never started one
+            task = self.submit(content_hash, source_path)
+            if task is not None:
+                path = await asyncio.shield(task)
+        return path or source_path
+
+    async def shutdown(self) -> None:
+        """Cancel preprocessing still in flight"""
+        tasks = list(self._in_flight.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._in_flight.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._in_flight),
+            "processed": self.processed,
+            "failed": len(self._failed),
+            "cache": self.cache.get_stats()
+        }
+
+
+# Shared by upload (eager submit) and inference (resolve)
+preprocessor = Preprocessor(PreprocessCache())
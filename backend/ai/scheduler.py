@@ -0,0 +1,205 @@
+import asyncio
+import logging
+import time
+from collections import Counter, deque
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from backend.metrics import BATCH_SIZE, CLASSIFIER_SECONDS, QUEUE_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Number of recent samples kept for percentile statistics
+STATS_WINDOW = 1000
+
+
+def _summarize(samples: Deque[float]) -> Dict[str, Optional[float]]:
+    """Summarize a window of millisecond samples"""
+    if not samples:
+        return {"avg": None, "p50": None, "p95": None, "p99": None, "max": None}
+    ordered = sorted(samples)
+    last = len(ordered) - 1
+    return {
+        "avg": round(sum(ordered) / len(ordered), 3),
+        "p50": round(ordered[int(last * 0.50)], 3),
+        "p95": round(ordered[int(last * 0.95)], 3),
+        "p99": round(ordered[int(last * 0.99)], 3),
+        "max": round(ordered[-1], 3)
+    }
+
+
+class BatchScheduler:
+    """Collects concurrent classification requests into micro-batches.
+
+    Requests are queued until either ``max_batch_size`` are waiting or the
+    oldest one has waited ``max_wait_ms``; the batch is then passed to the
+    classifier's ``classify_batch`` off the event loop (in a worker thread, or
+    in an ``InferencePool`` process when one is given) and every caller gets
+    its own result back. Up to ``max_concurrent_batches`` batches run at once.
+    """
+
+    def __init__(
+        self,
+        classifier,
+        max_batch_size: int = 8,
+        max_wait_ms: float = 10.0,
+        pool=None,
+        max_concurrent_batches: int = 1
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        if max_concurrent_batches < 1:
+            raise ValueError("max_concurrent_batches must be at least 1")
+        self.classifier = classifier
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        # Optional InferencePool; batches run in its worker processes when set
+        self.pool = pool
+        self.max_concurrent_batches = max_concurrent_batches
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._in_flight: Set[asyncio.Task] = set()
+
+        # Statistics
+        self._requests = 0
+        self._batches = 0
+        self._failures = 0
+        self._batch_sizes: Counter = Counter()
+        self._queue_wait_ms: Deque[float] = deque(maxlen=STATS_WINDOW)
+        self._batch_time_ms: Deque[float] = deque(maxlen=STATS_WINDOW)
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    def start(self) -> None:
+        """Start the batching loop on the running event loop"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.max_concurrent_batches)
+        self._worker = asyncio.get_running_loop().create_task(self._run())
+        logger.info(
+            f"Inference scheduler started (max_batch_size={self.max_batch_size}, "
+            f"max_wait_ms={self.max_wait * 1000:.1f}, "
+            f"max_concurrent_batches={self.max_concurrent_batches})"
+        )
+
+    async def stop(self) -> None:
+        """Stop the batching loop and fail any request still queued"""
+        if not self.running:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+        while not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Inference scheduler stopped"))
+        self._worker = None
+        logger.info("Inference scheduler stopped")
+
+    async def classify(self, image_path: str) -> Dict[str, Any]:
+        """Queue an image for classification and wait for its result"""
+        if not self.running:
+            self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((image_path, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self) -> List[Tuple[str, asyncio.Future, float]]:
+        """Wait for the first request, then gather more until full or timed out"""
+        batch = [await self._queue.get()]
+        deadline = batch[0][2] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            # Hold requests in the queue while every batch slot is busy so the
+            # next batch fills up instead of dispatching singletons
+            await self._slots.acquire()
+            try:
+                batch = await self._collect()
+            except BaseException:
+                self._slots.release()
+                raise
+            # Callers that gave up (e.g. client disconnected) don't need a slot
+            batch = [item for item in batch if not item[1].done()]
+            if not batch:
+                self._slots.release()
+                continue
+            task = asyncio.get_running_loop().create_task(self._dispatch(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _dispatch(self, batch: List[Tuple[str, asyncio.Future, float]]) -> None:
+        try:
+            started = time.perf_counter()
+            for _, _, enqueued in batch:
+                self._queue_wait_ms.append((started - enqueued) * 1000)
+                QUEUE_WAIT_SECONDS.observe(started - enqueued)
+            BATCH_SIZE.observe(len(batch))
+            self._requests += len(batch)
+            self._batches += 1
+            self._batch_sizes[len(batch)] += 1
+
+            paths = [path for path, _, _ in batch]
+            try:
+                if self.pool is not None:
+                    results = await self.pool.classify_batch(paths)
+                else:
+                    results = await asyncio.get_running_loop().run_in_executor(
+                        None, self.classifier.classify_batch, paths
+                    )
+                if len(results) != len(batch):
+                    raise RuntimeError(
+                        f"classify_batch returned {len(results)} results for {len(batch)} images"
+                    )
+            except Exception as e:
+                self._failures += 1
+                logger.error("Batch inference failed for %s images: %s", len(batch), e)
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            finally:
+                elapsed = time.perf_counter() - started
+                self._batch_time_ms.append(elapsed * 1000)
+                CLASSIFIER_SECONDS.observe(elapsed)
+
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self._slots.release()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Batch-size and queue-wait statistics for tuning"""
+        return {
+            "running": self.running,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "max_concurrent_batches": self.max_concurrent_batches,
+            "batches_in_flight": len(self._in_flight),
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "requests": self._requests,
+            "batches": self._batches,
+            "failed_batches": self._failures,
+            "avg_batch_size": round(self._requests / self._batches, 3) if self._batches else None,
+            "batch_size_histogram": {str(size): count for size, count in sorted(self._batch_sizes.items())},
+            "queue_wait_ms": _summarize(self._queue_wait_ms),
+            "batch_time_ms": _summarize(self._batch_time_ms),
+            "pool": self.pool.get_stats() if self.pool is not None else None
+        }
@@ -0,0 +1,276 @@
+import asyncio
+import logging
+import math
+import os
+import re
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from backend.metrics import ADMISSION_QUEUE_SECONDS, ADMISSION_REJECTED
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() not in ("0", "false", "no")
+# Longest a request may wait for a slot before it is shed with 503
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "5"))
+# Use the first X-Forwarded-For address as the client; only behind a trusted proxy
+ADMISSION_TRUST_FORWARDED = os.getenv("ADMISSION_TRUST_FORWARDED", "false").lower() in ("1", "true", "yes")
+# Token buckets kept; the least recently seen clients are forgotten beyond this
+ADMISSION_MAX_CLIENTS = int(os.getenv("ADMISSION_MAX_CLIENTS", "10000"))
+
+class Overloaded(Exception):
+    """No slot became free in time, or the queue was already full"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+class ConcurrencyLimiter:
+    """At most ``concurrency`` holders and ``queue`` waiters, served first come first served.
+
+    A concurrency of 0 means unlimited. The mean time a slot is held feeds
+    the ``Retry-After`` estimate given to shed requests.
+    """
+
+    def __init__(self, concurrency: int, queue: int):
+        self.concurrency = concurrency
+        self.queue = queue
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._mean_hold = 0.0
+        self.admitted = 0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> float:
+        """Seconds until the queue ahead of a new arrival has likely drained"""
+        if not self.concurrency:
+            return 1.0
+        return max(1.0, self._mean_hold * (self.queued + 1) / self.concurrency)
+
+    async def acquire(self, timeout: float) -> None:
+        if not self.concurrency or (self.active < self.concurrency and not self._waiters):
+            self.active += 1
+            self.admitted += 1
+            return
+        if self.queued >= self.queue:
+            raise Overloaded("queue_full", self.retry_after())
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except asyncio.TimeoutError:
+            if not (waiter.done() and not waiter.cancelled()):
+                waiter.cancel()
+                self._discard(waiter)
+                raise Overloaded("queue_timeout", self.retry_after())
+            # Handed a slot just as the wait ran out: take it after all
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                # Cancelled after being handed a slot: pass it on
+                self._hand_off()
+            else:
+                waiter.cancel()
+                self._discard(waiter)
+            raise
+        self.admitted += 1
+
+    def _discard(self, waiter: asyncio.Future) -> None:
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def _hand_off(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # The slot passes straight to the next waiter; active is unchanged
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def release(self, held: float) -> None:
+        # Exponential moving average; recent requests matter most
+        self._mean_hold = held if not self._mean_hold else 0.8 * self._mean_hold + 0.2 * held
+        self._hand_off()
+
+class TokenBuckets:
+    """Per-client token buckets: ``rate`` requests per second with bursts of ``burst``"""
+
+    def __init__(self, rate: float, burst: float, max_clients: int = ADMISSION_MAX_CLIENTS):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def take(self, client: str, now: Optional[float] = None) -> float:
+        """Spend one token; returns 0 when allowed, else seconds until a token is available"""
+        now = time.monotonic() if now is None else now
+        tokens, updated = self._buckets.pop(client, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens >= 1.0:
+            tokens -= 1.0
+            wait = 0.0
+        else:
+            wait = (1.0 - tokens) / self.rate
+        self._buckets[client] = (tokens, now)
+        if len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return wait
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+class EndpointClass:
+    """Requests matched by method and path pattern that share one capacity pool"""
+
+    def __init__(self, name: str, methods: Tuple[str, ...], pattern: str,
+                 concurrency: int, queue: int, rate: float = 0.0, burst: float = 0.0):
+        self.name = name
+        self.methods = methods
+        self.pattern = re.compile(pattern)
+        self.limiter = ConcurrencyLimiter(concurrency, queue)
+        self.buckets = TokenBuckets(rate, burst or rate) if rate > 0 else None
+        self.rejected: Dict[str, int] = {}
+
+    def matches(self, method: str, path: str) -> bool:
+        return (not self.methods or method in self.methods) and self.pattern.match(path) is not None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "concurrency": self.limiter.concurrency or None,
+            "queue": self.limiter.queue,
+            "active": self.limiter.active,
+            "queued": self.limiter.queued,
+            "admitted": self.limiter.admitted,
+            "rejected": dict(self.rejected),
+            "rate_per_client": self.buckets.rate if self.buckets else None,
+            "burst_per_client": self.buckets.burst if self.buckets else None,
+            "clients": len(self.buckets) if self.buckets else 0
+        }
+
+def _endpoint_class(name: str, methods: Tuple[str, ...], pattern: str, concurrency: int, queue: int,
+                    rate: float = 0.0, burst: float = 0.0) -> EndpointClass:
+    """Endpoint class with ADMISSION_<NAME>_CONCURRENCY/_QUEUE/_RATE/_BURST overrides"""
+    prefix = f"ADMISSION_{name.upper()}_"
+    return EndpointClass(
+        name,
+        methods,
+        pattern,
+        concurrency=int(os.getenv(prefix + "CONCURRENCY", str(concurrency))),
+        queue=int(os.getenv(prefix + "QUEUE", str(queue))),
+        rate=float(os.getenv(prefix + "RATE", str(rate))),
+        burst=float(os.getenv(prefix + "BURST", str(burst)))
+    )
+
+def default_classes() -> List[EndpointClass]:
+    """The first matching class wins.
+
+    Probes, result reads, image renders, uploads and inference each get
+    capacity of their own. Only the cheap probes are in ``health``; the
+    detailed health report does database work and counts as a read.
+    """
+    return [
+        _endpoint_class("health", ("GET", "HEAD"), r"^/(api/health(/live|/ready)?|metrics)$", 32, 128),
+        _endpoint_class("events", ("GET",), r"^/api/.*/events$", 256, 0),
+        _endpoint_class("upload", ("POST",), r"^/api/upload(/|$)", 4, 8, rate=2, burst=10),
+        _endpoint_class("inference", ("POST",), r"^/api/inference(/|$)", 16, 64, rate=10, burst=30),
+        # Thumbnails, tiles and originals; a cold study can cost a full decode and render
+        _endpoint_class("images", ("GET", "HEAD"), r"^/api/images/", 8, 64),
+        _endpoint_class("read", ("GET", "HEAD"), r"^/", 64, 256),
+        _endpoint_class("write", (), r"^/", 8, 32),
+    ]
+
+def client_key(scope: Scope, trust_forwarded: bool = ADMISSION_TRUST_FORWARDED) -> str:
+    if trust_forwarded:
+        forwarded = Headers(scope=scope).get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+class AdmissionController:
+    """Decides, per request, whether to admit it, queue it briefly or shed it"""
+
+    def __init__(self, classes: Optional[List[EndpointClass]] = None, enabled: bool = ADMISSION_ENABLED,
+                 queue_timeout: float = ADMISSION_QUEUE_TIMEOUT, trust_forwarded: bool = ADMISSION_TRUST_FORWARDED):
+        self.classes = classes if classes is not None else default_classes()
+        self.enabled = enabled
+        self.queue_timeout = queue_timeout
+        self.trust_forwarded = trust_forwarded
+
+    def classify(self, method: str, path: str) -> Optional[EndpointClass]:
+        for endpoint_class in self.classes:
+            if endpoint_class.matches(method, path):
+                return endpoint_class
+        return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "queue_timeout_seconds": self.queue_timeout,
+            "classes": {endpoint_class.name: endpoint_class.get_stats() for endpoint_class in self.classes}
+        }
+
+admission = AdmissionController()
+
+def _reject(endpoint_class: EndpointClass, status_code: int, reason: str, retry_after: float) -> JSONResponse:
+    endpoint_class.rejected[reason] = endpoint_class.rejected.get(reason, 0) + 1
+    ADMISSION_REJECTED.labels(endpoint_class.name, reason).inc()
+    detail = "Too many requests" if status_code == 429 else "Server busy"
+    return JSONResponse(
+        status_code=status_code,
+        content={"detail": f"{detail}, retry later", "reason": reason},
+        headers={"Retry-After": str(math.ceil(retry_after))}
+    )
+
+class AdmissionMiddleware:
+    """Apply the controller's limits before any other work is done for a request.
+
+    Over the client's rate a request gets 429; when its class has no free
+    slot and the queue is full, or no slot frees up within the queue
+    timeout, it gets 503. Both carry ``Retry-After``.
+    """
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController = admission):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        # CORS preflights are answered without touching the app; never queue or shed them
+        if scope["type"] != "http" or not self.controller.enabled or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+        endpoint_class = self.controller.classify(scope["method"], scope["path"])
+        if endpoint_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        if endpoint_class.buckets is not None:
+            wait = endpoint_class.buckets.take(client_key(scope, self.controller.trust_forwarded))
+            if wait:
+                await _reject(endpoint_class, 429, "rate_limited", wait)(scope, receive, send)
+                return
+
+        queued_at = time.perf_counter()
+        try:
+            await endpoint_class.limiter.acquire(self.controller.queue_timeout)
+        except Overloaded as e:
+            logger.debug("Shed %s %s: %s", scope["method"], scope["path"], e.reason)
+            await _reject(endpoint_class, 503, e.reason, e.retry_after)(scope, receive, send)
+            return
+        admitted_at = time.perf_counter()
+        ADMISSION_QUEUE_SECONDS.labels(endpoint_class.name).observe(admitted_at - queued_at)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            endpoint_class.limiter.release(time.perf_counter() - admitted_at)
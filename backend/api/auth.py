@@ -0,0 +1,16 @@
+import hmac
+import os
+from typing import Optional
+
+from fastapi import Header, HTTPException
+
+# Shared secret for administrative endpoints; while unset they are disabled
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+def require_admin(authorization: Optional[str] = Header(None)) -> None:
+    """Dependency for administrative endpoints: ``Authorization: Bearer <ADMIN_TOKEN>``"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Administrative endpoints are disabled; set ADMIN_TOKEN")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.strip().encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Admin token required", headers={"WWW-Authenticate": "Bearer"})
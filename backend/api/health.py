@@ -1,8 +1,17 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
-from backend.storage.database import get_db
-from backend.ai.mock import MockMammographyClassifier
+from backend.storage.blobs import blob_store
+from backend.storage.database import get_db, study_cache
+from backend.ai.model import FAILED, model
+from backend.ai.preprocess import preprocessor
+from backend.api.admission import admission
+from backend.api.inference import inference_ready
+from backend.logging_config import get_logging_stats
+from backend.storage.maintenance import maintenance
+from backend.storage.timeline import timeline
+from backend.workers import get_worker_memory, memory_usage
 import logging
 
 logger = logging.getLogger(__name__)
@@ -17,26 +26,55 @@ async def health_check():
         "version": "1.0.0"
     }
 
+@router.get("/health/live")
+async def liveness_check():
+    """Liveness probe: the process is up and serving; never touches the model or database"""
+    return {"status": "alive"}
+
+@router.get("/health/ready")
+async def readiness_check(db: AsyncSession = Depends(get_db)):
+    """Readiness probe: 200 only once the model is warm and the database answers.
+    
+    Load balancers should route traffic on this rather than /health so new
+    instances receive no requests until the warm-up inference has run.
+    """
+    checks = {"model": model.state, "database": "ok"}
+    try:
+        await db.execute(text("SELECT 1"))
+    except Exception as e:
+        logger.error("Database readiness check failed: %s", e)
+        checks["database"] = "unavailable"
+    
+    if inference_ready() and checks["database"] == "ok":
+        return {"status": "ready", "checks": checks}
+    headers = {} if model.state == FAILED else {"Retry-After": "1"}
+    return JSONResponse(status_code=503, content={"status": "not_ready", "checks": checks}, headers=headers)
+
+@router.get("/health/workers")
+async def worker_memory():
+    """Memory per worker process (RSS, PSS, USS) and totals.
+    
+    Under the pre-fork master every sibling worker is listed; the PSS total
+    is what the deployment really costs, since pages shared copy-on-write
+    (such as the preloaded model) are split between workers rather than
+    counted once per worker as RSS does.
+    """
+    return get_worker_memory()
+
 @router.get("/health/detailed")
-async def detailed_health_check(db: Session = Depends(get_db)):
+async def detailed_health_check(db: AsyncSession = Depends(get_db)):
     """Detailed health check with database and AI model status"""
     try:
         # Test database connection
-        db.execute(text("SELECT 1"))
+        await db.execute(text("SELECT 1"))
         db_status = "healthy"
     except Exception as e:
-        logger.error(f"Database health check failed: {str(e)}")
+        logger.error("Database health check failed: %s", e)
         db_status = "unhealthy"
     
-    # Test AI model
-    try:
-        classifier = MockMammographyClassifier()
-        model_info = classifier.get_model_info()
-        ai_status = "healthy"
-    except Exception as e:
-        logger.error(f"AI model health check failed: {str(e)}")
-        ai_status = "unhealthy"
-        model_info = None
+    # The shared model instance; loading happens once, in the app lifespan
+    model_info = model.get_model_info()
+    ai_status = "healthy" if inference_ready() else "unhealthy" if model.state == FAILED else "starting"
     
     return {
         "status": "healthy" if db_status == "healthy" and ai_status == "healthy" else "degraded",
@@ -45,6 +83,15 @@ async def detailed_health_check(db: Session = Depends(get_db)):
             "ai_model": ai_status
         },
         "ai_model_info": model_info,
+        "model": model.get_stats(),
+        "study_cache": study_cache.get_stats(),
+        "preprocessing": preprocessor.get_stats(),
+        "logging": get_logging_stats(),
+        "timeline": timeline.get_stats(),
+        "storage": blob_store.get_stats(),
+        "maintenance": maintenance.get_stats(),
+        "admission": admission.get_stats(),
+        "memory": memory_usage(),
         "service": "AI Medical Imaging - Starter Kit",
         "version": "1.0.0"
     } 
\ No newline at end of file
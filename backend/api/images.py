@@ -0,0 +1,114 @@
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import Response
+from sqlalchemy.ext.asyncio import AsyncSession
+import logging
+import mimetypes
+import os
+from typing import Any, Awaitable, Callable, Dict
+
+import anyio
+
+from backend.api.responses import blob_response, file_response
+from backend.storage.blobs import blob_store
+from backend.storage.database import get_db, get_study
+from backend.storage.pyramid import derived_images, THUMBNAIL_SIZES
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+async def _load_study(db: AsyncSession, study_id: str) -> Dict[str, Any]:
+    study = await get_study(db, study_id)
+    if not study:
+        logger.warning("❌ Study not found: %s", study_id)
+        raise HTTPException(status_code=404, detail="Study not found")
+    if not study.get("file_path") or not await anyio.to_thread.run_sync(blob_store.exists, study["file_path"]):
+        logger.warning("❌ Image file missing for study: %s", study_id)
+        raise HTTPException(status_code=404, detail="Image not found")
+    return study
+
+def _image_key(study: Dict[str, Any]) -> str:
+    # Content-addressed where possible so identical images render once
+    return study.get("content_hash") or f"study-{study['study_id']}"
+
+async def _derived(db: AsyncSession, study_id: str, render: Callable[..., Awaitable[str]], *args: Any) -> str:
+    """Render one of a study's derived images on first use and return the image key"""
+    study = await _load_study(db, study_id)
+    key = _image_key(study)
+    try:
+        await render(key, study["file_path"], *args)
+    except Exception as e:
+        logger.error("❌ Failed to render images for study %s: %s", study_id, e)
+        raise HTTPException(status_code=415, detail="Image cannot be rendered")
+    return key
+
+@router.get("/images/{study_id}/thumbnail")
+async def get_thumbnail(
+    study_id: str,
+    request: Request,
+    size: int = Query(256, description=f"One of {', '.join(map(str, THUMBNAIL_SIZES))}"),
+    db: AsyncSession = Depends(get_db)
+) -> Response:
+    """JPEG thumbnail of a study's image, bounded to ``size`` pixels"""
+    if size not in THUMBNAIL_SIZES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid thumbnail size. Allowed: {', '.join(map(str, THUMBNAIL_SIZES))}"
+        )
+    key = await _derived(db, study_id, derived_images.thumbnail, size)
+    return file_response(
+        request,
+        derived_images.thumbnail_path(key, size),
+        "image/jpeg",
+        f'"{key}-thumbnail-{size}"'
+    )
+
+@router.get("/images/{study_id}/pyramid.dzi")
+async def get_pyramid_descriptor(
+    study_id: str,
+    request: Request,
+    db: AsyncSession = Depends(get_db)
+) -> Response:
+    """DeepZoom descriptor; tiles are served from ``pyramid_files/``"""
+    key = await _derived(db, study_id, derived_images.pyramid)
+    return file_response(
+        request,
+        derived_images.descriptor_path(key),
+        "application/xml",
+        f'"{key}-dzi"'
+    )
+
+@router.get("/images/{study_id}/pyramid_files/{level}/{tile}.jpg")
+async def get_pyramid_tile(
+    study_id: str,
+    level: int,
+    tile: str,
+    request: Request,
+    db: AsyncSession = Depends(get_db)
+) -> Response:
+    """One DeepZoom tile, addressed as ``{level}/{col}_{row}.jpg``"""
+    col, _, row = tile.partition("_")
+    if not (col.isdigit() and row.isdigit()) or level < 0:
+        raise HTTPException(status_code=404, detail="Tile not found")
+    key = await _derived(db, study_id, derived_images.pyramid)
+    path = derived_images.tile_path(key, level, int(col), int(row))
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Tile not found")
+    return file_response(request, path, "image/jpeg", f'"{key}-{level}-{col}-{row}"')
+
+@router.get("/images/{study_id}/original")
+async def get_original(
+    study_id: str,
+    request: Request,
+    db: AsyncSession = Depends(get_db)
+) -> Response:
+    """The uploaded file as stored, with byte-range support for large downloads"""
+    study = await _load_study(db, study_id)
+    media_type = (
+        study.get("content_type")
+        or mimetypes.guess_type(study["file_path"])[0]
+        or "application/octet-stream"
+    )
+    # Lossless recompression keeps the pixels but changes the bytes, and so the tag
+    etag = f'"{_image_key(study)}-r"' if study.get("recompressed_at") else f'"{_image_key(study)}"'
+    return await blob_response(request, blob_store, study["file_path"], media_type, etag)
@@ -1,41 +1,467 @@
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import BaseModel, Field
+import asyncio
+import json
 import logging
+import os
 import time
-from typing import Dict, Any
+import uuid
+from typing import Dict, Any, List, Optional, Tuple
 
-from backend.ai.mock import MockMammographyClassifier
-from backend.storage.database import get_db, get_study, update_study_analysis
+from backend.api.responses import conditional_json
+from backend.api.schemas import AnalysisResult
+from backend.ai.executor import InferencePool
+from backend.ai.jobs import Job, JobManager, COMPLETED, FINISHED_STATES
+from backend.ai.model import FAILED, classifier_factory, model
+from backend.ai.preprocess import preprocessor
+from backend.ai.scheduler import BatchScheduler
+from backend.storage.database import (
+    AsyncSessionLocal,
+    get_cached_result,
+    get_cached_results,
+    get_db,
+    get_studies,
+    get_study,
+    purge_stale_cache,
+    save_cached_result,
+    save_cached_results,
+    update_studies_analysis,
+    update_study_analysis
+)
+from backend.storage.timeline import timeline
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# Initialize AI classifier
-classifier = MockMammographyClassifier()
+# Micro-batching configuration
+INFERENCE_MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "8"))
+INFERENCE_MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "10"))
 
-@router.post("/inference/{study_id}")
+# Execution mode: "thread" runs batches in-process, "process" in a pool of warm workers
+INFERENCE_EXECUTOR = os.getenv("INFERENCE_EXECUTOR", "thread").lower()
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", str(os.cpu_count() or 1)))
+INFERENCE_THREADS_PER_WORKER = int(os.getenv("INFERENCE_THREADS_PER_WORKER", "1"))
+
+# Background job configuration
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", "600"))
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))
+
+# Batch analysis configuration
+MAX_BATCH_STUDIES = int(os.getenv("MAX_BATCH_STUDIES", "10000"))
+BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "64"))
+
+# The shared classifier is built and warmed up by start_inference, not at import
+worker_pool = None
+if INFERENCE_EXECUTOR == "process":
+    worker_pool = InferencePool(
+        classifier_factory(),
+        workers=INFERENCE_WORKERS,
+        threads_per_worker=INFERENCE_THREADS_PER_WORKER
+    )
+
+# Concurrent analysis requests are batched in front of the classifier
+scheduler = BatchScheduler(
+    model,
+    max_batch_size=INFERENCE_MAX_BATCH_SIZE,
+    max_wait_ms=INFERENCE_MAX_WAIT_MS,
+    pool=worker_pool,
+    max_concurrent_batches=INFERENCE_WORKERS if worker_pool else 1
+)
+
+# Background analysis jobs, deduplicated per study
+jobs = JobManager(retention_seconds=JOB_RETENTION_SECONDS)
+
+# Model load and warm-up, started by start_inference; readiness waits on it
+_warming: Optional[asyncio.Task] = None
+
+async def _warm_up_inference() -> bool:
+    """Load and warm up the model, then everything that needs it"""
+    if not await model.load():
+        return False
+    try:
+        # Cached results are keyed by model version, so an upgrade invalidates them
+        async with AsyncSessionLocal() as db:
+            await purge_stale_cache(db, model.version)
+    except Exception as e:
+        logger.warning("⚠️ Could not purge stale cached results: %s", e)
+    if worker_pool is not None:
+        logger.info("🧠 Starting %d inference worker processes", INFERENCE_WORKERS)
+        await asyncio.get_running_loop().run_in_executor(None, worker_pool.start)
+    logger.info("✅ Inference ready")
+    return True
+
+async def start_inference():
+    """Start the batching scheduler and load the model in the background.
+    
+    Returns right away so the server comes up (and answers liveness probes)
+    while the model loads; readiness and analysis wait for the warm-up.
+    """
+    global _warming
+    scheduler.start()
+    _warming = asyncio.get_running_loop().create_task(_warm_up_inference())
+
+def inference_ready() -> bool:
+    """True once the model is loaded and warmed up (and workers started, if any)"""
+    return (
+        _warming is not None and _warming.done() and not _warming.cancelled()
+        and _warming.exception() is None and _warming.result()
+    )
+
+async def wait_until_ready() -> None:
+    """Wait for the warm-up to finish; raises if the model could not be loaded"""
+    if _warming is None:
+        raise RuntimeError("Inference not started")
+    if not await asyncio.shield(_warming):
+        raise RuntimeError(f"Model failed to load: {model.error}")
+
+async def stop_inference():
+    """Cancel running jobs and preprocessing, drain the scheduler and stop worker processes"""
+    global _warming
+    if _warming is not None and not _warming.done():
+        _warming.cancel()
+        await asyncio.gather(_warming, return_exceptions=True)
+    _warming = None
+    await jobs.shutdown()
+    await preprocessor.shutdown()
+    await scheduler.stop()
+    if worker_pool is not None:
+        worker_pool.shutdown()
+    model.unload()
+
+async def _run_analysis(study: Dict[str, Any]) -> Dict[str, Any]:
+    """Classify a study and persist the result; runs as a background job"""
+    study_id = study["study_id"]
+    logger.info("🧠 Starting AI analysis for study: %s", study_id)
+    await wait_until_ready()
+    start_time = time.time()
+    content_hash = study.get("content_hash")
+    
+    # Identical image bytes analysed by the same model version need no model run
+    result = None
+    if content_hash:
+        try:
+            async with AsyncSessionLocal() as db:
+                result = await get_cached_result(db, content_hash, model.version)
+        except Exception as cache_error:
+            logger.warning("⚠️ Result cache lookup failed for study %s: %s", study_id, cache_error)
+    cached = result is not None
+    
+    if cached:
+        processing_time = time.time() - start_time
+        timeline.record(study_id, "classify", processing_time, cached=True, model_version=model.version)
+        logger.info("♻️ Cached result reused for study %s (model %s)", study_id, model.version)
+    else:
+        try:
+            # Queue for the next micro-batch, reading the preprocessed array when there is one
+            with timeline.span(study_id, "preprocess_wait"):
+                image_path = await preprocessor.resolve(study)
+            with timeline.span(study_id, "classify", cached=False) as span:
+                result = await scheduler.classify(image_path)
+                span["model_version"] = result.get("model_version")
+            processing_time = time.time() - start_time
+            
+            logger.info("✅ AI analysis completed in %.3fs", processing_time)
+            logger.info("📊 Results - Prediction: %s, Confidence: %.2f", result['prediction'], result['confidence'])
+            
+        except Exception as ai_error:
+            logger.error("❌ AI analysis failed for study %s: %s", study_id, ai_error)
+            raise RuntimeError("AI analysis failed") from ai_error
+    
+    # Update database with results; the request's session may be gone by now
+    logger.debug("💾 Updating database with AI results: %s", study_id)
+    try:
+        with timeline.span(study_id, "result_committed"):
+            async with AsyncSessionLocal() as db:
+                if content_hash and not cached:
+                    await save_cached_result(
+                        db=db,
+                        content_hash=content_hash,
+                        model_version=result.get("model_version") or model.version,
+                        prediction=result.get("prediction"),
+                        confidence=result.get("confidence"),
+                        processing_time=processing_time,
+                        regions=result.get("regions", []),
+                        image_quality=result.get("image_quality")
+                    )
+                await update_study_analysis(
+                    db=db,
+                    study_id=study_id,
+                    prediction=result.get("prediction"),
+                    confidence=result.get("confidence"),
+                    processing_time=processing_time,
+                    regions=result.get("regions", []),
+                    model_version=result.get("model_version"),
+                    image_quality=result.get("image_quality")
+                )
+        logger.info("✅ Database updated successfully: %s", study_id)
+        
+    except Exception as db_error:
+        logger.error("❌ Failed to update database for study %s: %s", study_id, db_error)
+        # An unsaved result must not be reported as an analysis
+        raise RuntimeError("Failed to save analysis results") from db_error
+    
+    return {
+        "study_id": study_id,
+        "status": "analyzed",
+        "prediction": result["prediction"],
+        "confidence": result["confidence"],
+        "processing_time": processing_time,
+        "regions": result["regions"],
+        "model_version": result["model_version"],
+        "image_quality": result.get("image_quality"),
+        "cached": cached,
+        "message": "Analysis completed successfully"
+    }
+
+def _job_links(job) -> Dict[str, str]:
+    return {
+        "status_url": f"/api/inference/jobs/{job.job_id}",
+        "events_url": f"/api/inference/jobs/{job.job_id}/events"
+    }
+
+class BatchInferenceRequest(BaseModel):
+    """Studies to (re-)analyze in one batch job"""
+    study_ids: List[str] = Field(..., min_length=1, max_length=MAX_BATCH_STUDIES)
+    force: bool = Field(False, description="Re-run studies that already have results, bypassing the result cache")
+
+async def _timed_classify(study: Dict[str, Any]) -> Tuple[Dict[str, Any], float]:
+    study_id = study["study_id"]
+    start_time = time.time()
+    with timeline.span(study_id, "preprocess_wait"):
+        image_path = await preprocessor.resolve(study)
+    with timeline.span(study_id, "classify", cached=False) as span:
+        result = await scheduler.classify(image_path)
+        span["model_version"] = result.get("model_version")
+    return result, time.time() - start_time
+
+async def _await_other_job(study_id: str) -> Dict[str, Any]:
+    """Outcome of the job another request is already running for a study"""
+    job = jobs.get_active(study_id)
+    if job is not None:
+        await job.wait()
+    if job is None or job.status != COMPLETED:
+        return {"study_id": study_id, "status": "failed", "error": "AI analysis failed"}
+    result = job.result or {}
+    return {
+        "study_id": study_id,
+        "status": "analyzed",
+        "prediction": result.get("prediction"),
+        "confidence": result.get("confidence"),
+        "model_version": result.get("model_version"),
+        "cached": bool(result.get("cached"))
+    }
+
+async def _analyze_chunk(chunk: List[Dict[str, Any]], force: bool) -> List[Dict[str, Any]]:
+    """Classify a chunk of studies and write all results back in bulk.
+    
+    Each study is registered as a per-study job first, so single analysis
+    requests arriving meanwhile attach to it. Studies that already have a
+    job in flight are not classified again; their job's outcome is awaited.
+    """
+    members: Dict[str, Job] = {}
+    busy = []
+    for study in chunk:
+        member = jobs.adopt(study["study_id"])
+        if member is None:
+            busy.append(study["study_id"])
+        else:
+            members[study["study_id"]] = member
+    
+    try:
+        outcomes = await _classify_chunk([study for study in chunk if study["study_id"] in members], force)
+    except BaseException:
+        for member in members.values():
+            jobs.settle(member, error="AI analysis failed")
+        raise
+    for outcome in outcomes:
+        member = members[outcome["study_id"]]
+        if outcome["status"] == "analyzed":
+            jobs.settle(member, result=outcome.pop("result"))
+        else:
+            jobs.settle(member, error=outcome["error"])
+    
+    outcomes += await asyncio.gather(*(_await_other_job(study_id) for study_id in busy))
+    return outcomes
+
+async def _classify_chunk(chunk: List[Dict[str, Any]], force: bool) -> List[Dict[str, Any]]:
+    """Classify studies (or reuse cached results) and write all results back in one transaction"""
+    cached = {}
+    if not force:
+        async with AsyncSessionLocal() as db:
+            cached = await get_cached_results(db, [study.get("content_hash") for study in chunk], model.version)
+    
+    to_classify = [study for study in chunk if study.get("content_hash") not in cached]
+    # The scheduler folds these concurrent calls into micro-batches
+    classified = await asyncio.gather(
+        *(_timed_classify(study) for study in to_classify),
+        return_exceptions=True
+    )
+    outcomes_by_study = dict(zip((study["study_id"] for study in to_classify), classified))
+    
+    outcomes, updates, cache_entries = [], [], []
+    for study in chunk:
+        study_id = study["study_id"]
+        if study_id in outcomes_by_study:
+            outcome = outcomes_by_study[study_id]
+            if isinstance(outcome, BaseException):
+                logger.error("❌ AI analysis failed for study %s: %s", study_id, outcome)
+                outcomes.append({"study_id": study_id, "status": "failed", "error": "AI analysis failed"})
+                continue
+            result, processing_time = outcome
+            from_cache = False
+            if study.get("content_hash"):
+                cache_entries.append({
+                    "content_hash": study["content_hash"],
+                    "model_version": result.get("model_version") or model.version,
+                    "prediction": result.get("prediction"),
+                    "confidence": result.get("confidence"),
+                    "processing_time": processing_time,
+                    "regions": result.get("regions", []),
+                    "image_quality": result.get("image_quality")
+                })
+        else:
+            result, processing_time, from_cache = cached[study["content_hash"]], 0.0, True
+            timeline.record(study_id, "classify", 0.0, cached=True, model_version=result.get("model_version"))
+        
+        updates.append({
+            "id": study["id"],
+            "study_id": study_id,
+            "prediction": result.get("prediction"),
+            "confidence": result.get("confidence"),
+            "processing_time": processing_time,
+            "regions": result.get("regions", []),
+            "model_version": result.get("model_version"),
+            "image_quality": result.get("image_quality")
+        })
+        outcomes.append({
+            "study_id": study_id,
+            "status": "analyzed",
+            "prediction": result.get("prediction"),
+            "confidence": result.get("confidence"),
+            "model_version": result.get("model_version"),
+            "cached": from_cache,
+            # What a single analysis of the study returns, for requests attached to it
+            "result": {
+                "study_id": study_id,
+                "status": "analyzed",
+                "prediction": result.get("prediction"),
+                "confidence": result.get("confidence"),
+                "processing_time": processing_time,
+                "regions": result.get("regions", []),
+                "model_version": result.get("model_version"),
+                "image_quality": result.get("image_quality"),
+                "cached": from_cache,
+                "message": "Analysis completed successfully"
+            }
+        })
+    
+    committing_at = time.perf_counter()
+    try:
+        async with AsyncSessionLocal() as db:
+            await save_cached_results(db, cache_entries)
+            await update_studies_analysis(db, updates)
+    except Exception as db_error:
+        logger.error("❌ Failed to write batch results for %s studies: %s", len(updates), db_error)
+        for outcome in outcomes:
+            if outcome["status"] == "analyzed":
+                outcome.update(status="failed", error="Failed to save results")
+                outcome.pop("result", None)
+                timeline.record(outcome["study_id"], "result_committed", time.perf_counter() - committing_at,
+                                level="ERROR", message=f"result committed failed: {db_error}")
+    else:
+        committed = time.perf_counter() - committing_at
+        for update in updates:
+            timeline.record(update["study_id"], "result_committed", committed, batch_size=len(updates))
+    
+    return outcomes
+
+async def _run_batch_analysis(job, study_ids: List[str], force: bool) -> Dict[str, Any]:
+    """Analyze many studies in chunks, reporting progress after each chunk"""
+    await wait_until_ready()
+    study_ids = list(dict.fromkeys(study_ids))
+    async with AsyncSessionLocal() as db:
+        studies = await get_studies(db, study_ids)
+    
+    counts = {"total": len(study_ids), "processed": 0, "analyzed": 0, "cached": 0,
+              "already_analyzed": 0, "not_found": 0, "failed": 0}
+    results: List[Dict[str, Any]] = []
+    
+    def record(outcomes: List[Dict[str, Any]]) -> None:
+        for outcome in outcomes:
+            counts["processed"] += 1
+            counts[outcome["status"]] += 1
+            if outcome.get("cached"):
+                counts["cached"] += 1
+        results.extend(outcomes)
+        job.report_progress(**counts, latest=outcomes)
+    
+    pending, skipped = [], []
+    for study_id in study_ids:
+        study = studies.get(study_id)
+        if study is None:
+            skipped.append({"study_id": study_id, "status": "not_found"})
+        elif study.get("prediction") and not force:
+            skipped.append({"study_id": study_id, "status": "already_analyzed", "prediction": study.get("prediction")})
+        else:
+            pending.append(study)
+    record(skipped)
+    
+    logger.info("🧠 Batch job %s: analyzing %d of %d studies", job.job_id, len(pending), len(study_ids))
+    for start in range(0, len(pending), BATCH_CHUNK_SIZE):
+        record(await _analyze_chunk(pending[start:start + BATCH_CHUNK_SIZE], force))
+    
+    logger.info("✅ Batch job %s finished: %s", job.job_id, counts)
+    return {**counts, "results": results}
+
+@router.post("/inference/batch", status_code=202)
+async def analyze_batch(request: BatchInferenceRequest) -> Dict[str, Any]:
+    """Analyze many studies as one background job.
+    
+    Studies are fetched with IN queries, classified in chunks through the
+    micro-batching scheduler and written back with one bulk UPDATE per chunk.
+    Follow progress (with partial results) via the job's event stream.
+    """
+    logger.info("🤖 Batch analysis request for %d studies (force=%s)", len(request.study_ids), request.force)
+    if model.state == FAILED:
+        raise HTTPException(status_code=503, detail="AI model unavailable")
+    job = jobs.submit(
+        f"batch:{uuid.uuid4()}",
+        lambda job: _run_batch_analysis(job, request.study_ids, request.force)
+    )
+    return {
+        "job_id": job.job_id,
+        "status": job.status,
+        "total": len(set(request.study_ids)),
+        **_job_links(job),
+        "message": "Batch analysis started"
+    }
+
+@router.post("/inference/{study_id}", response_model=AnalysisResult, response_model_exclude_unset=True)
 async def analyze_mammogram(
     study_id: str,
-    db: Session = Depends(get_db)
+    background: bool = Query(False, description="Return 202 with a job id instead of waiting for the result"),
+    db: AsyncSession = Depends(get_db)
 ) -> Dict[str, Any]:
     """Analyze a mammogram using AI"""
-    logger.info(f"🤖 AI analysis request for study: {study_id}")
+    logger.info("🤖 AI analysis request for study: %s", study_id)
     
     try:
         # Get study from database
-        logger.info(f"📋 Retrieving study data: {study_id}")
+        logger.debug("📋 Retrieving study data: %s", study_id)
         study = await get_study(db, study_id)
         
         if not study:
-            logger.warning(f"❌ Study not found: {study_id}")
+            logger.warning("❌ Study not found: %s", study_id)
             raise HTTPException(status_code=404, detail="Study not found")
         
-        logger.info(f"✅ Study found: {study_id} - {study.get('filename', 'Unknown')}")
+        logger.debug("✅ Study found: %s - %s", study_id, study.get('filename', 'Unknown'))
         
         # Check if already analyzed
         if study.get("prediction"):
-            logger.info(f"⚠️ Study already analyzed: {study_id}")
+            logger.info("⚠️ Study already analyzed: %s", study_id)
             return {
                 "study_id": study_id,
                 "status": "already_analyzed",
@@ -44,85 +470,112 @@ async def analyze_mammogram(
                 "message": "Study already analyzed"
             }
         
-        # Perform AI analysis
-        logger.info(f"🧠 Starting AI analysis for study: {study_id}")
-        start_time = time.time()
+        if model.state == FAILED:
+            raise HTTPException(status_code=503, detail="AI model unavailable")
         
-        try:
-            # Simulate AI processing
-            result = classifier.classify(study.get("file_path", ""))
-            processing_time = time.time() - start_time
-            
-            logger.info(f"✅ AI analysis completed in {processing_time:.3f}s")
-            logger.info(f"📊 Results - Prediction: {result['prediction']}, Confidence: {result['confidence']:.2f}")
-            
-        except Exception as ai_error:
-            logger.error(f"❌ AI analysis failed for study {study_id}: {str(ai_error)}")
-            raise HTTPException(status_code=500, detail="AI analysis failed")
+        # Concurrent requests for the same study share one in-flight job
+        job = jobs.submit(study_id, lambda job: _run_analysis(study))
         
-        # Update database with results
-        logger.info(f"💾 Updating database with AI results: {study_id}")
-        try:
-            updated_study = await update_study_analysis(
-                db=db,
-                study_id=study_id,
-                prediction=result.get("prediction"),
-                confidence=result.get("confidence"),
-                processing_time=processing_time,
-                regions=result.get("regions", []),
-                model_version=result.get("model_version"),
-                image_quality=result.get("image_quality")
+        if background:
+            logger.info("📨 Analysis job %s accepted for study: %s", job.job_id, study_id)
+            return JSONResponse(
+                status_code=202,
+                content={
+                    "study_id": study_id,
+                    "job_id": job.job_id,
+                    "status": job.status,
+                    **_job_links(job),
+                    "message": "Analysis started"
+                }
             )
-            logger.info(f"✅ Database updated successfully: {study_id}")
-            
-        except Exception as db_error:
-            logger.error(f"❌ Failed to update database for study {study_id}: {str(db_error)}")
-            # Continue without database update for demo
-            updated_study = study
         
-        return {
-            "study_id": study_id,
-            "status": "analyzed",
-            "prediction": result["prediction"],
-            "confidence": result["confidence"],
-            "processing_time": processing_time,
-            "regions": result["regions"],
-            "model_version": result["model_version"],
-            "image_quality": result.get("image_quality"),
-            "message": "Analysis completed successfully"
-        }
+        await job.wait()
+        if job.status != COMPLETED:
+            raise HTTPException(status_code=500, detail="AI analysis failed")
+        return job.result
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"❌ Unexpected error during analysis for study {study_id}: {str(e)}")
+        logger.error("❌ Unexpected error during analysis for study %s: %s", study_id, e)
         raise HTTPException(status_code=500, detail="Analysis failed")
 
-@router.get("/inference/{study_id}")
+@router.get("/inference/jobs/{job_id}")
+async def get_job_status(job_id: str) -> Dict[str, Any]:
+    """Get the state of a background analysis job"""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {**job.to_dict(), **_job_links(job)}
+
+@router.get("/inference/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """Stream job state changes as Server-Sent Events until it finishes"""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def event_stream():
+        updates = job.subscribe()
+        try:
+            snapshot = job.to_dict()
+            event = snapshot["status"]
+            while True:
+                yield f"event: {event}\ndata: {json.dumps(snapshot)}\n\n"
+                if snapshot["status"] in FINISHED_STATES:
+                    return
+                try:
+                    event, snapshot = await asyncio.wait_for(updates.get(), SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ": keep-alive\n\n"
+                    snapshot = job.to_dict()
+                    event = snapshot["status"]
+        finally:
+            job.unsubscribe(updates)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/inference/{study_id}", response_model=AnalysisResult)
 async def get_analysis_result(
     study_id: str,
-    db: Session = Depends(get_db)
+    request: Request,
+    db: AsyncSession = Depends(get_db)
 ) -> Dict[str, Any]:
     """Get analysis results for a study"""
-    logger.info(f"📋 Analysis results request for study: {study_id}")
+    logger.debug("📋 Analysis results request for study: %s", study_id)
     
     try:
         study = await get_study(db, study_id)
         
         if not study:
-            logger.warning(f"❌ Study not found: {study_id}")
+            logger.warning("❌ Study not found: %s", study_id)
             raise HTTPException(status_code=404, detail="Study not found")
         
         if not study.get("prediction"):
-            logger.info(f"⚠️ Study not yet analyzed: {study_id}")
-            return {
+            job = jobs.get_active(study_id)
+            if job is not None:
+                return conditional_json(request, {
+                    "study_id": study_id,
+                    "status": "analyzing",
+                    "job_id": job.job_id,
+                    **_job_links(job),
+                    "message": "Analysis in progress"
+                })
+            
+            logger.debug("⚠️ Study not yet analyzed: %s", study_id)
+            return conditional_json(request, {
                 "study_id": study_id,
                 "status": "not_analyzed",
                 "message": "Study not yet analyzed. Use POST to trigger analysis."
-            }
+            })
         
-        logger.info(f"✅ Analysis results retrieved: {study_id}")
-        return {
+        logger.debug("✅ Analysis results retrieved: %s", study_id)
+        return conditional_json(request, {
             "study_id": study_id,
             "status": "analyzed",
             "prediction": study.get("prediction"),
@@ -132,24 +585,34 @@ async def get_analysis_result(
             "model_version": study.get("model_version"),
             "image_quality": study.get("image_quality"),
             "analysis_date": study.get("updated_at")
-        }
+        })
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"❌ Failed to get analysis results for study {study_id}: {str(e)}")
+        logger.error("❌ Failed to get analysis results for study %s: %s", study_id, e)
         raise HTTPException(status_code=500, detail="Failed to get results")
 
 @router.get("/inference/model/info")
 async def get_model_info() -> Dict[str, Any]:
     """Get AI model information"""
-    logger.info("📊 Model info request")
+    logger.debug("📊 Model info request")
     
     try:
-        model_info = classifier.get_model_info()
-        logger.info(f"✅ Model info retrieved: {model_info['name']} v{model_info['version']}")
-        return model_info
+        if not inference_ready():
+            return {"model_info": model.get_model_info(), "status": model.state}
+        model_info = model.get_model_info()
+        logger.debug("✅ Model info retrieved: %s v%s", model_info['name'], model_info['version'])
+        return {
+            "model_info": model_info,
+            "status": "loaded"
+        }
         
     except Exception as e:
-        logger.error(f"❌ Failed to get model info: {str(e)}")
-        raise HTTPException(status_code=500, detail="Failed to get model info") 
\ No newline at end of file
+        logger.error("❌ Failed to get model info: %s", e)
+        raise HTTPException(status_code=500, detail="Failed to get model info")
+
+@router.get("/inference/scheduler/stats")
+async def get_scheduler_stats() -> Dict[str, Any]:
+    """Get micro-batching statistics (batch sizes, queue wait)"""
+    return scheduler.get_stats()
@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import JSONResponse
+import logging
+from typing import Any, Dict
+
+from backend.api.auth import require_admin
+from backend.storage.maintenance import maintenance
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+@router.get("/maintenance")
+async def get_maintenance() -> Dict[str, Any]:
+    """Retention policies, schedule and the report of the last maintenance run"""
+    return maintenance.get_stats()
+
+@router.post("/maintenance/run", dependencies=[Depends(require_admin)])
+async def run_maintenance() -> Dict[str, Any]:
+    """Run maintenance now, outside the schedule, and return its report.
+    
+    Needs the admin token. Outside the off-peak window only incremental vacuuming is done.
+    """
+    logger.info("🧹 Maintenance run requested")
+    report = await maintenance.run_once(force=True)
+    if "skipped" in report:
+        return JSONResponse(status_code=409, content={"detail": report["skipped"]})
+    return report
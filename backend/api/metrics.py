@@ -0,0 +1,46 @@
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+from backend.api import inference
+from backend.logging_config import get_logging_stats
+from backend.metrics import registry, CONTENT_TYPE
+from backend.workers import memory_usage
+
+router = APIRouter()
+
+# Point-in-time values read when Prometheus scrapes
+registry.gauge(
+    "inference_queue_depth", "Images waiting for the next batch",
+    function=lambda: inference.scheduler.get_stats()["queue_depth"]
+)
+registry.gauge(
+    "inference_batches_in_flight", "Classifier batches currently running",
+    function=lambda: inference.scheduler.get_stats()["batches_in_flight"]
+)
+registry.gauge(
+    "inference_jobs_active", "Analysis jobs queued or running",
+    function=lambda: inference.jobs.get_stats()["active_jobs"]
+)
+registry.gauge(
+    "log_records_dropped", "Log records dropped because the log queue was full",
+    function=lambda: get_logging_stats()["dropped"]
+)
+
+# Memory of the worker answering the scrape; PSS is its fair share of pages shared with siblings
+registry.gauge(
+    "process_resident_memory_bytes", "Resident memory of this worker, shared pages counted in full",
+    function=lambda: memory_usage().get("rss", 0)
+)
+registry.gauge(
+    "process_proportional_memory_bytes", "Proportional set size of this worker",
+    function=lambda: memory_usage().get("pss", 0)
+)
+registry.gauge(
+    "process_unique_memory_bytes", "Memory held by this worker alone",
+    function=lambda: memory_usage().get("uss", 0)
+)
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics() -> Response:
+    """Prometheus scrape endpoint"""
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
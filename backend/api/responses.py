@@ -0,0 +1,168 @@
+import hashlib
+import os
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional, Tuple, Union
+
+import anyio
+import orjson
+from fastapi import Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+
+from backend.storage.blobs import BlobStore
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag"""
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    bare = etag[2:] if etag.startswith("W/") else etag
+    return any((tag[2:] if tag.startswith("W/") else tag) == bare for tag in candidates)
+
+# Same options as FastAPI's ORJSONResponse, the app's default response class
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+def dumps(payload: Any) -> bytes:
+    """Compact UTF-8 JSON; datetimes are written in ISO 8601 without conversion"""
+    return orjson.dumps(payload, option=ORJSON_OPTIONS)
+
+def conditional_json(request: Request, payload: Any) -> Response:
+    """Serialize a payload once, tag it, and answer 304 if the client has it.
+    
+    Responses carry ``Cache-Control: no-cache`` so clients revalidate on every
+    poll; an unchanged result then costs a 304 with no body.
+    """
+    body = dumps(payload)
+    etag = f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+# Derived images never change for a given URL, so clients may keep them forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+FILE_CHUNK_SIZE = 64 * 1024
+
+def _parse_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single ``bytes=`` range into inclusive offsets.
+    
+    Returns None when the header should be ignored (multiple ranges or a
+    unit other than bytes) and raises ValueError when it is unsatisfiable.
+    """
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    start_text, _, end_text = spec.strip().partition("-")
+    try:
+        if not start_text:
+            # Suffix range: the last N bytes
+            length = int(end_text)
+            if length <= 0:
+                raise ValueError("empty suffix range")
+            return max(0, size - length), size - 1
+        start = int(start_text)
+        end = int(end_text) if end_text else size - 1
+    except ValueError:
+        raise ValueError(f"malformed range: {range_header}")
+    if start >= size or end < start:
+        raise ValueError(f"range not satisfiable: {range_header}")
+    return start, min(end, size - 1)
+
+async def _iter_file(path: str, start: int, length: int) -> AsyncIterator[bytes]:
+    async with await anyio.open_file(path, "rb") as f:
+        await f.seek(start)
+        while length > 0:
+            chunk = await f.read(min(FILE_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+def _ranged_response(
+    request: Request,
+    size: int,
+    media_type: str,
+    etag: str,
+    cache_control: str,
+    stream: Callable[[int, int], Union[Iterator[bytes], AsyncIterator[bytes]]],
+    full: Callable[[Dict[str, str]], Response]
+) -> Response:
+    """Caching headers, 304 revalidation and single byte ranges over any byte source.
+    
+    ``stream(start, length)`` yields the bytes of a range; ``full(headers)``
+    builds the 200 response for the whole object.
+    """
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Accept-Ranges": "bytes"}
+    
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range.strip() == etag):
+        try:
+            byte_range = _parse_range(range_header, size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+        if byte_range is not None:
+            start, end = byte_range
+            length = end - start + 1
+            return StreamingResponse(
+                stream(start, length),
+                status_code=206,
+                media_type=media_type,
+                headers={
+                    **headers,
+                    "Content-Range": f"bytes {start}-{end}/{size}",
+                    "Content-Length": str(length)
+                }
+            )
+    
+    return full(headers)
+
+def file_response(
+    request: Request,
+    path: str,
+    media_type: str,
+    etag: str,
+    cache_control: str = IMMUTABLE_CACHE_CONTROL
+) -> Response:
+    """Serve a file with caching headers, 304 revalidation and byte ranges"""
+    return _ranged_response(
+        request,
+        os.path.getsize(path),
+        media_type,
+        etag,
+        cache_control,
+        lambda start, length: _iter_file(path, start, length),
+        lambda headers: FileResponse(path, media_type=media_type, headers=headers)
+    )
+
+async def blob_response(
+    request: Request,
+    store: BlobStore,
+    location: str,
+    media_type: str,
+    etag: str,
+    cache_control: str = IMMUTABLE_CACHE_CONTROL
+) -> Response:
+    """Serve a stored blob like ``file_response``, streaming it chunk by chunk from the store"""
+    path = store.filesystem_path(location)
+    if path is not None:
+        return file_response(request, path, media_type, etag, cache_control)
+    size = await anyio.to_thread.run_sync(store.size, location)
+    return _ranged_response(
+        request,
+        size,
+        media_type,
+        etag,
+        cache_control,
+        # Sync iterators are consumed in the threadpool, one chunk at a time
+        lambda start, length: store.iter_range(location, start, length),
+        lambda headers: StreamingResponse(
+            store.iter_range(location),
+            media_type=media_type,
+            headers={**headers, "Content-Length": str(size)}
+        )
+    )
@@ -0,0 +1,136 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, ConfigDict
+
+# Response models for the study-carrying endpoints. Endpoints that return a
+# pre-rendered ``conditional_json`` response use them for the OpenAPI schema
+# only; endpoints returning dicts are serialized through them by
+# pydantic-core instead of ``jsonable_encoder``.
+
+class Region(BaseModel):
+    """Region of interest in image pixel coordinates; classifiers may add keys"""
+    model_config = ConfigDict(extra="allow")
+
+    id: Optional[str] = None
+    x: float
+    y: float
+    width: float
+    height: float
+    confidence: Optional[float] = None
+    type: Optional[str] = None
+    severity: Optional[str] = None
+    description: Optional[str] = None
+
+class StudyRecord(BaseModel):
+    """One stored study with its latest analysis"""
+    id: int
+    study_id: str
+    filename: str
+    file_path: str
+    content_type: str
+    file_size: int
+    content_hash: Optional[str] = None
+    recompressed_at: Optional[datetime] = None
+    prediction: Optional[str] = None
+    confidence: Optional[float] = None
+    processing_time: Optional[float] = None
+    regions: Optional[List[Region]] = None
+    model_version: Optional[str] = None
+    image_quality: Optional[str] = None
+    processing_date: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+class StudySummary(BaseModel):
+    """Listing row: the study columns without paths and regions"""
+    study_id: str
+    filename: str
+    content_type: str
+    file_size: int
+    prediction: Optional[str] = None
+    confidence: Optional[float] = None
+    model_version: Optional[str] = None
+    image_quality: Optional[str] = None
+    processing_date: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+class StudyPage(BaseModel):
+    items: List[StudySummary]
+    count: int
+    limit: int
+    next_cursor: Optional[str] = None
+
+class RegionHit(Region):
+    """A region found by a search, with the study it belongs to"""
+    study_id: str
+    area: float
+
+class RegionPage(BaseModel):
+    items: List[RegionHit]
+    count: int
+    limit: int
+    next_cursor: Optional[str] = None
+
+class AnalysisResult(BaseModel):
+    """Analysis state of a study; which fields are present depends on ``status``"""
+    study_id: str
+    status: str
+    prediction: Optional[str] = None
+    confidence: Optional[float] = None
+    processing_time: Optional[float] = None
+    regions: Optional[List[Region]] = None
+    model_version: Optional[str] = None
+    image_quality: Optional[str] = None
+    analysis_date: Optional[datetime] = None
+    cached: Optional[bool] = None
+    job_id: Optional[str] = None
+    status_url: Optional[str] = None
+    events_url: Optional[str] = None
+    message: Optional[str] = None
+
+class TimelineEvent(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    study_id: str
+    stage: Optional[str] = None
+    duration_ms: Optional[float] = None
+    details: Optional[dict] = None
+    timestamp: datetime
+
+class StudyTimeline(BaseModel):
+    study_id: str
+    events: List[TimelineEvent]
+    count: int
+    total_ms: float
+    stages: Dict[str, float]
+
+class ConfidenceBucket(BaseModel):
+    min: float
+    max: float
+    studies: int
+
+class ModelStats(BaseModel):
+    model_version: Optional[str] = None
+    studies: int
+    mean_confidence: Optional[float] = None
+    mean_processing_time: Optional[float] = None
+
+class DayStats(BaseModel):
+    day: str
+    studies: int
+    predictions: Dict[str, int]
+    models: List[ModelStats]
+
+class ScreeningStats(BaseModel):
+    start: str
+    end: str
+    model_version: Optional[str] = None
+    studies: int
+    analyzed: int
+    predictions: Dict[str, int]
+    image_quality: Dict[str, int]
+    confidence_histogram: List[ConfidenceBucket]
+    models: List[ModelStats]
+    days: List[DayStats]
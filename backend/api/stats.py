@@ -0,0 +1,48 @@
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import Response
+from sqlalchemy.ext.asyncio import AsyncSession
+import logging
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+
+from backend.api.responses import conditional_json
+from backend.api.schemas import ScreeningStats
+from backend.storage.database import get_db, get_study_stats
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Longest window one request may aggregate, in days
+MAX_STATS_DAYS = 366
+
+@router.get("/stats", response_model=ScreeningStats)
+async def get_stats(
+    request: Request,
+    start: Optional[date] = Query(None, description="First UTC day, YYYY-MM-DD; defaults to days before end"),
+    end: Optional[date] = Query(None, description="Last UTC day, inclusive; defaults to today"),
+    days: int = Query(30, ge=1, le=MAX_STATS_DAYS, description="Window length when start is omitted"),
+    model_version: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_db)
+) -> Response:
+    """Screening statistics over a window of days.
+
+    Counts by prediction (unanalyzed studies are ``pending``), image quality
+    breakdown, a confidence histogram, mean confidence and processing time
+    per model version, and the same per day. Days are the UTC day a study
+    was uploaded.
+    """
+    end = end or datetime.now(timezone.utc).date()
+    start = start or end - timedelta(days=days - 1)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    if (end - start).days >= MAX_STATS_DAYS:
+        raise HTTPException(status_code=400, detail=f"Window is limited to {MAX_STATS_DAYS} days")
+
+    try:
+        stats = await get_study_stats(db, start, end, model_version=model_version)
+    except Exception as e:
+        logger.error("❌ Failed to get stats: %s", e)
+        raise HTTPException(status_code=500, detail="Failed to get stats")
+
+    return conditional_json(request, stats)
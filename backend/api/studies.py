@@ -0,0 +1,179 @@
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import Response
+from sqlalchemy.ext.asyncio import AsyncSession
+import base64
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from backend.api.responses import conditional_json
+from backend.api.schemas import RegionPage, StudyPage, StudyTimeline
+from backend.storage.database import get_db, get_processing_logs, get_study, list_studies, search_regions
+from backend.storage.timeline import timeline
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+MAX_PAGE_SIZE = 500
+
+def _encode_cursor(key: Tuple[Any, int]) -> str:
+    """Opaque cursor for the (sort value, id) key of a page's last row"""
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor: str, sort_type: Any = str) -> Tuple[Any, int]:
+    try:
+        value, row_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(value, sort_type) or isinstance(value, bool) or not isinstance(row_id, int):
+            raise ValueError("unexpected cursor contents")
+        return value, row_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@router.get("/studies", response_model=StudyPage)
+async def get_studies_page(
+    request: Request,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    prediction: Optional[str] = Query(None, description="normal, suspicious, or pending for unanalyzed studies"),
+    min_confidence: Optional[float] = Query(None, ge=0, le=1),
+    max_confidence: Optional[float] = Query(None, ge=0, le=1),
+    created_after: Optional[datetime] = Query(None),
+    created_before: Optional[datetime] = Query(None),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    db: AsyncSession = Depends(get_db)
+) -> Response:
+    """List studies with cursor pagination.
+
+    Pages are fetched by seeking past the previous page's last
+    ``(created_at, id)`` key, so every page costs the same however deep the
+    client scrolls. Follow ``next_cursor`` until it is null.
+    """
+    if min_confidence is not None and max_confidence is not None and min_confidence > max_confidence:
+        raise HTTPException(status_code=400, detail="min_confidence must not exceed max_confidence")
+
+    try:
+        items, next_key = await list_studies(
+            db,
+            limit=limit,
+            after=_decode_cursor(cursor) if cursor else None,
+            prediction=prediction,
+            min_confidence=min_confidence,
+            max_confidence=max_confidence,
+            created_after=created_after,
+            created_before=created_before,
+            ascending=order == "asc"
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("❌ Failed to list studies: %s", e)
+        raise HTTPException(status_code=500, detail="Failed to list studies")
+
+    return conditional_json(request, {
+        "items": items,
+        "count": len(items),
+        "limit": limit,
+        "next_cursor": _encode_cursor(next_key) if next_key else None
+    })
+
+@router.get("/regions", response_model=RegionPage)
+async def get_regions(
+    request: Request,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    min_confidence: Optional[float] = Query(None, ge=0, le=1),
+    max_confidence: Optional[float] = Query(None, ge=0, le=1),
+    type: Optional[str] = Query(None, description="Lesion type, e.g. mass or calcification"),
+    severity: Optional[str] = Query(None, description="low, moderate or high"),
+    min_area: Optional[float] = Query(None, ge=0, description="Minimum width x height, in square pixels"),
+    max_area: Optional[float] = Query(None, ge=0),
+    bbox: Optional[str] = Query(None, description="x_min,y_min,x_max,y_max in image pixels"),
+    contained: bool = Query(False, description="Only regions entirely inside bbox instead of overlapping it"),
+    db: AsyncSession = Depends(get_db)
+) -> Response:
+    """Search regions of interest across all studies, most confident first.
+
+    A quadrant or any other area of the image is a ``bbox``; image
+    dimensions are in each study's ``pyramid.dzi``. Each item carries its
+    ``study_id``. Follow ``next_cursor`` until it is null.
+    """
+    if min_confidence is not None and max_confidence is not None and min_confidence > max_confidence:
+        raise HTTPException(status_code=400, detail="min_confidence must not exceed max_confidence")
+    box = None
+    if bbox is not None:
+        try:
+            box = tuple(float(value) for value in bbox.split(","))
+        except ValueError:
+            box = ()
+        if len(box) != 4 or box[0] > box[2] or box[1] > box[3]:
+            raise HTTPException(status_code=400, detail="bbox must be x_min,y_min,x_max,y_max")
+
+    try:
+        items, next_key = await search_regions(
+            db,
+            limit=limit,
+            after=_decode_cursor(cursor, (int, float)) if cursor else None,
+            min_confidence=min_confidence,
+            max_confidence=max_confidence,
+            region_type=type,
+            severity=severity,
+            min_area=min_area,
+            max_area=max_area,
+            bbox=box,
+            contained=contained
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("❌ Failed to search regions: %s", e)
+        raise HTTPException(status_code=500, detail="Failed to search regions")
+
+    return conditional_json(request, {
+        "items": items,
+        "count": len(items),
+        "limit": limit,
+        "next_cursor": _encode_cursor(next_key) if next_key else None
+    })
+
+def _summarize_timeline(events: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Wall-clock span of the recorded events and time spent per stage"""
+    stages: Dict[str, float] = {}
+    starts, ends = [], []
+    for event in events:
+        duration_ms = event.get("duration_ms") or 0.0
+        ended = datetime.fromisoformat(event["timestamp"])
+        starts.append(ended - timedelta(milliseconds=duration_ms))
+        ends.append(ended)
+        if event.get("stage"):
+            stages[event["stage"]] = round(stages.get(event["stage"], 0.0) + duration_ms, 3)
+    total_ms = (max(ends) - min(starts)).total_seconds() * 1000 if events else 0.0
+    return {"total_ms": round(total_ms, 3), "stages": stages}
+
+@router.get("/studies/{study_id}/timeline", response_model=StudyTimeline)
+async def get_study_timeline(
+    study_id: str,
+    db: AsyncSession = Depends(get_db)
+) -> Dict[str, Any]:
+    """Processing timeline for a study: one event per pipeline stage, oldest first.
+
+    Events are written in batches, so the most recent ones may still be
+    buffered in memory; they are merged in here.
+    """
+    try:
+        events = await get_processing_logs(db, study_id)
+        if not events and not await get_study(db, study_id):
+            raise HTTPException(status_code=404, detail="Study not found")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("❌ Failed to get timeline for study %s: %s", study_id, e)
+        raise HTTPException(status_code=500, detail="Failed to get timeline")
+
+    for event in timeline.pending(study_id):
+        event["timestamp"] = event["timestamp"].isoformat()
+        events.append(event)
+    events.sort(key=lambda event: event["timestamp"])
+
+    return {"study_id": study_id, "events": events, "count": len(events), **_summarize_timeline(events)}
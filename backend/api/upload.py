@@ -1,13 +1,30 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 import os
 import uuid
 import logging
+import time
 from datetime import datetime
-from typing import List
-import shutil
+from typing import Any, Dict, List, Optional
 
-from backend.storage.database import get_db, save_study
+import anyio
+
+from backend.ai.preprocess import preprocessor
+from backend.api.responses import conditional_json
+from backend.api.schemas import StudyRecord
+from backend.metrics import UPLOAD_FILES, UPLOAD_STORED_BYTES
+from backend.storage.blobs import blob_store
+from backend.storage.database import get_db, get_study, save_study, save_studies
+from backend.storage.ingest import (
+    ARCHIVE_SUFFIXES,
+    ArchiveTooLarge,
+    archive_kind,
+    extract_archive,
+    ingest_multipart,
+    MultipartError,
+    UploadTooLarge
+)
+from backend.storage.timeline import timeline
 
 logger = logging.getLogger(__name__)
 
@@ -16,75 +33,207 @@ router = APIRouter()
 # Allowed file types
 ALLOWED_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.dcm', '.dicom'}
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
+# Allowance for multipart boundaries and part headers when checking Content-Length
+MULTIPART_OVERHEAD = 64 * 1024
+
+# Bulk ingest limits
+MAX_BULK_FILES = int(os.getenv("MAX_BULK_FILES", "1000"))
+MAX_ARCHIVE_SIZE = int(os.getenv("MAX_ARCHIVE_SIZE", str(2 * 1024 * 1024 * 1024)))  # 2GB
+# Total bytes the archives in one request may expand to
+MAX_ARCHIVE_EXTRACTED_SIZE = int(os.getenv("MAX_ARCHIVE_EXTRACTED_SIZE", str(4 * 1024 * 1024 * 1024)))  # 4GB
+# Members (images or not) read from one archive; bounds work on archives of many tiny entries
+MAX_ARCHIVE_ENTRIES = int(os.getenv("MAX_ARCHIVE_ENTRIES", "10000"))
+BULK_EXTRACT_WORKERS = int(os.getenv("BULK_EXTRACT_WORKERS", "4"))
+
+# The body is parsed by hand, so describe it for the OpenAPI docs
+UPLOAD_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {"file": {"type": "string", "format": "binary"}}
+                }
+            }
+        }
+    }
+}
+
+BULK_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["files"],
+                    "properties": {
+                        "files": {
+                            "type": "array",
+                            "items": {"type": "string", "format": "binary"},
+                            "description": "Images and/or .zip/.tar(.gz) archives of images"
+                        }
+                    }
+                }
+            }
+        }
+    }
+}
+
+def _validate_extension(filename: str) -> str:
+    """Reject files whose extension is not an accepted image format"""
+    file_extension = os.path.splitext(filename)[1].lower()
+    if file_extension not in ALLOWED_EXTENSIONS:
+        logger.warning("❌ Invalid file type: %s for file: %s", file_extension, filename)
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid file type. Allowed: {', '.join(ALLOWED_EXTENSIONS)}"
+        )
+    return file_extension
 
-@router.post("/upload")
+def _staging_suffix(filename: str) -> str:
+    """Extension to keep on a staged file; the rest of the client's filename is never used in paths"""
+    lowered = filename.lower()
+    for suffix in ARCHIVE_SUFFIXES:
+        if lowered.endswith(suffix):
+            return suffix
+    return os.path.splitext(lowered)[1]
+
+def _commit(temp_path: str, sha256: str, path: str):
+    """Hand a finished file to the blob store under its content address"""
+    return blob_store.commit(temp_path, sha256, os.path.splitext(path)[1])
+
+def _file_too_large() -> HTTPException:
+    return HTTPException(
+        status_code=400,
+        detail=f"File too large. Maximum size: {MAX_FILE_SIZE // (1024*1024)}MB"
+    )
+
+def _discard_uploads(uploads) -> None:
+    """Remove what a rejected request already stored; deduplicated files belong to other studies"""
+    for upload in uploads:
+        if archive_kind(upload.path) or not upload.deduplicated:
+            blob_store.delete(upload.path)
+
+def _count_stored(upload) -> None:
+    deduplicated = "true" if upload.deduplicated else "false"
+    UPLOAD_FILES.labels(deduplicated).inc()
+    UPLOAD_STORED_BYTES.labels(deduplicated).inc(upload.size)
+
+def _record_stored(study_id: str, upload, received_at: float, saving_at: float) -> None:
+    """Timeline events for one stored file; receiving ends when the database save starts"""
+    timeline.record(study_id, "upload_received", saving_at - received_at, filename=upload.filename, size=upload.size)
+    timeline.record(study_id, "file_written", upload.write_seconds, deduplicated=upload.deduplicated)
+
+def _preprocess(study_id: str, content_hash: str, file_path: str) -> None:
+    """Decode and normalize now so analysis finds the array ready"""
+    task = preprocessor.submit(content_hash, file_path)
+    if task is None:
+        return
+    started = time.perf_counter()
+    
+    def done(task) -> None:
+        if task.cancelled():
+            return
+        if task.result() is None:
+            timeline.record(study_id, "preprocess", time.perf_counter() - started, level="WARNING",
+                            message="preprocessing failed, analysis will read the original file")
+        else:
+            timeline.record(study_id, "preprocess", time.perf_counter() - started)
+    
+    task.add_done_callback(done)
+
+@router.post("/upload", openapi_extra=UPLOAD_REQUEST_BODY)
 async def upload_mammogram(
-    file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    request: Request,
+    db: AsyncSession = Depends(get_db)
 ):
-    """Upload a mammogram image for analysis"""
-    logger.info(f"📤 Upload request received for file: {file.filename}")
+    """Upload a mammogram image for analysis.
+    
+    The multipart body is streamed straight to disk: size and SHA-256 are
+    computed in the same pass and the upload is aborted as soon as it exceeds
+    MAX_FILE_SIZE. Files are stored by content hash, so re-sent images are
+    kept once and shared by every study that references them.
+    """
+    # Reject oversized bodies before reading a single byte
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_FILE_SIZE + MULTIPART_OVERHEAD:
+        logger.warning("❌ Upload rejected by Content-Length: %s bytes", content_length)
+        raise _file_too_large()
+    
+    # Generate unique study ID
+    study_id = str(uuid.uuid4())
+    
+    def open_part(field_name: str, filename: str, content_type: str) -> Optional[str]:
+        if field_name != "file" or received:
+            return None
+        logger.info("📤 Upload request received for file: %s", filename)
+        file_extension = _validate_extension(filename)
+        logger.debug("✅ File type validated: %s", file_extension)
+        received.append(filename)
+        return blob_store.staging_path(file_extension)
     
+    received: List[str] = []
+    filename = None
+    received_at = time.perf_counter()
     try:
-        # Validate file type
-        file_extension = os.path.splitext(file.filename)[1].lower()
-        if file_extension not in ALLOWED_EXTENSIONS:
-            logger.warning(f"❌ Invalid file type: {file_extension} for file: {file.filename}")
-            raise HTTPException(
-                status_code=400,
-                detail=f"Invalid file type. Allowed: {', '.join(ALLOWED_EXTENSIONS)}"
+        try:
+            files, _ = await ingest_multipart(
+                request.headers.get("content-type", ""),
+                request.stream(),
+                open_part,
+                MAX_FILE_SIZE,
+                commit=_commit,
+                discard=blob_store.delete
             )
+        except UploadTooLarge:
+            logger.warning("❌ File too large: more than %s bytes for file: %s", MAX_FILE_SIZE, received[0])
+            raise _file_too_large()
+        except MultipartError as e:
+            logger.warning("❌ Malformed upload: %s", e)
+            raise HTTPException(status_code=400, detail=str(e))
         
-        logger.info(f"✅ File type validated: {file_extension}")
-        
-        # Validate file size
-        file.file.seek(0, 2)  # Seek to end
-        file_size = file.file.tell()
-        file.file.seek(0)  # Reset to beginning
-        
-        if file_size > MAX_FILE_SIZE:
-            logger.warning(f"❌ File too large: {file_size} bytes for file: {file.filename}")
-            raise HTTPException(
-                status_code=400,
-                detail=f"File too large. Maximum size: {MAX_FILE_SIZE // (1024*1024)}MB"
-            )
-        
-        logger.info(f"✅ File size validated: {file_size} bytes")
-        
-        # Generate unique study ID
-        study_id = str(uuid.uuid4())
-        logger.info(f"🆔 Generated study ID: {study_id}")
-        
-        # Create uploads directory if it doesn't exist
-        os.makedirs("uploads", exist_ok=True)
-        
-        # Save file
-        file_path = f"uploads/{study_id}_{file.filename}"
-        logger.info(f"💾 Saving file to: {file_path}")
-        
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        if not files:
+            raise HTTPException(status_code=422, detail="Field 'file' is required")
         
-        logger.info(f"✅ File saved successfully: {file_path}")
+        upload = files[0]
+        filename = upload.filename
+        file_path = upload.path
+        logger.debug("🆔 Generated study ID: %s", study_id)
+        if upload.deduplicated:
+            logger.info("♻️ Identical file already stored, reusing: %s", file_path)
+        else:
+            logger.info("✅ File saved successfully: %s (%d bytes)", file_path, upload.size)
         
         # Save to database
-        logger.info(f"💾 Saving study metadata to database")
+        logger.debug("💾 Saving study metadata to database")
+        saving_at = time.perf_counter()
         study_data = await save_study(
             db=db,
             study_id=study_id,
-            filename=file.filename,
+            filename=filename,
             file_path=file_path,
-            content_type=file.content_type,
-            file_size=file_size
+            content_type=upload.content_type,
+            file_size=upload.size,
+            content_hash=upload.sha256
         )
         
-        logger.info(f"✅ Study saved to database: {study_id}")
+        logger.info("✅ Study saved to database: %s", study_id)
+        
+        _count_stored(upload)
+        _record_stored(study_id, upload, received_at, saving_at)
+        timeline.record(study_id, "db_saved", time.perf_counter() - saving_at)
+        _preprocess(study_id, upload.sha256, file_path)
         
         return {
             "study_id": study_id,
-            "filename": file.filename,
-            "file_size": file_size,
-            "content_type": file.content_type,
+            "filename": filename,
+            "file_size": upload.size,
+            "content_type": upload.content_type,
+            "sha256": upload.sha256,
+            "deduplicated": upload.deduplicated,
             "status": "uploaded",
             "message": "File uploaded successfully"
         }
@@ -92,28 +241,190 @@ async def upload_mammogram(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"❌ Upload failed for file {file.filename}: {str(e)}")
+        logger.error("❌ Upload failed for file %s: %s", filename, e)
         raise HTTPException(status_code=500, detail="Upload failed")
 
-@router.get("/upload/{study_id}")
+@router.get("/upload/{study_id}", response_model=StudyRecord)
 async def get_upload_status(
     study_id: str,
-    db: Session = Depends(get_db)
+    request: Request,
+    db: AsyncSession = Depends(get_db)
 ):
     """Get upload status for a study"""
-    logger.info(f"📋 Status request for study: {study_id}")
+    logger.debug("📋 Status request for study: %s", study_id)
     
     try:
         study = await get_study(db, study_id)
         if not study:
-            logger.warning(f"❌ Study not found: {study_id}")
+            logger.warning("❌ Study not found: %s", study_id)
             raise HTTPException(status_code=404, detail="Study not found")
         
-        logger.info(f"✅ Study status retrieved: {study_id}")
-        return study
+        logger.debug("✅ Study status retrieved: %s", study_id)
+        return conditional_json(request, study)
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"❌ Failed to get status for study {study_id}: {str(e)}")
-        raise HTTPException(status_code=500, detail="Failed to get status") 
\ No newline at end of file
+        logger.error("❌ Failed to get status for study %s: %s", study_id, e)
+        raise HTTPException(status_code=500, detail="Failed to get status")
+
+@router.post("/upload/bulk", openapi_extra=BULK_REQUEST_BODY)
+async def bulk_upload_mammograms(
+    request: Request,
+    db: AsyncSession = Depends(get_db)
+) -> Dict[str, Any]:
+    """Upload many mammograms, or zip/tar archives of them, in one request.
+    
+    Every accepted image becomes a study; all rows are inserted in a single
+    transaction. Invalid or oversized files are reported per file instead
+    of failing the whole request.
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_ARCHIVE_SIZE + MULTIPART_OVERHEAD:
+        logger.warning("❌ Bulk upload rejected by Content-Length: %s bytes", content_length)
+        raise HTTPException(
+            status_code=400,
+            detail=f"Request too large. Maximum size: {MAX_ARCHIVE_SIZE // (1024*1024)}MB"
+        )
+    
+    received_at = time.perf_counter()
+    results: List[Dict[str, Any]] = []
+    accepted = 0
+    
+    def reject(filename: str, reason: str) -> None:
+        results.append({"filename": filename, "status": "rejected", "error": reason})
+    
+    def accept_image(filename: str) -> Optional[str]:
+        if os.path.splitext(filename)[1].lower() not in ALLOWED_EXTENSIONS:
+            return f"Invalid file type. Allowed: {', '.join(ALLOWED_EXTENSIONS)}"
+        return None
+    
+    def open_part(field_name: str, filename: str, content_type: str):
+        nonlocal accepted
+        if field_name not in ("files", "file"):
+            return None
+        if accepted >= MAX_BULK_FILES:
+            reject(filename, "Too many files in request")
+            return None
+        staged = blob_store.staging_path(_staging_suffix(filename))
+        if archive_kind(filename):
+            return staged, MAX_ARCHIVE_SIZE
+        reason = accept_image(filename)
+        if reason:
+            reject(filename, reason)
+            return None
+        accepted += 1
+        return staged
+    
+    def commit(temp_path: str, sha256: str, path: str):
+        # Archives stay staged for extraction; images go to the blob store
+        if archive_kind(path):
+            os.replace(temp_path, path)
+            return path, False
+        return _commit(temp_path, sha256, path)
+    
+    try:
+        files, _ = await ingest_multipart(
+            request.headers.get("content-type", ""),
+            request.stream(),
+            open_part,
+            MAX_FILE_SIZE,
+            commit=commit,
+            on_reject=reject,
+            discard=blob_store.delete
+        )
+    except MultipartError as e:
+        logger.warning("❌ Malformed bulk upload: %s", e)
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    logger.info("📦 Bulk upload received %d files", len(files))
+    
+    ingested = []
+    extracted_budget = MAX_ARCHIVE_EXTRACTED_SIZE
+    for index, upload in enumerate(files):
+        if not archive_kind(upload.path):
+            ingested.append(upload)
+            continue
+        try:
+            # Members are decompressed and written by a pool of worker threads
+            members = await anyio.to_thread.run_sync(
+                extract_archive,
+                upload.path,
+                accept_image,
+                MAX_FILE_SIZE,
+                max(0, MAX_BULK_FILES - accepted),
+                _commit,
+                blob_store.staging_dir,
+                BULK_EXTRACT_WORKERS,
+                extracted_budget,
+                blob_store.delete,
+                MAX_ARCHIVE_ENTRIES
+            )
+        except ArchiveTooLarge:
+            logger.warning(
+                "❌ Bulk upload rejected: archive %s expands past %s bytes", upload.filename, MAX_ARCHIVE_EXTRACTED_SIZE
+            )
+            await anyio.to_thread.run_sync(_discard_uploads, ingested + files[index + 1:])
+            raise HTTPException(
+                status_code=413,
+                detail=f"Archives too large when extracted. Maximum size: {MAX_ARCHIVE_EXTRACTED_SIZE // (1024*1024)}MB"
+            )
+        except Exception as e:
+            logger.warning("❌ Could not read archive %s: %s", upload.filename, e)
+            reject(upload.filename, f"Unreadable archive: {str(e)}")
+            continue
+        finally:
+            await anyio.to_thread.run_sync(os.remove, upload.path)
+        
+        for name, member, error in members:
+            label = f"{upload.filename}/{name}"
+            if member is None:
+                reject(label, error)
+            else:
+                member.filename = label
+                ingested.append(member)
+                accepted += 1
+                extracted_budget -= member.size
+    
+    rows = []
+    for upload in ingested:
+        study_id = str(uuid.uuid4())
+        rows.append({
+            "study_id": study_id,
+            "filename": upload.filename,
+            "file_path": upload.path,
+            "content_type": upload.content_type,
+            "file_size": upload.size,
+            "content_hash": upload.sha256
+        })
+        results.append({
+            "filename": upload.filename,
+            "status": "uploaded",
+            "study_id": study_id,
+            "file_size": upload.size,
+            "sha256": upload.sha256,
+            "deduplicated": upload.deduplicated
+        })
+    
+    saving_at = time.perf_counter()
+    try:
+        # One transaction, one executemany for the whole request
+        await save_studies(db, rows)
+    except Exception as e:
+        logger.error("❌ Bulk upload failed to save %s studies: %s", len(rows), e)
+        raise HTTPException(status_code=500, detail="Upload failed")
+    
+    saved = time.perf_counter() - saving_at
+    for upload, row in zip(ingested, rows):
+        _count_stored(upload)
+        _record_stored(row["study_id"], upload, received_at, saving_at)
+        timeline.record(row["study_id"], "db_saved", saved, batch_size=len(rows))
+        _preprocess(row["study_id"], row["content_hash"], row["file_path"])
+    
+    logger.info("✅ Bulk upload saved %d studies, rejected %d files", len(rows), len(results) - len(rows))
+    return {
+        "total": len(results),
+        "uploaded": len(rows),
+        "rejected": len(results) - len(rows),
+        "results": results
+    }
@@ -0,0 +1,53 @@
+"""Multi-worker deployment: gunicorn master with uvicorn workers.
+
+    gunicorn backend.main:app -c backend/gunicorn_conf.py
+
+The master imports the app, creates the database schema and loads and warms
+up the model once before forking, so every worker starts with the model
+already in memory and shares those pages copy-on-write instead of loading
+its own copy. All workers use the same on-disk SQLite database (WAL mode).
+"""
+import asyncio
+import gc
+import os
+
+from backend.workers import MASTER_PID_ENV
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+# Workers size their inference thread pools from their share of the cores
+os.environ["WEB_CONCURRENCY"] = str(workers)
+worker_class = "uvicorn.workers.UvicornWorker"
+# Import the app (and everything it imports) in the master, before forking
+preload_app = True
+timeout = int(os.getenv("WORKER_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("WORKER_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+# Request logs come from the app's middleware
+accesslog = None
+
+
+def on_starting(server):
+    from backend.ai.model import model
+    from backend.storage.database import engine, init_db
+
+    os.environ[MASTER_PID_ENV] = str(os.getpid())
+
+    # One schema migration up front instead of every worker racing to run it
+    async def prepare_database():
+        await init_db()
+        # Connections must not be shared with forked workers
+        await engine.dispose()
+
+    asyncio.run(prepare_database())
+
+    if not model.preload():
+        server.log.error("Model failed to load in the master; workers will retry on startup")
+    # Keep the collector from touching (and so un-sharing) the preloaded objects
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    from backend.logging_config import restart_logging_after_fork
+
+    restart_logging_after_fork()
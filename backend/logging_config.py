@@ -0,0 +1,198 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+# Logging configuration
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_DIR = os.getenv("LOG_DIR", "logs")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# Request logs for these routes are rate-limited per route ("METHOD /template")
+LOG_SAMPLED_ROUTES = tuple(
+    route.strip()
+    for route in os.getenv(
+        "LOG_SAMPLED_ROUTES",
+        "GET /api/health,"
+        "GET /api/health/detailed,"
+        "GET /api/health/live,"
+        "GET /api/health/ready,"
+        "GET /api/upload/{study_id},"
+        "GET /api/inference/{study_id},"
+        "GET /api/inference/jobs/{job_id},"
+        "GET /api/studies,"
+        "GET /api/images/{study_id}/thumbnail,"
+        "GET /api/images/{study_id}/pyramid_files/{level}/{tile}.jpg"
+    ).split(",")
+    if route.strip()
+)
+LOG_SAMPLE_PER_SECOND = float(os.getenv("LOG_SAMPLE_PER_SECOND", "1"))
+LOG_SAMPLE_BURST = float(os.getenv("LOG_SAMPLE_BURST", "5"))
+# Requests slower than this are always logged, sampled route or not
+LOG_SLOW_REQUEST_SECONDS = float(os.getenv("LOG_SLOW_REQUEST_SECONDS", "1.0"))
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to a background listener without ever blocking the caller.
+
+    The stock ``prepare`` formats the message on the calling thread; here the
+    record is passed through untouched so ``msg % args`` and the formatters
+    run on the listener thread instead. When the queue is full the record is
+    dropped and counted rather than stalling the event loop.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _QueueListener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self) -> None:
+        # The queue may be full; wait for the writer to make room
+        self.queue.put(self._sentinel, timeout=5)
+
+
+class RouteLogSampler:
+    """Per-route token buckets for high-volume request logs.
+
+    Each listed route may log ``per_second`` lines on average with bursts of
+    up to ``burst``; the rest are counted, and the count is reported on the
+    route's next logged line.
+    """
+
+    def __init__(self, routes: Iterable[str], per_second: float = 1.0, burst: float = 5.0):
+        self.routes = frozenset(routes)
+        self.per_second = per_second
+        self.burst = max(1.0, burst)
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._suppressed: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def allow(self, route: str) -> Tuple[bool, int]:
+        """Whether to log this request, and how many were suppressed before it"""
+        if route not in self.routes:
+            return True, 0
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(route, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.per_second)
+            if tokens < 1:
+                self._buckets[route] = (tokens, now)
+                self._suppressed[route] = self._suppressed.get(route, 0) + 1
+                return False, 0
+            self._buckets[route] = (tokens - 1, now)
+            return True, self._suppressed.pop(route, 0)
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._suppressed)
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[NonBlockingQueueHandler] = None
+
+
+def setup_logging() -> logging.Logger:
+    """Route all logging through a queue drained by one background thread.
+
+    Console and rotating file handlers are attached to the listener, so
+    formatting and file I/O never run on the request path.
+    """
+    global _listener, _queue_handler
+    stop_logging()
+
+    os.makedirs(LOG_DIR, exist_ok=True)
+
+    console_formatter = logging.Formatter(
+        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+    file_formatter = logging.Formatter(
+        '%(asctime)s - %(name)s - %(levelname)s - %(funcName)s:%(lineno)d - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+
+    # Console handler
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setLevel(logging.INFO)
+    console_handler.setFormatter(console_formatter)
+
+    # File handler for all logs
+    file_handler = logging.handlers.RotatingFileHandler(
+        os.path.join(LOG_DIR, 'app.log'),
+        maxBytes=10*1024*1024,  # 10MB
+        backupCount=5
+    )
+    file_handler.setLevel(logging.DEBUG)
+    file_handler.setFormatter(file_formatter)
+
+    # Error file handler
+    error_handler = logging.handlers.RotatingFileHandler(
+        os.path.join(LOG_DIR, 'error.log'),
+        maxBytes=10*1024*1024,  # 10MB
+        backupCount=5
+    )
+    error_handler.setLevel(logging.ERROR)
+    error_handler.setFormatter(file_formatter)
+
+    _queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+    _listener = _QueueListener(
+        _queue_handler.queue,
+        console_handler,
+        file_handler,
+        error_handler,
+        respect_handler_level=True
+    )
+    _listener.start()
+
+    # The root logger only enqueues
+    logger = logging.getLogger()
+    logger.setLevel(LOG_LEVEL)
+    logger.handlers.clear()
+    logger.addHandler(_queue_handler)
+
+    # API specific logger
+    logging.getLogger('api').setLevel(logging.INFO)
+
+    return logger
+
+
+def stop_logging() -> None:
+    """Flush queued records and stop the background writer"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def restart_logging_after_fork() -> None:
+    """Start a fresh log writer in a forked worker; the parent's writer thread did not survive the fork"""
+    global _listener
+    # The inherited queue's locks may have been held mid-operation at fork time; abandon it
+    _listener = None
+    setup_logging()
+
+
+def get_logging_stats() -> Dict[str, int]:
+    if _queue_handler is None:
+        return {"queued": 0, "dropped": 0}
+    return {"queued": _queue_handler.queue.qsize(), "dropped": _queue_handler.dropped}
+
+
+atexit.register(stop_logging)
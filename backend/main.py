@@ -1,71 +1,62 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-import logging
-import logging.handlers
+from fastapi.responses import ORJSONResponse
+import contextlib
 import os
-import sys
-from datetime import datetime
+import time
 
 # Import routers
-from backend.api import upload, inference, health
-from backend.storage.database import init_db
+from backend.api import upload, inference, health, images, studies, stats, metrics, maintenance as maintenance_api
+from backend.api.admission import AdmissionMiddleware
+from backend.api.compression import CompressionMiddleware
+from backend.storage.database import init_db, close_db, DB_PATH
+from backend.storage.maintenance import maintenance
+from backend.storage.pyramid import derived_images
+from backend.storage.timeline import timeline
+from backend.logging_config import (
+    setup_logging,
+    RouteLogSampler,
+    LOG_SAMPLED_ROUTES,
+    LOG_SAMPLE_PER_SECOND,
+    LOG_SAMPLE_BURST,
+    LOG_SLOW_REQUEST_SECONDS
+)
+from backend.metrics import HTTP_IN_FLIGHT, HTTP_REQUESTS, HTTP_REQUEST_SECONDS
 
-# Configure comprehensive logging
-def setup_logging():
-    """Setup comprehensive logging configuration"""
-    # Create logs directory if it doesn't exist
-    os.makedirs("logs", exist_ok=True)
-    
-    # Configure root logger
-    logger = logging.getLogger()
-    logger.setLevel(logging.INFO)
-    
-    # Clear existing handlers
-    logger.handlers.clear()
-    
-    # Console handler with colored output
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(logging.INFO)
-    console_formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-    console_handler.setFormatter(console_formatter)
-    logger.addHandler(console_handler)
-    
-    # File handler for all logs
-    file_handler = logging.handlers.RotatingFileHandler(
-        'logs/app.log',
-        maxBytes=10*1024*1024,  # 10MB
-        backupCount=5
-    )
-    file_handler.setLevel(logging.DEBUG)
-    file_formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(funcName)s:%(lineno)d - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-    file_handler.setFormatter(file_formatter)
-    logger.addHandler(file_handler)
+# Setup logging
+logger = setup_logging()
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application startup and shutdown.
     
-    # Error file handler
-    error_handler = logging.handlers.RotatingFileHandler(
-        'logs/error.log',
-        maxBytes=10*1024*1024,  # 10MB
-        backupCount=5
-    )
-    error_handler.setLevel(logging.ERROR)
-    error_handler.setFormatter(file_formatter)
-    logger.addHandler(error_handler)
+    The model loads in the background once the database is up, so the
+    server answers liveness probes immediately and readiness once warm.
+    """
+    logger.info("🚀 Starting AI Medical Imaging application...")
+    logger.info(f"Environment: {os.getenv('ENVIRONMENT', 'development')}")
+    logger.info(f"Database path: {DB_PATH}")
     
-    # API specific logger
-    api_logger = logging.getLogger('api')
-    api_logger.setLevel(logging.INFO)
+    try:
+        await init_db()
+        logger.info("✅ Database initialized successfully")
+    except Exception as e:
+        logger.error("❌ Database initialization failed: %s", e)
+        raise
     
-    return logger
-
-# Setup logging
-logger = setup_logging()
+    timeline.start()
+    maintenance.start()
+    await inference.start_inference()
+    try:
+        yield
+    finally:
+        logger.info("🛑 Shutting down AI Medical Imaging application...")
+        await maintenance.stop()
+        await inference.stop_inference()
+        await derived_images.shutdown()
+        # Write timeline events still buffered before the connections go away
+        await timeline.stop()
+        await close_db()
 
 # Create FastAPI app
 app = FastAPI(
@@ -73,62 +64,77 @@ app = FastAPI(
     description="AI-assisted mammography screening demo with scalable architecture",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
-)
-
-# Add CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # In production, specify actual origins
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    redoc_url="/redoc",
+    # orjson for every dict an endpoint returns
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
-# Mount static files
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+# brotli/gzip for JSON and text bodies above COMPRESSION_MIN_SIZE; inside the
+# request logging middleware, so it sees each response as a single body
+app.add_middleware(CompressionMiddleware)
 
 # Include routers
 app.include_router(health.router, prefix="/api", tags=["Health"])
 app.include_router(upload.router, prefix="/api", tags=["Upload"])
 app.include_router(inference.router, prefix="/api", tags=["Inference"])
+app.include_router(images.router, prefix="/api", tags=["Images"])
+app.include_router(studies.router, prefix="/api", tags=["Studies"])
+app.include_router(stats.router, prefix="/api", tags=["Statistics"])
+app.include_router(maintenance_api.router, prefix="/api", tags=["Maintenance"])
+app.include_router(metrics.router)
 
 # Request logging middleware
+# High-volume polling routes log at most a few lines per second each
+request_log_sampler = RouteLogSampler(LOG_SAMPLED_ROUTES, LOG_SAMPLE_PER_SECOND, LOG_SAMPLE_BURST)
+
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    """Log all incoming requests"""
-    start_time = datetime.now()
-    
-    # Log request details
-    logger.info(f"Request: {request.method} {request.url.path} - Client: {request.client.host if request.client else 'unknown'}")
-    
-    # Process request
-    response = await call_next(request)
+    """Record metrics for each request and log it as one line once it completes"""
+    start_time = time.perf_counter()
+    HTTP_IN_FLIGHT.inc()
+    status_code = 500
+    try:
+        # Process request
+        response = await call_next(request)
+        status_code = response.status_code
+    finally:
+        HTTP_IN_FLIGHT.dec()
+        process_time = time.perf_counter() - start_time
+        # Label by route template so per-study URLs don't each become a series
+        route = request.scope.get("route")
+        route_path = route.path if route is not None else "unmatched"
+        HTTP_REQUEST_SECONDS.labels(request.method, route_path).observe(process_time)
+        HTTP_REQUESTS.labels(request.method, route_path, str(status_code)).inc()
     
-    # Log response details
-    process_time = (datetime.now() - start_time).total_seconds()
-    logger.info(f"Response: {response.status_code} - Duration: {process_time:.3f}s")
+    log, suppressed = request_log_sampler.allow(f"{request.method} {route_path}")
+    if log or status_code >= 400 or process_time >= LOG_SLOW_REQUEST_SECONDS:
+        logger.info(
+            "%s %s -> %d in %.3fs - Client: %s%s",
+            request.method,
+            request.url.path,
+            status_code,
+            process_time,
+            request.client.host if request.client else "unknown",
+            f" ({suppressed} similar requests not logged)" if suppressed else ""
+        )
     
     return response
 
-@app.on_event("startup")
-async def startup_event():
-    """Application startup event"""
-    logger.info("🚀 Starting AI Medical Imaging application...")
-    logger.info(f"Environment: {os.getenv('ENVIRONMENT', 'development')}")
-    logger.info(f"Database URL: {os.getenv('DATABASE_URL', 'sqlite:///:memory:')}")
-    
-    try:
-        await init_db()
-        logger.info("✅ Database initialized successfully")
-    except Exception as e:
-        logger.error(f"❌ Database initialization failed: {str(e)}")
-        raise
+# Shed overload before any other work is done for a request
+app.add_middleware(AdmissionMiddleware)
 
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Application shutdown event"""
-    logger.info("🛑 Shutting down AI Medical Imaging application...")
+# Add CORS middleware
+# Outermost, so preflights never queue for admission and 429/503 rejections
+# carry CORS headers; browsers may read Retry-After
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],  # In production, specify actual origins
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+    expose_headers=["Retry-After"],
+)
 
 # Root endpoint
 @app.get("/")
@@ -140,5 +146,6 @@ async def root():
         "version": "1.0.0",
         "status": "running",
         "docs": "/docs",
-        "health": "/api/health"
+        "health": "/api/health",
+        "ready": "/api/health/ready"
     } 
\ No newline at end of file
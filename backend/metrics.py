@@ -0,0 +1,287 @@
+import math
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Prometheus text exposition format version served by /metrics
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Default latency buckets (seconds), from sub-millisecond DB reads to slow model runs
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    """Base for a metric family; children are created once per label set"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.label_names:
+            self._default = self._new_child()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """Child for one label set; hold on to it on hot paths to skip the lookup"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.label_names):
+                raise ValueError(f"{self.name} expects labels {self.label_names}")
+            # setdefault keeps the first child if two threads race here
+            child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _series(self) -> Iterable[Tuple[Tuple[str, ...], object]]:
+        if not self.label_names:
+            return [((), self._default)]
+        return list(self._children.items())
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in self._series():
+            lines.extend(self._render_child(values, child))
+        return lines
+
+    def _render_child(self, values, child) -> List[str]:
+        raise NotImplementedError
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Counter(_Metric):
+    """Monotonic counter"""
+
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.value += amount
+
+    def _render_child(self, values, child) -> List[str]:
+        return [f"{self.name}{_labels(self.label_names, values)} {_format_value(child.value)}"]
+
+
+class Gauge(_Metric):
+    """Value that goes up and down, or is read from a callback at scrape time"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                 function: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation, label_names)
+        self.function = function
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._default.value -= amount
+
+    def set(self, value: float) -> None:
+        self._default.value = value
+
+    def _series(self):
+        if self.function is not None:
+            self._default.value = float(self.function())
+        return super()._series()
+
+    def _render_child(self, values, child) -> List[str]:
+        return [f"{self.name}{_labels(self.label_names, values)} {_format_value(child.value)}"]
+
+
+class _HistogramChild:
+    """Fixed bucket array allocated up front; observe() is a bisect and two adds"""
+
+    __slots__ = ("upper_bounds", "counts", "sum")
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self.upper_bounds = upper_bounds
+        # One slot per bucket plus +Inf; counts are per bucket, made cumulative on render
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.upper_bounds, value)] += 1
+        self.sum += value
+
+    def time(self) -> "_Timer":
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ("child", "started")
+
+    def __init__(self, child: _HistogramChild):
+        self.child = child
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.child.observe(time.perf_counter() - self.started)
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram in the Prometheus sense"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.upper_bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, label_names)
+
+    def _new_child(self):
+        return _HistogramChild(self.upper_bounds)
+
+    def observe(self, value: float) -> None:
+        self._default.observe(value)
+
+    def time(self) -> _Timer:
+        return _Timer(self._default)
+
+    def _render_child(self, values, child) -> List[str]:
+        lines = []
+        cumulative = 0
+        counts = list(child.counts)
+        for bound, count in zip(self.upper_bounds + (math.inf,), counts):
+            cumulative += count
+            le = f'le="{_format_value(float(bound))}"'
+            lines.append(f"{self.name}_bucket{_labels(self.label_names, values, le)} {cumulative}")
+        label_text = _labels(self.label_names, values)
+        lines.append(f"{self.name}_sum{label_text} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered together"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, label_names))
+
+    def gauge(self, name: str, documentation: str, label_names: Sequence[str] = (),
+              function: Optional[Callable[[], float]] = None) -> Gauge:
+        return self.register(Gauge(name, documentation, label_names, function))
+
+    def histogram(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, label_names, buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# HTTP
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "http_request_duration_seconds", "Request latency by route template", ("method", "route")
+)
+HTTP_REQUESTS = registry.counter(
+    "http_requests_total", "Requests by route template and status code", ("method", "route", "status")
+)
+HTTP_IN_FLIGHT = registry.gauge("http_requests_in_flight", "Requests currently being served")
+
+# Pipeline stages
+DB_QUERY_SECONDS = registry.histogram(
+    "db_query_duration_seconds", "Time spent executing SQL statements", ("operation",)
+)
+FILE_WRITE_SECONDS = registry.histogram(
+    "upload_file_write_seconds", "Time spent writing and placing one uploaded file"
+)
+QUEUE_WAIT_SECONDS = registry.histogram(
+    "inference_queue_wait_seconds", "Time an image waited in the batching queue"
+)
+CLASSIFIER_SECONDS = registry.histogram(
+    "inference_classifier_seconds", "Time the classifier spent on one batch"
+)
+BATCH_SIZE = registry.histogram(
+    "inference_batch_size", "Images per classifier batch", buckets=SIZE_BUCKETS
+)
+
+# Uploads
+UPLOAD_RECEIVED_BYTES = registry.counter(
+    "upload_received_bytes_total", "File bytes received in uploads, including rejected ones"
+)
+UPLOAD_STORED_BYTES = registry.counter(
+    "upload_stored_bytes_total", "File bytes of accepted uploads", ("deduplicated",)
+)
+UPLOAD_FILES = registry.counter(
+    "upload_files_total", "Accepted uploaded files", ("deduplicated",)
+)
+
+# Maintenance
+MAINTENANCE_RUNS = registry.counter(
+    "maintenance_runs_total", "Completed maintenance runs"
+)
+MAINTENANCE_RECLAIMED_BYTES = registry.counter(
+    "maintenance_reclaimed_bytes_total", "Disk space reclaimed by maintenance", ("kind",)
+)
+
+# Admission control
+ADMISSION_REJECTED = registry.counter(
+    "admission_rejected_total", "Requests shed by admission control", ("class", "reason")
+)
+ADMISSION_QUEUE_SECONDS = registry.histogram(
+    "admission_queue_wait_seconds", "Time an admitted request waited for a slot", ("class",)
+)
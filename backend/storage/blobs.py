@@ -0,0 +1,340 @@
+import contextlib
+import logging
+from abc import ABC, abstractmethod
+import mimetypes
+import os
+import time
+import uuid
+from typing import BinaryIO, ContextManager, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Which backend stores uploaded originals: "local" or "s3"
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local").lower()
+# Local backend root; also holds the staging directory uploads stream into
+STORAGE_ROOT = os.getenv("STORAGE_ROOT", "uploads")
+# Files live under <root>/ab/cd/<sha256><ext>: 65,536 directories of a few files each
+SHARD_DEPTH = int(os.getenv("STORAGE_SHARD_DEPTH", "2"))
+SHARD_WIDTH = int(os.getenv("STORAGE_SHARD_WIDTH", "2"))
+
+# S3-compatible backend (AWS S3, MinIO, Ceph RGW, ...)
+S3_BUCKET = os.getenv("S3_BUCKET", "")
+S3_PREFIX = os.getenv("S3_PREFIX", "uploads/")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None
+S3_REGION = os.getenv("S3_REGION") or None
+
+READ_CHUNK_SIZE = 64 * 1024
+# S3 user metadata recording when a deduplicated upload last reused an object
+REUSED_AT_METADATA = "reused-at"
+
+
+def shard_key(sha256: str, extension: str, depth: int = SHARD_DEPTH, width: int = SHARD_WIDTH) -> str:
+    """Relative key for content: hash-prefix directories, then the full digest"""
+    parts = [sha256[i * width:(i + 1) * width] for i in range(depth)]
+    return "/".join(parts + [f"{sha256}{extension.lower()}"])
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _iter_file(path: str, start: int = 0, length: Optional[int] = None) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length is None or length > 0:
+            chunk = f.read(READ_CHUNK_SIZE if length is None else min(READ_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            if length is not None:
+                length -= len(chunk)
+            yield chunk
+
+
+def _content_type(key: str) -> str:
+    return mimetypes.guess_type(key)[0] or "application/octet-stream"
+
+
+class BlobStore(ABC):
+    """Content-addressed storage for uploaded originals.
+
+    Uploads are streamed into a local staging file (``staging_path``), then
+    ``commit`` moves them to their content-addressed location, which is
+    what studies record as ``file_path``. Stored objects are never
+    rewritten: the key is the digest of the bytes. Reads go through ``open``,
+    ``iter_range`` or ``local_file`` so no caller needs the whole object in
+    memory. Locations that are plain filesystem paths (staged files, or
+    files stored before this backend was configured) are read from disk by
+    every backend.
+    """
+
+    def __init__(self, staging_dir: str):
+        self.staging_dir = staging_dir
+
+    def staging_path(self, extension: str = "") -> str:
+        """Fresh local path to stream an incoming file into; never derived from the client's filename"""
+        os.makedirs(self.staging_dir, exist_ok=True)
+        return os.path.join(self.staging_dir, f"{uuid.uuid4().hex}{extension.lower()}")
+
+    @abstractmethod
+    def commit(self, staged_path: str, sha256: str, extension: str) -> Tuple[str, bool]:
+        """Store a finished staged file; returns its location and whether identical bytes were already stored"""
+
+    @abstractmethod
+    def exists(self, location: str) -> bool:
+        """Whether the object is stored"""
+
+    @abstractmethod
+    def size(self, location: str) -> int:
+        """Size of the object in bytes"""
+
+    @abstractmethod
+    def open(self, location: str) -> BinaryIO:
+        """Readable binary stream"""
+
+    @abstractmethod
+    def iter_range(self, location: str, start: int = 0, length: Optional[int] = None) -> Iterator[bytes]:
+        """Yield ``length`` bytes from ``start`` (to the end if None) in small chunks"""
+
+    @abstractmethod
+    def filesystem_path(self, location: str) -> Optional[str]:
+        """The location as a local path if it is one, else None"""
+
+    @abstractmethod
+    def local_file(self, location: str) -> ContextManager[str]:
+        """A filesystem path with the object's bytes, for decoders that need one"""
+
+    @abstractmethod
+    def last_modified(self, location: str) -> float:
+        """When the object was last written (or reused by a deduplicated upload), as a Unix time"""
+
+    @abstractmethod
+    def delete(self, location: str) -> None:
+        """Remove the object; a missing object is not an error"""
+
+    @abstractmethod
+    def get_stats(self) -> Dict[str, object]:
+        """Backend name and configuration"""
+
+
+class LocalBlobStore(BlobStore):
+    """Files on local disk, sharded by hash prefix and placed with an atomic rename"""
+
+    def __init__(self, root: str = STORAGE_ROOT, depth: int = SHARD_DEPTH, width: int = SHARD_WIDTH):
+        # Staging lives under the root so the final rename never crosses filesystems
+        super().__init__(os.path.join(root, ".incoming"))
+        self.root = root
+        self.depth = depth
+        self.width = width
+
+    def path_for(self, sha256: str, extension: str) -> str:
+        return os.path.join(self.root, shard_key(sha256, extension, self.depth, self.width))
+
+    def commit(self, staged_path: str, sha256: str, extension: str) -> Tuple[str, bool]:
+        path = self.path_for(sha256, extension)
+        if os.path.exists(path):
+            # Same digest means same bytes: keep the stored copy, drop this one.
+            # Touching it tells retention the file was just reused.
+            _remove_quietly(staged_path)
+            os.utime(path)
+            return path, True
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Readers see either nothing or the complete file, never a partial write
+        os.replace(staged_path, path)
+        return path, False
+
+    def exists(self, location: str) -> bool:
+        return os.path.exists(location)
+
+    def size(self, location: str) -> int:
+        return os.path.getsize(location)
+
+    def open(self, location: str) -> BinaryIO:
+        return open(location, "rb")
+
+    def iter_range(self, location: str, start: int = 0, length: Optional[int] = None) -> Iterator[bytes]:
+        return _iter_file(location, start, length)
+
+    def filesystem_path(self, location: str) -> Optional[str]:
+        return location
+
+    @contextlib.contextmanager
+    def local_file(self, location: str) -> Iterator[str]:
+        yield location
+
+    def last_modified(self, location: str) -> float:
+        return os.path.getmtime(location)
+
+    def delete(self, location: str) -> None:
+        _remove_quietly(location)
+
+    def get_stats(self) -> Dict[str, object]:
+        return {"backend": "local", "root": self.root, "shard_depth": self.depth, "shard_width": self.width}
+
+
+class S3BlobStore(BlobStore):
+    """Objects in an S3-compatible bucket, keyed like the local shards.
+
+    Uploads go up with boto3's managed (multipart, streamed-from-disk)
+    transfer, so an object only becomes visible once complete. Reads are
+    ranged GETs consumed chunk by chunk. boto3 is imported on first use.
+    """
+
+    def __init__(
+        self,
+        bucket: str = S3_BUCKET,
+        prefix: str = S3_PREFIX,
+        endpoint_url: Optional[str] = S3_ENDPOINT_URL,
+        region: Optional[str] = S3_REGION,
+        staging_dir: str = os.path.join(STORAGE_ROOT, ".incoming"),
+        client=None
+    ):
+        if not bucket:
+            raise ValueError("S3_BUCKET must be set for the s3 storage backend")
+        super().__init__(staging_dir)
+        self.bucket = bucket
+        self.prefix = prefix
+        self.endpoint_url = endpoint_url
+        self.region = region
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            import boto3
+
+            self._client = boto3.client("s3", endpoint_url=self.endpoint_url, region_name=self.region)
+        return self._client
+
+    def location_for(self, sha256: str, extension: str) -> str:
+        return f"s3://{self.bucket}/{self.prefix}{shard_key(sha256, extension)}"
+
+    @staticmethod
+    def _split(location: str) -> Optional[Tuple[str, str]]:
+        if not location.startswith("s3://"):
+            return None
+        bucket, _, key = location[len("s3://"):].partition("/")
+        return bucket, key
+
+    def _head(self, bucket: str, key: str) -> Optional[dict]:
+        from botocore.exceptions import ClientError
+
+        try:
+            return self.client.head_object(Bucket=bucket, Key=key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
+    def _touch(self, bucket: str, key: str) -> None:
+        """Mark an object reused, as LocalBlobStore does with utime, so maintenance won't delete it.
+
+        S3 has no utime: the object is copied onto itself with fresh metadata,
+        which also refreshes LastModified. ``reused-at`` keeps sub-second
+        precision, which LastModified lacks.
+        """
+        self.client.copy_object(
+            Bucket=bucket,
+            Key=key,
+            CopySource={"Bucket": bucket, "Key": key},
+            ContentType=_content_type(key),
+            Metadata={REUSED_AT_METADATA: repr(time.time())},
+            MetadataDirective="REPLACE"
+        )
+
+    def commit(self, staged_path: str, sha256: str, extension: str) -> Tuple[str, bool]:
+        location = self.location_for(sha256, extension)
+        bucket, key = self._split(location)
+        try:
+            if self._head(bucket, key) is not None:
+                self._touch(bucket, key)
+                return location, True
+            self.client.upload_file(staged_path, bucket, key, ExtraArgs={"ContentType": _content_type(key)})
+            return location, False
+        finally:
+            _remove_quietly(staged_path)
+
+    def filesystem_path(self, location: str) -> Optional[str]:
+        return None if location.startswith("s3://") else location
+
+    def exists(self, location: str) -> bool:
+        parts = self._split(location)
+        if parts is None:
+            return os.path.exists(location)
+        return self._head(*parts) is not None
+
+    def size(self, location: str) -> int:
+        parts = self._split(location)
+        if parts is None:
+            return os.path.getsize(location)
+        head = self._head(*parts)
+        if head is None:
+            raise FileNotFoundError(location)
+        return head["ContentLength"]
+
+    def open(self, location: str) -> BinaryIO:
+        parts = self._split(location)
+        if parts is None:
+            return open(location, "rb")
+        return self.client.get_object(Bucket=parts[0], Key=parts[1])["Body"]
+
+    def iter_range(self, location: str, start: int = 0, length: Optional[int] = None) -> Iterator[bytes]:
+        parts = self._split(location)
+        if parts is None:
+            yield from _iter_file(location, start, length)
+            return
+        if length == 0:
+            return
+        byte_range = f"bytes={start}-" if length is None else f"bytes={start}-{start + length - 1}"
+        body = self.client.get_object(Bucket=parts[0], Key=parts[1], Range=byte_range)["Body"]
+        try:
+            yield from body.iter_chunks(READ_CHUNK_SIZE)
+        finally:
+            body.close()
+
+    @contextlib.contextmanager
+    def local_file(self, location: str) -> Iterator[str]:
+        parts = self._split(location)
+        if parts is None:
+            yield location
+            return
+        # Streamed to disk, never held in memory; removed once the caller is done
+        path = self.staging_path(os.path.splitext(parts[1])[1])
+        try:
+            self.client.download_file(parts[0], parts[1], path)
+            yield path
+        finally:
+            _remove_quietly(path)
+
+    def last_modified(self, location: str) -> float:
+        parts = self._split(location)
+        if parts is None:
+            return os.path.getmtime(location)
+        head = self._head(*parts)
+        if head is None:
+            raise FileNotFoundError(location)
+        reused_at = head.get("Metadata", {}).get(REUSED_AT_METADATA)
+        return max(head["LastModified"].timestamp(), float(reused_at) if reused_at else 0.0)
+
+    def delete(self, location: str) -> None:
+        parts = self._split(location)
+        if parts is None:
+            _remove_quietly(location)
+        else:
+            self.client.delete_object(Bucket=parts[0], Key=parts[1])
+
+    def get_stats(self) -> Dict[str, object]:
+        return {"backend": "s3", "bucket": self.bucket, "prefix": self.prefix, "endpoint_url": self.endpoint_url}
+
+
+def create_blob_store(backend: str = STORAGE_BACKEND) -> BlobStore:
+    if backend == "local":
+        return LocalBlobStore()
+    if backend == "s3":
+        return S3BlobStore()
+    raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
+
+
+blob_store = create_blob_store()
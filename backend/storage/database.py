@@ -1,53 +1,298 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy import (
+    Integer, String, case, cast, column, delete, event, func, insert, inspect, select, table, true, tuple_,
+    type_coerce, update
+)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 import os
 import logging
-from typing import AsyncGenerator
+import time
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
 from .models import Base
-from datetime import datetime
+from .cache import StudyCache
+from backend.metrics import DB_QUERY_SECONDS
+from backend.storage.blobs import STORAGE_ROOT
+from datetime import date, datetime
 
 logger = logging.getLogger(__name__)
 
-# Database configuration - Use in-memory SQLite for testing
-DB_PATH = os.getenv("DB_PATH", ":memory:")
+# Database configuration - file-backed SQLite so that every worker shares one database
+DB_PATH = os.getenv("DB_PATH", "medical_ai.db")
 DATABASE_URL = f"sqlite:///{DB_PATH}"
 ASYNC_DATABASE_URL = f"sqlite+aiosqlite:///{DB_PATH}"
 
-# Create engines
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
+# Connection pool tuning
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+
+# Read-through cache for study records
+STUDY_CACHE_SIZE = int(os.getenv("STUDY_CACHE_SIZE", "10000"))
+STUDY_CACHE_TTL = float(os.getenv("STUDY_CACHE_TTL", "30"))
+
+study_cache = StudyCache(max_entries=STUDY_CACHE_SIZE, ttl=STUDY_CACHE_TTL)
+
+# SQLite caps bound parameters per statement; IN lists are split to stay under it
+MAX_IN_PARAMS = 500
+
+# Create engine. aiosqlite defaults to NullPool for file databases, which reopens
+# the file (and re-runs the pragmas below) for every session, so pool explicitly.
+engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_pre_ping=True,
+    connect_args={"timeout": DB_BUSY_TIMEOUT_MS / 1000},
 )
 
+@event.listens_for(engine.sync_engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Enable WAL so readers never wait on the single writer"""
+    cursor = dbapi_connection.cursor()
+    # Only takes effect on a new file (or after a full VACUUM); lets maintenance
+    # hand free pages back a few at a time instead of rewriting the database
+    cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+# SQL statement kinds tracked separately in db_query_duration_seconds
+DB_OPERATIONS = ("SELECT", "INSERT", "UPDATE", "DELETE")
+_db_timers = {operation: DB_QUERY_SECONDS.labels(operation.lower()) for operation in DB_OPERATIONS}
+_db_timer_other = DB_QUERY_SECONDS.labels("other")
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+@event.listens_for(engine.sync_engine, "after_cursor_execute")
+def _stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    operation = statement.lstrip()[:6].upper()
+    _db_timers.get(operation, _db_timer_other).observe(time.perf_counter() - started)
+
+@event.listens_for(engine.sync_engine, "handle_error")
+def _drop_query_timer(context):
+    # Failed statements never reach after_cursor_execute
+    if context.connection is not None and context.connection.info.get("query_started"):
+        context.connection.info["query_started"].pop()
+
 # Session factories
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(
+    bind=engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
 
-def get_db() -> Session:
+async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """Get database session"""
-    db = SessionLocal()
-    try:
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 async def init_db():
     """Initialize database tables"""
     try:
+        # Create database directory if it doesn't exist
+        db_dir = os.path.dirname(DB_PATH)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        
         # Create tables
-        Base.metadata.create_all(bind=engine)
+        async with engine.begin() as conn:
+            existing = await conn.run_sync(lambda sync_conn: set(inspect(sync_conn).get_table_names()))
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(_upgrade_schema)
+            await conn.run_sync(create_region_index)
+            if "study_regions" not in existing:
+                await conn.run_sync(_backfill_regions)
+            if "study_stats" not in existing:
+                await conn.run_sync(_rebuild_study_stats)
         logger.info("Database tables created successfully")
         
         # Create uploads directory if it doesn't exist
-        os.makedirs("uploads", exist_ok=True)
+        os.makedirs(STORAGE_ROOT, exist_ok=True)
         logger.info("Uploads directory created successfully")
         
     except Exception as e:
-        logger.error(f"Database initialization failed: {str(e)}")
+        logger.error("Database initialization failed: %s", e)
         raise
 
+def _upgrade_schema(conn) -> None:
+    """Add columns and indexes introduced after a database file was created.
+    
+    ``create_all`` only creates missing tables, so existing files would
+    otherwise never pick up new nullable columns or their indexes.
+    """
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=conn.dialect)
+                conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}")
+                logger.info("Added column %s.%s", table.name, column.name)
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+# R*Tree over region bounding boxes; rows share ids with study_regions
+REGION_RTREE = "study_regions_rtree"
+region_rtree = table(REGION_RTREE, column("id"), column("min_x"), column("max_x"), column("min_y"), column("max_y"))
+# False when this SQLite build lacks the R*Tree module; spatial filters then scan
+rtree_available = True
+
+def create_region_index(conn) -> None:
+    """Create the region R*Tree and the triggers that keep it in step with study_regions.
+    
+    The triggers run inside whatever transaction writes the regions, so the
+    spatial index can never disagree with the table.
+    """
+    global rtree_available
+    try:
+        conn.exec_driver_sql(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {REGION_RTREE} USING rtree(id, min_x, max_x, min_y, max_y)"
+        )
+    except OperationalError as e:
+        rtree_available = False
+        logger.warning("SQLite R*Tree unavailable, spatial region queries will scan: %s", e)
+        return
+    conn.exec_driver_sql(
+        f"CREATE TRIGGER IF NOT EXISTS study_regions_rtree_insert AFTER INSERT ON study_regions BEGIN "
+        f"INSERT INTO {REGION_RTREE} VALUES (new.id, new.x, new.x + new.width, new.y, new.y + new.height); END"
+    )
+    conn.exec_driver_sql(
+        f"CREATE TRIGGER IF NOT EXISTS study_regions_rtree_delete AFTER DELETE ON study_regions BEGIN "
+        f"DELETE FROM {REGION_RTREE} WHERE id = old.id; END"
+    )
+
+def _backfill_regions(conn) -> None:
+    """Copy regions stored as JSON on studies (before study_regions existed) into the table"""
+    from .models import Study, StudyRegion
+    
+    rows = []
+    for study_id, regions in conn.execute(select(Study.study_id, Study.regions).where(Study.regions.isnot(None))):
+        rows.extend(StudyRegion.row_from_region(study_id, position, region) for position, region in enumerate(regions or []))
+    if rows:
+        conn.execute(insert(StudyRegion), rows)
+        logger.info("Indexed %d regions from existing studies", len(rows))
+
+async def _replace_regions(db: AsyncSession, regions_by_study: Dict[str, list]) -> Dict[str, list]:
+    """Swap the stored regions of these studies within the caller's transaction.
+    
+    Returns each study's regions as they read back from the table.
+    """
+    from .models import StudyRegion
+    
+    study_ids = list(regions_by_study)
+    for start in range(0, len(study_ids), MAX_IN_PARAMS):
+        await db.execute(delete(StudyRegion).where(StudyRegion.study_id.in_(study_ids[start:start + MAX_IN_PARAMS])))
+    rows = [
+        StudyRegion.row_from_region(study_id, position, region)
+        for study_id, regions in regions_by_study.items()
+        for position, region in enumerate(regions or [])
+    ]
+    if rows:
+        await db.execute(insert(StudyRegion), rows)
+    stored: Dict[str, list] = {study_id: [] for study_id in study_ids}
+    for row in rows:
+        stored[row["study_id"]].append(StudyRegion.region_from_row(row))
+    return stored
+
+async def _load_regions(db: AsyncSession, study_ids: List[str]) -> Dict[str, list]:
+    """Regions of many studies in classifier order, with one index range scan per chunk"""
+    from .models import StudyRegion
+    
+    regions: Dict[str, list] = {}
+    columns = [StudyRegion.study_id, StudyRegion.label, StudyRegion.details]
+    columns += [getattr(StudyRegion, key) for key in StudyRegion.COLUMN_KEYS]
+    for start in range(0, len(study_ids), MAX_IN_PARAMS):
+        chunk = study_ids[start:start + MAX_IN_PARAMS]
+        result = await db.execute(
+            select(*columns)
+            .where(StudyRegion.study_id.in_(chunk))
+            .order_by(StudyRegion.study_id, StudyRegion.position)
+        )
+        for row in result.mappings():
+            regions.setdefault(row["study_id"], []).append(StudyRegion.region_from_row(row))
+    return regions
+
+def _attach_regions(study_data: dict, regions: Optional[list]) -> dict:
+    # Unanalyzed studies have no region list yet, matching the classifier's output shape
+    study_data["regions"] = regions or ([] if study_data.get("prediction") is not None else None)
+    return study_data
+
+def _study_stats_upsert(sign: int, study_ids: Optional[List[str]] = None):
+    """INSERT ... SELECT adding (or with ``sign=-1`` removing) studies' contribution to study_stats.
+    
+    The keys are computed by SQLite from the stored rows, so incremental
+    updates and a rebuild always agree on the day and bucket of a study.
+    """
+    from .models import Study, StudyStats
+    
+    buckets = StudyStats.CONFIDENCE_BUCKETS
+    keys = [
+        func.date(Study.created_at),
+        func.coalesce(Study.model_version, ""),
+        func.coalesce(Study.prediction, "pending"),
+        func.coalesce(Study.image_quality, ""),
+        case(
+            (Study.confidence.is_(None), -1),
+            else_=func.max(func.min(cast(Study.confidence * buckets, Integer), buckets - 1), 0)
+        ),
+    ]
+    totals = [
+        sign * func.count(),
+        sign * func.coalesce(func.sum(Study.confidence), 0.0),
+        sign * func.coalesce(func.sum(Study.processing_time), 0.0),
+        sign * func.count(Study.processing_time),
+    ]
+    # SQLite needs a WHERE before ON CONFLICT in an upsert from SELECT
+    source = select(*keys, *totals).where(Study.study_id.in_(study_ids) if study_ids is not None else true())
+    key_names = ["day", "model_version", "prediction", "image_quality", "confidence_bucket"]
+    total_names = ["studies", "confidence_sum", "processing_time_sum", "processing_time_count"]
+    statement = sqlite_insert(StudyStats).from_select(key_names + total_names, source.group_by(*keys))
+    return statement.on_conflict_do_update(
+        index_elements=key_names,
+        set_={name: getattr(StudyStats, name) + getattr(statement.excluded, name) for name in total_names}
+    )
+
+async def adjust_study_stats(db: AsyncSession, study_ids: List[str], sign: int) -> None:
+    """Add (``sign=1``) or remove (``sign=-1``) these studies from study_stats in the caller's transaction.
+    
+    Writers remove a study before changing its result columns and add it
+    back afterwards; pending ORM changes must be flushed first.
+    """
+    for start in range(0, len(study_ids), MAX_IN_PARAMS):
+        await db.execute(_study_stats_upsert(sign, study_ids[start:start + MAX_IN_PARAMS]))
+
+def _rebuild_study_stats(conn) -> int:
+    """Recompute study_stats from the studies table; returns the number of summary rows"""
+    from .models import StudyStats
+    
+    conn.execute(delete(StudyStats))
+    conn.execute(_study_stats_upsert(1))
+    rows = conn.execute(select(func.count()).select_from(StudyStats)).scalar_one()
+    logger.info("Rebuilt study statistics: %s summary rows", rows)
+    return rows
+
+async def rebuild_study_stats() -> int:
+    """Recompute study_stats in one transaction, for backfill or after manual edits to studies"""
+    async with engine.begin() as conn:
+        return await conn.run_sync(_rebuild_study_stats)
+
+async def close_db():
+    """Dispose of pooled database connections"""
+    await engine.dispose()
+
 async def update_study_analysis(
-    db: Session,
+    db: AsyncSession,
     study_id: str,
     prediction: str,
     confidence: float,
@@ -60,37 +305,88 @@ async def update_study_analysis(
     try:
         from .models import Study
         
-        study = db.query(Study).filter(Study.study_id == study_id).first()
+        result = await db.execute(select(Study).where(Study.study_id == study_id))
+        study = result.scalar_one_or_none()
         if not study:
             raise ValueError(f"Study not found: {study_id}")
+        await adjust_study_stats(db, [study_id], -1)
         
         # Update AI analysis fields
         study.prediction = prediction
         study.confidence = confidence
         study.processing_time = processing_time
-        study.regions = regions or []
         study.model_version = model_version
         study.image_quality = image_quality
         study.updated_at = datetime.now()
+        stored = await _replace_regions(db, {study_id: regions or []})
+        await db.flush()
+        await adjust_study_stats(db, [study_id], 1)
         
-        db.commit()
-        db.refresh(study)
+        await db.commit()
+        await db.refresh(study)
         
-        logger.info(f"Study analysis updated successfully: {study_id}")
-        return study.to_dict()
+        logger.debug("Study analysis updated successfully: %s", study_id)
+        study_data = _attach_regions(study.to_dict(), stored[study_id])
+        study_cache.set(study_id, study_data)
+        return study_data
         
     except Exception as e:
-        db.rollback()
-        logger.error(f"Failed to update study analysis: {str(e)}")
+        await db.rollback()
+        study_cache.invalidate(study_id)
+        logger.error("Failed to update study analysis: %s", e)
+        raise
+
+async def update_studies_analysis(db: AsyncSession, updates: list) -> int:
+    """Write many analysis results with one bulk UPDATE by primary key.
+    
+    Each update is a dict with the study's ``id`` and ``study_id`` plus the
+    analysis fields accepted by ``update_study_analysis``.
+    """
+    if not updates:
+        return 0
+    try:
+        from .models import Study
+        
+        now = datetime.now()
+        rows = [
+            {
+                "id": row["id"],
+                "prediction": row["prediction"],
+                "confidence": row["confidence"],
+                "processing_time": row["processing_time"],
+                "model_version": row.get("model_version"),
+                "image_quality": row.get("image_quality"),
+                "updated_at": now
+            }
+            for row in updates
+        ]
+        study_ids = [row["study_id"] for row in updates]
+        await adjust_study_stats(db, study_ids, -1)
+        await db.execute(update(Study), rows)
+        await _replace_regions(db, {row["study_id"]: row.get("regions") or [] for row in updates})
+        await adjust_study_stats(db, study_ids, 1)
+        await db.commit()
+        
+        for row in updates:
+            study_cache.invalidate(row["study_id"])
+        logger.info("Bulk updated analysis for %d studies", len(rows))
+        return len(rows)
+        
+    except Exception as e:
+        await db.rollback()
+        for row in updates:
+            study_cache.invalidate(row["study_id"])
+        logger.error("Failed to bulk update study analysis: %s", e)
         raise
 
 async def save_study(
-    db: Session,
+    db: AsyncSession,
     study_id: str,
     filename: str,
     file_path: str,
     content_type: str,
     file_size: int,
+    content_hash: str = None,
     prediction: str = None,
     confidence: float = None,
     processing_time: float = None,
@@ -108,48 +404,674 @@ async def save_study(
             file_path=file_path,
             content_type=content_type,
             file_size=file_size,
+            content_hash=content_hash,
             prediction=prediction,
             confidence=confidence,
             processing_time=processing_time,
-            regions=regions,
             model_version=model_version,
             image_quality=image_quality
         )
         
         db.add(study)
-        db.commit()
-        db.refresh(study)
+        stored = await _replace_regions(db, {study_id: regions}) if regions else {study_id: None}
+        await db.flush()
+        await adjust_study_stats(db, [study_id], 1)
+        await db.commit()
+        await db.refresh(study)
         
-        logger.info(f"Study saved successfully: {study_id}")
-        return study.to_dict()
+        logger.debug("Study saved successfully: %s", study_id)
+        study_data = _attach_regions(study.to_dict(), stored[study_id])
+        study_cache.set(study_id, study_data)
+        return study_data
         
     except Exception as e:
-        db.rollback()
-        logger.error(f"Failed to save study: {str(e)}")
+        await db.rollback()
+        study_cache.invalidate(study_id)
+        logger.error("Failed to save study: %s", e)
         raise
 
-async def get_study(db: Session, study_id: str) -> dict:
-    """Get study by ID"""
+async def save_studies(db: AsyncSession, studies: list) -> int:
+    """Insert many studies in one transaction with a single executemany"""
+    if not studies:
+        return 0
     try:
         from .models import Study
         
-        study = db.query(Study).filter(Study.study_id == study_id).first()
+        await db.execute(insert(Study), studies)
+        await adjust_study_stats(db, [study["study_id"] for study in studies], 1)
+        await db.commit()
+        
+        logger.info("Bulk saved %d studies", len(studies))
+        return len(studies)
+        
+    except Exception as e:
+        await db.rollback()
+        logger.error("Failed to bulk save studies: %s", e)
+        raise
+
+async def get_study(db: AsyncSession, study_id: str) -> dict:
+    """Get study by ID, served from the study cache when possible"""
+    cached = study_cache.get(study_id)
+    if cached is not None:
+        return cached
+    
+    try:
+        from .models import Study
+        
+        result = await db.execute(select(Study).where(Study.study_id == study_id))
+        study = result.scalar_one_or_none()
         if study:
-            return study.to_dict()
+            regions = await _load_regions(db, [study_id])
+            study_data = _attach_regions(study.to_dict(), regions.get(study_id))
+            study_cache.set(study_id, study_data)
+            return study_data
         return None
         
     except Exception as e:
-        logger.error(f"Failed to get study: {str(e)}")
+        logger.error("Failed to get study: %s", e)
         raise
 
-async def get_all_studies(db: Session, limit: int = 100) -> list:
-    """Get all studies with limit"""
+async def get_studies(db: AsyncSession, study_ids: list) -> dict:
+    """Get many studies with IN queries, keyed by study ID"""
+    try:
+        from .models import Study
+        
+        studies = {}
+        unique_ids = list(dict.fromkeys(study_ids))
+        for start in range(0, len(unique_ids), MAX_IN_PARAMS):
+            chunk = unique_ids[start:start + MAX_IN_PARAMS]
+            result = await db.execute(select(Study).where(Study.study_id.in_(chunk)))
+            for study in result.scalars():
+                studies[study.study_id] = study.to_dict()
+        regions = await _load_regions(db, list(studies))
+        for study_id, study_data in studies.items():
+            _attach_regions(study_data, regions.get(study_id))
+        return studies
+        
+    except Exception as e:
+        logger.error("Failed to get studies: %s", e)
+        raise
+
+# Columns returned by study listings; regions and paths stay out of list pages
+STUDY_LIST_COLUMNS = (
+    "study_id",
+    "filename",
+    "content_type",
+    "file_size",
+    "prediction",
+    "confidence",
+    "model_version",
+    "image_quality",
+    "processing_date",
+    "created_at",
+    "updated_at",
+)
+
+def _format_timestamp(value: datetime) -> str:
+    """Render a datetime the way SQLite's CURRENT_TIMESTAMP stores it"""
+    return value.strftime("%Y-%m-%d %H:%M:%S")
+
+async def list_studies(
+    db: AsyncSession,
+    limit: int = 50,
+    after: Optional[Tuple[str, int]] = None,
+    prediction: Optional[str] = None,
+    min_confidence: Optional[float] = None,
+    max_confidence: Optional[float] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    ascending: bool = False
+) -> Tuple[List[dict], Optional[Tuple[str, int]]]:
+    """List studies newest first (or oldest first) using keyset pagination.
+    
+    ``after`` is the ``(created_at, id)`` key of the last row of the previous
+    page; the key of this page's last row is returned when more rows follow.
+    Only the listed columns are selected and each row is zipped with their
+    names into the response item: no ORM objects are built and timestamps
+    stay datetimes for the JSON encoder to write. Pass ``prediction="pending"`` for
+    studies without a result.
+    """
     try:
         from .models import Study
         
-        studies = db.query(Study).order_by(Study.created_at.desc()).limit(limit).all()
-        return [study.to_dict() for study in studies]
+        # Compare timestamps as stored text: binding a datetime would render
+        # microseconds and break equality on the page boundary
+        created_key = type_coerce(Study.created_at, String)
+        columns = [getattr(Study, name) for name in STUDY_LIST_COLUMNS]
+        query = select(*columns, Study.id, created_key.label("created_key"))
+        
+        if prediction == "pending":
+            query = query.where(Study.prediction.is_(None))
+        elif prediction:
+            query = query.where(Study.prediction == prediction)
+        if min_confidence is not None:
+            query = query.where(Study.confidence >= min_confidence)
+        if max_confidence is not None:
+            query = query.where(Study.confidence <= max_confidence)
+        if created_after is not None:
+            query = query.where(created_key >= _format_timestamp(created_after))
+        if created_before is not None:
+            query = query.where(created_key < _format_timestamp(created_before))
+        
+        key = tuple_(created_key, Study.id)
+        if after is not None:
+            query = query.where(key > tuple_(*after) if ascending else key < tuple_(*after))
+        if ascending:
+            query = query.order_by(Study.created_at.asc(), Study.id.asc())
+        else:
+            query = query.order_by(Study.created_at.desc(), Study.id.desc())
+        
+        # One extra row tells us whether another page exists
+        rows = (await db.execute(query.limit(limit + 1))).all()
+        page = rows[:limit]
+        items = [dict(zip(STUDY_LIST_COLUMNS, row)) for row in page]
+        
+        next_key = (page[-1].created_key, page[-1].id) if len(rows) > limit else None
+        return items, next_key
+        
+    except Exception as e:
+        logger.error("Failed to list studies: %s", e)
+        raise
+
+async def search_regions(
+    db: AsyncSession,
+    limit: int = 50,
+    after: Optional[Tuple[float, int]] = None,
+    min_confidence: Optional[float] = None,
+    max_confidence: Optional[float] = None,
+    region_type: Optional[str] = None,
+    severity: Optional[str] = None,
+    min_area: Optional[float] = None,
+    max_area: Optional[float] = None,
+    bbox: Optional[Tuple[float, float, float, float]] = None,
+    contained: bool = False
+) -> Tuple[List[dict], Optional[Tuple[float, int]]]:
+    """Regions matching the filters, most confident first, with keyset pagination.
+    
+    ``bbox`` is ``(x_min, y_min, x_max, y_max)`` in image pixels; regions
+    overlapping it match, or only those entirely inside it when
+    ``contained``. The box is answered by the R*Tree and confidence bounds
+    by the confidence index, so no region JSON is parsed. ``after`` is the
+    ``(confidence, id)`` key of the previous page's last region.
+    """
+    try:
+        from .models import StudyRegion
+        
+        columns = [StudyRegion.id, StudyRegion.study_id, StudyRegion.label, StudyRegion.area, StudyRegion.details]
+        columns += [getattr(StudyRegion, key) for key in StudyRegion.COLUMN_KEYS]
+        query = select(*columns).where(StudyRegion.confidence.isnot(None))
+        
+        if min_confidence is not None:
+            query = query.where(StudyRegion.confidence >= min_confidence)
+        if max_confidence is not None:
+            query = query.where(StudyRegion.confidence <= max_confidence)
+        if region_type:
+            query = query.where(StudyRegion.type == region_type)
+        if severity:
+            query = query.where(StudyRegion.severity == severity)
+        if min_area is not None:
+            query = query.where(StudyRegion.area >= min_area)
+        if max_area is not None:
+            query = query.where(StudyRegion.area <= max_area)
+        if bbox is not None:
+            x_min, y_min, x_max, y_max = bbox
+            right, bottom = StudyRegion.x + StudyRegion.width, StudyRegion.y + StudyRegion.height
+            if contained:
+                exact = [StudyRegion.x >= x_min, right <= x_max, StudyRegion.y >= y_min, bottom <= y_max]
+                boxed = [region_rtree.c.min_x >= x_min, region_rtree.c.max_x <= x_max,
+                         region_rtree.c.min_y >= y_min, region_rtree.c.max_y <= y_max]
+            else:
+                exact = [StudyRegion.x <= x_max, right >= x_min, StudyRegion.y <= y_max, bottom >= y_min]
+                boxed = [region_rtree.c.min_x <= x_max, region_rtree.c.max_x >= x_min,
+                         region_rtree.c.min_y <= y_max, region_rtree.c.max_y >= y_min]
+            if rtree_available:
+                # The R*Tree stores 32-bit bounds rounded outwards; the exact test drops edge cases
+                query = query.join(region_rtree, region_rtree.c.id == StudyRegion.id).where(*boxed)
+            query = query.where(*exact)
+        
+        if after is not None:
+            query = query.where(tuple_(StudyRegion.confidence, StudyRegion.id) < tuple_(*after))
+        query = query.order_by(StudyRegion.confidence.desc(), StudyRegion.id.desc())
+        
+        rows = (await db.execute(query.limit(limit + 1))).mappings().all()
+        page = rows[:limit]
+        items = [
+            {"study_id": row["study_id"], "area": row["area"], **StudyRegion.region_from_row(row)}
+            for row in page
+        ]
+        next_key = (page[-1]["confidence"], page[-1]["id"]) if len(rows) > limit else None
+        return items, next_key
         
     except Exception as e:
-        logger.error(f"Failed to get studies: {str(e)}")
-        raise 
\ No newline at end of file
+        logger.error("Failed to search regions: %s", e)
+        raise
+
+async def get_all_studies(db: AsyncSession, limit: int = 100) -> list:
+    """Get the most recent studies, up to limit"""
+    items, _ = await list_studies(db, limit=limit)
+    return items
+
+async def save_processing_logs(db: AsyncSession, events: List[dict]) -> None:
+    """Insert a batch of timeline events in one transaction"""
+    if not events:
+        return
+    try:
+        from .models import ProcessingLog
+        
+        await db.execute(insert(ProcessingLog), events)
+        await db.commit()
+        
+    except Exception as e:
+        await db.rollback()
+        logger.error("Failed to save %s processing log events: %s", len(events), e)
+        raise
+
+def _mean(total: float, count: int) -> Optional[float]:
+    return round(total / count, 4) if count else None
+
+async def get_study_stats(
+    db: AsyncSession,
+    start: date,
+    end: date,
+    model_version: Optional[str] = None
+) -> Dict[str, Any]:
+    """Screening statistics for the UTC days ``start`` to ``end`` inclusive.
+    
+    Reads only the study_stats rows of those days through the summary key
+    index, so the cost depends on the window and number of models, not on
+    how many studies exist.
+    """
+    try:
+        from .models import StudyStats
+        
+        query = select(StudyStats).where(StudyStats.day.between(start.isoformat(), end.isoformat()))
+        if model_version is not None:
+            query = query.where(StudyStats.model_version == model_version)
+        rows = (await db.execute(query.order_by(StudyStats.day))).scalars().all()
+        
+        buckets = StudyStats.CONFIDENCE_BUCKETS
+        histogram = [0] * buckets
+        predictions: Dict[str, int] = {}
+        qualities: Dict[str, int] = {}
+        models: Dict[str, Dict[str, float]] = {}
+        days: Dict[str, Dict[str, Any]] = {}
+        for row in rows:
+            if row.studies <= 0:
+                continue
+            predictions[row.prediction] = predictions.get(row.prediction, 0) + row.studies
+            day = days.setdefault(row.day, {"day": row.day, "studies": 0, "predictions": {}, "models": {}})
+            day["studies"] += row.studies
+            day["predictions"][row.prediction] = day["predictions"].get(row.prediction, 0) + row.studies
+            if row.prediction == "pending":
+                continue
+            if row.image_quality:
+                qualities[row.image_quality] = qualities.get(row.image_quality, 0) + row.studies
+            if row.confidence_bucket >= 0:
+                histogram[row.confidence_bucket] += row.studies
+            for totals in (
+                models.setdefault(row.model_version, {}),
+                day["models"].setdefault(row.model_version, {})
+            ):
+                totals["studies"] = totals.get("studies", 0) + row.studies
+                totals["confidence_sum"] = totals.get("confidence_sum", 0.0) + row.confidence_sum
+                totals["processing_time_sum"] = totals.get("processing_time_sum", 0.0) + row.processing_time_sum
+                totals["processing_time_count"] = totals.get("processing_time_count", 0) + row.processing_time_count
+        
+        def summarize(version: str, totals: Dict[str, float]) -> Dict[str, Any]:
+            return {
+                "model_version": version or None,
+                "studies": totals["studies"],
+                "mean_confidence": _mean(totals["confidence_sum"], totals["studies"]),
+                "mean_processing_time": _mean(totals["processing_time_sum"], totals["processing_time_count"])
+            }
+        
+        for day in days.values():
+            day["models"] = [summarize(version, totals) for version, totals in sorted(day["models"].items())]
+        return {
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "model_version": model_version,
+            "studies": sum(predictions.values()),
+            "analyzed": sum(count for prediction, count in predictions.items() if prediction != "pending"),
+            "predictions": predictions,
+            "image_quality": qualities,
+            "confidence_histogram": [
+                {"min": index / buckets, "max": (index + 1) / buckets, "studies": count}
+                for index, count in enumerate(histogram)
+            ],
+            "models": [summarize(version, totals) for version, totals in sorted(models.items())],
+            "days": list(days.values())
+        }
+        
+    except Exception as e:
+        logger.error("Failed to get study stats: %s", e)
+        raise
+
+async def get_processing_logs(db: AsyncSession, study_id: str) -> List[dict]:
+    """Timeline events for a study, oldest first"""
+    try:
+        from .models import ProcessingLog
+        
+        result = await db.execute(
+            select(ProcessingLog)
+            .where(ProcessingLog.study_id == study_id)
+            .order_by(ProcessingLog.timestamp, ProcessingLog.id)
+        )
+        return [event.to_dict() for event in result.scalars().all()]
+        
+    except Exception as e:
+        logger.error("Failed to get processing logs for study %s: %s", study_id, e)
+        raise
+
+async def get_cached_result(db: AsyncSession, content_hash: str, model_version: str) -> dict:
+    """Get a cached classifier result for identical image bytes and model version"""
+    try:
+        from .models import InferenceCache
+        
+        result = await db.execute(
+            select(InferenceCache).where(
+                InferenceCache.content_hash == content_hash,
+                InferenceCache.model_version == model_version
+            )
+        )
+        entry = result.scalar_one_or_none()
+        if entry:
+            return entry.to_result()
+        return None
+        
+    except Exception as e:
+        logger.error("Failed to get cached result: %s", e)
+        raise
+
+async def get_cached_results(db: AsyncSession, content_hashes: list, model_version: str) -> dict:
+    """Get cached classifier results for many images, keyed by content hash"""
+    try:
+        from .models import InferenceCache
+        
+        results = {}
+        unique_hashes = list(dict.fromkeys(h for h in content_hashes if h))
+        for start in range(0, len(unique_hashes), MAX_IN_PARAMS):
+            chunk = unique_hashes[start:start + MAX_IN_PARAMS]
+            result = await db.execute(
+                select(InferenceCache).where(
+                    InferenceCache.content_hash.in_(chunk),
+                    InferenceCache.model_version == model_version
+                )
+            )
+            for entry in result.scalars():
+                results[entry.content_hash] = entry.to_result()
+        return results
+        
+    except Exception as e:
+        logger.error("Failed to get cached results: %s", e)
+        raise
+
+async def save_cached_results(db: AsyncSession, entries: list) -> None:
+    """Cache many classifier results; keys that already exist are left alone.
+    
+    Each entry is a dict with ``content_hash``, ``model_version``,
+    ``prediction``, ``confidence``, ``processing_time``, ``regions`` and
+    ``image_quality``.
+    """
+    if not entries:
+        return
+    try:
+        from sqlalchemy.dialects.sqlite import insert
+        from .models import InferenceCache
+        
+        await db.execute(
+            insert(InferenceCache).on_conflict_do_nothing(index_elements=["content_hash", "model_version"]),
+            entries
+        )
+        await db.commit()
+        
+    except Exception as e:
+        await db.rollback()
+        logger.error("Failed to cache results: %s", e)
+        raise
+
+async def save_cached_result(
+    db: AsyncSession,
+    content_hash: str,
+    model_version: str,
+    prediction: str,
+    confidence: float,
+    processing_time: float,
+    regions: list = None,
+    image_quality: str = None
+) -> None:
+    """Cache a classifier result; a concurrent insert of the same key is ignored"""
+    await save_cached_results(db, [{
+        "content_hash": content_hash,
+        "model_version": model_version,
+        "prediction": prediction,
+        "confidence": confidence,
+        "processing_time": processing_time,
+        "regions": regions or [],
+        "image_quality": image_quality
+    }])
+
+async def purge_stale_cache(db: AsyncSession, model_version: str) -> int:
+    """Drop cached results produced by any other model version"""
+    try:
+        from .models import InferenceCache
+        
+        result = await db.execute(
+            delete(InferenceCache).where(InferenceCache.model_version != model_version)
+        )
+        await db.commit()
+        if result.rowcount:
+            logger.info("Purged %s cached results from previous model versions", result.rowcount)
+        return result.rowcount
+        
+    except Exception as e:
+        await db.rollback()
+        logger.error("Failed to purge result cache: %s", e)
+        raise
+
+async def get_recompress_candidates(db: AsyncSession, created_before: datetime, limit: int = 100) -> List[str]:
+    """Stored files of studies created before the cutoff that were never recompressed"""
+    try:
+        from .models import Study
+        
+        created_key = type_coerce(Study.created_at, String)
+        result = await db.execute(
+            select(Study.file_path)
+            .where(created_key < _format_timestamp(created_before), Study.recompressed_at.is_(None))
+            .group_by(Study.file_path)
+            .limit(limit)
+        )
+        return list(result.scalars())
+        
+    except Exception as e:
+        logger.error("Failed to find files to recompress: %s", e)
+        raise
+
+async def move_recompressed(db: AsyncSession, file_path: str, new_file_path: str, file_size: int) -> int:
+    """Point every study stored in ``file_path`` at its recompressed copy.
+
+    ``content_hash`` keeps the digest of the uploaded bytes: preprocessed
+    arrays, derived images and cached results are keyed by it and the
+    pixels are identical.
+    """
+    try:
+        from .models import Study
+        
+        study_ids = list((await db.execute(select(Study.study_id).where(Study.file_path == file_path))).scalars())
+        result = await db.execute(
+            update(Study)
+            .where(Study.file_path == file_path)
+            .values(file_path=new_file_path, file_size=file_size, recompressed_at=datetime.now())
+        )
+        await db.commit()
+        for study_id in study_ids:
+            study_cache.invalidate(study_id)
+        return result.rowcount
+        
+    except Exception as e:
+        await db.rollback()
+        logger.error("Failed to move studies to %s: %s", new_file_path, e)
+        raise
+
+async def mark_recompressed(db: AsyncSession, file_paths: List[str]) -> int:
+    """Flag every study stored in these files as recompressed"""
+    if not file_paths:
+        return 0
+    try:
+        from .models import Study
+        
+        now = datetime.now()
+        updated = 0
+        study_ids = []
+        for start in range(0, len(file_paths), MAX_IN_PARAMS):
+            chunk = file_paths[start:start + MAX_IN_PARAMS]
+            study_ids.extend((await db.execute(select(Study.study_id).where(Study.file_path.in_(chunk)))).scalars())
+            result = await db.execute(
+                update(Study).where(Study.file_path.in_(chunk)).values(recompressed_at=now)
+            )
+            updated += result.rowcount
+        await db.commit()
+        for study_id in study_ids:
+            study_cache.invalidate(study_id)
+        return updated
+        
+    except Exception as e:
+        await db.rollback()
+        logger.error("Failed to mark studies recompressed: %s", e)
+        raise
+
+async def purge_expired_studies(db: AsyncSession, created_before: datetime, limit: int = 500) -> dict:
+    """Delete up to ``limit`` studies created before the cutoff, with their timeline.
+    
+    Returns the deleted ``studies`` (``study_id``, ``file_path``,
+    ``content_hash``) plus the ``orphaned_files`` and ``orphaned_hashes`` no
+    remaining study refers to, whose files and derived data the caller may
+    remove. Cached results for orphaned hashes are deleted here.
+    """
+    try:
+        from .models import InferenceCache, ProcessingLog, Study, StudyRegion
+        
+        created_key = type_coerce(Study.created_at, String)
+        rows = (await db.execute(
+            select(Study.id, Study.study_id, Study.file_path, Study.content_hash)
+            .where(created_key < _format_timestamp(created_before))
+            .order_by(Study.created_at, Study.id)
+            .limit(limit)
+        )).mappings().all()
+        if not rows:
+            return {"studies": [], "orphaned_files": [], "orphaned_hashes": []}
+        
+        ids = [row["id"] for row in rows]
+        study_ids = [row["study_id"] for row in rows]
+        file_paths = list({row["file_path"] for row in rows})
+        hashes = list({row["content_hash"] for row in rows if row["content_hash"]})
+        
+        await adjust_study_stats(db, study_ids, -1)
+        for start in range(0, len(ids), MAX_IN_PARAMS):
+            await db.execute(delete(Study).where(Study.id.in_(ids[start:start + MAX_IN_PARAMS])))
+            await db.execute(
+                delete(ProcessingLog).where(ProcessingLog.study_id.in_(study_ids[start:start + MAX_IN_PARAMS]))
+            )
+            await db.execute(
+                delete(StudyRegion).where(StudyRegion.study_id.in_(study_ids[start:start + MAX_IN_PARAMS]))
+            )
+        
+        # Deduplicated uploads share files: only drop what nothing else uses
+        referenced_files, referenced_hashes = set(), set()
+        for start in range(0, len(file_paths), MAX_IN_PARAMS):
+            chunk = file_paths[start:start + MAX_IN_PARAMS]
+            referenced_files.update((await db.execute(
+                select(Study.file_path).where(Study.file_path.in_(chunk)).distinct()
+            )).scalars())
+        for start in range(0, len(hashes), MAX_IN_PARAMS):
+            chunk = hashes[start:start + MAX_IN_PARAMS]
+            referenced_hashes.update((await db.execute(
+                select(Study.content_hash).where(Study.content_hash.in_(chunk)).distinct()
+            )).scalars())
+        orphaned_hashes = [h for h in hashes if h not in referenced_hashes]
+        for start in range(0, len(orphaned_hashes), MAX_IN_PARAMS):
+            await db.execute(
+                delete(InferenceCache).where(InferenceCache.content_hash.in_(orphaned_hashes[start:start + MAX_IN_PARAMS]))
+            )
+        await db.commit()
+        
+        for study_id in study_ids:
+            study_cache.invalidate(study_id)
+        logger.info("Purged %d expired studies", len(rows))
+        return {
+            "studies": [dict(row) for row in rows],
+            "orphaned_files": [path for path in file_paths if path not in referenced_files],
+            "orphaned_hashes": orphaned_hashes
+        }
+        
+    except Exception as e:
+        await db.rollback()
+        logger.error("Failed to purge expired studies: %s", e)
+        raise
+
+async def purge_processing_logs(db: AsyncSession, before: datetime, limit: int = 5000) -> int:
+    """Delete up to ``limit`` timeline events older than the cutoff"""
+    try:
+        from .models import ProcessingLog
+        
+        oldest = select(ProcessingLog.id).where(ProcessingLog.timestamp < before).limit(limit)
+        result = await db.execute(delete(ProcessingLog).where(ProcessingLog.id.in_(oldest.scalar_subquery())))
+        await db.commit()
+        return result.rowcount
+        
+    except Exception as e:
+        await db.rollback()
+        logger.error("Failed to purge processing logs: %s", e)
+        raise
+
+async def _pragma(conn, statement: str):
+    result = await conn.exec_driver_sql(statement)
+    if not result.returns_rows:
+        return None
+    row = result.first()
+    return row[0] if row else None
+
+async def compact_database(vacuum_pages: int, analysis_limit: int, full_vacuum: bool = False) -> dict:
+    """Return free pages to the filesystem and refresh planner statistics.
+    
+    Runs ``PRAGMA incremental_vacuum`` for at most ``vacuum_pages`` pages,
+    truncates the WAL, then ``ANALYZE`` with ``analysis_limit`` rows sampled
+    per index so the cost stays bounded on large tables. A database created
+    before incremental auto-vacuum was enabled needs one full ``VACUUM`` to
+    switch modes; that only runs when ``full_vacuum`` is set.
+    """
+    def file_size() -> int:
+        return sum(os.path.getsize(path) for path in (DB_PATH, f"{DB_PATH}-wal") if os.path.exists(path))
+    
+    size_before = file_size()
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        page_size = await _pragma(conn, "PRAGMA page_size")
+        free_before = await _pragma(conn, "PRAGMA freelist_count")
+        mode = await _pragma(conn, "PRAGMA auto_vacuum")
+        vacuumed = False
+        if mode != 2 and full_vacuum:
+            await conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+            await conn.exec_driver_sql("VACUUM")
+            mode, vacuumed = 2, True
+        elif mode == 2:
+            # The pragma frees one page per step and returns no columns, so the
+            # sqlite3 module's execute() would step it once; a script runs it to completion
+            raw = await conn.get_raw_connection()
+            await raw.driver_connection.executescript(f"PRAGMA incremental_vacuum({int(vacuum_pages)});")
+        free_after = await _pragma(conn, "PRAGMA freelist_count")
+        await _pragma(conn, "PRAGMA wal_checkpoint(TRUNCATE)")
+        await conn.exec_driver_sql(f"PRAGMA analysis_limit={int(analysis_limit)}")
+        await conn.exec_driver_sql("ANALYZE")
+    size_after = file_size()
+    
+    return {
+        "auto_vacuum": "incremental" if mode == 2 else "none",
+        "full_vacuum": vacuumed,
+        "page_size": page_size,
+        "free_pages_before": free_before,
+        "free_pages_after": free_after,
+        "size_before": size_before,
+        "size_after": size_after,
+        "reclaimed_bytes": max(0, size_before - size_after)
+    }
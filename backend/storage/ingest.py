@@ -0,0 +1,475 @@
+import hashlib
+import logging
+import mimetypes
+import os
+import tarfile
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
+
+import anyio
+import multipart
+from multipart.multipart import parse_options_header
+
+from backend.metrics import FILE_WRITE_SECONDS, UPLOAD_RECEIVED_BYTES
+
+logger = logging.getLogger(__name__)
+
+# Bytes buffered per part before handing a write to the worker thread
+WRITE_BUFFER_SIZE = 1024 * 1024  # 1MB
+# Cap on the total size of non-file form fields kept in memory
+MAX_FIELDS_SIZE = 64 * 1024
+# Suffixes recognised as archives of images
+ARCHIVE_SUFFIXES = {
+    ".zip": "zip",
+    ".tar": "tar",
+    ".tar.gz": "tar",
+    ".tgz": "tar",
+    ".tar.bz2": "tar",
+    ".tar.xz": "tar",
+}
+# Reported for the first member past an archive's entry cap
+TOO_MANY_ENTRIES = "Too many entries in archive; the rest were not read"
+
+
+# commit(temp_path, sha256, path) moves a finished file to its final location
+# and returns (location, deduplicated); see BlobStore.commit
+Commit = Callable[[str, str, str], Tuple[str, bool]]
+
+
+class UploadTooLarge(Exception):
+    """A file part exceeded the configured maximum size"""
+
+
+class ArchiveTooLarge(UploadTooLarge):
+    """An archive expanded past the configured total size"""
+
+
+class MultipartError(Exception):
+    """The request body is not a well-formed multipart/form-data payload"""
+
+
+class IngestedFile:
+    """A file part that was streamed to disk"""
+
+    def __init__(
+        self,
+        field_name: str,
+        filename: str,
+        content_type: str,
+        path: str,
+        size: int,
+        sha256: str,
+        deduplicated: bool = False,
+        write_seconds: float = 0.0
+    ):
+        self.field_name = field_name
+        self.filename = filename
+        self.content_type = content_type
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+        # True when identical bytes were already stored at ``path``
+        self.deduplicated = deduplicated
+        # Time spent writing, flushing and placing the file
+        self.write_seconds = write_seconds
+
+
+class _PartWriter:
+    """Streams one file part to a temporary file next to its final path"""
+
+    def __init__(self, field_name: str, filename: str, content_type: str, path: str, max_size: int):
+        self.field_name = field_name
+        self.filename = filename
+        self.content_type = content_type
+        self.path = path
+        self.temp_path = f"{path}.part"
+        self.max_size = max_size
+        self.size = 0
+        self._hash = hashlib.sha256()
+        self._buffer = bytearray()
+        self._file = None
+        self._write_seconds = 0.0
+
+    async def open(self) -> None:
+        started = time.perf_counter()
+        self._file = await anyio.open_file(self.temp_path, "wb")
+        self._write_seconds += time.perf_counter() - started
+
+    async def write(self, data: bytes) -> None:
+        self.size += len(data)
+        UPLOAD_RECEIVED_BYTES.inc(len(data))
+        if self.size > self.max_size:
+            raise UploadTooLarge(f"{self.filename} exceeds {self.max_size} bytes")
+        self._hash.update(data)
+        self._buffer += data
+        if len(self._buffer) >= WRITE_BUFFER_SIZE:
+            await self._flush()
+
+    async def _flush(self) -> None:
+        if self._buffer:
+            started = time.perf_counter()
+            await self._file.write(bytes(self._buffer))
+            self._write_seconds += time.perf_counter() - started
+            self._buffer.clear()
+
+    async def finish(self, commit: Optional[Commit] = None) -> IngestedFile:
+        await self._flush()
+        started = time.perf_counter()
+        await self._file.aclose()
+        self._file = None
+        digest = self._hash.hexdigest()
+        path, deduplicated = await anyio.to_thread.run_sync(
+            commit or _commit_in_place, self.temp_path, digest, self.path
+        )
+        write_seconds = self._write_seconds + time.perf_counter() - started
+        FILE_WRITE_SECONDS.observe(write_seconds)
+        return IngestedFile(
+            self.field_name, self.filename, self.content_type, path, self.size, digest, deduplicated, write_seconds
+        )
+
+    async def abort(self) -> None:
+        if self._file is not None:
+            await self._file.aclose()
+            self._file = None
+        await anyio.to_thread.run_sync(_remove_quietly, self.temp_path)
+
+
+def _commit_in_place(temp_path: str, sha256: str, path: str) -> Tuple[str, bool]:
+    """Default commit: rename the finished part to the path it was opened for"""
+    os.replace(temp_path, path)
+    return path, False
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+async def ingest_multipart(
+    content_type: str,
+    stream: AsyncIterator[bytes],
+    open_part: Callable[[str, str, str], Union[str, Tuple[str, int], None]],
+    max_file_size: int,
+    commit: Optional[Commit] = None,
+    on_reject: Optional[Callable[[str, str], None]] = None,
+    discard: Optional[Callable[[str], None]] = None
+) -> Tuple[List[IngestedFile], Dict[str, str]]:
+    """Stream a multipart/form-data body straight to disk in a single pass.
+
+    ``open_part(field_name, filename, content_type)`` is called when a file
+    part's headers arrive, before any of its bytes; it returns the final path
+    for the part (optionally as ``(path, max_size)`` to override the limit),
+    returns None to skip it, or raises to reject the request. Each part's
+    size and SHA-256 are computed as it is written, and the upload is aborted
+    as soon as a part grows past its limit - unless ``on_reject(filename,
+    reason)`` is given, in which case only that part is discarded. On any
+    error every file written by this call is removed.
+
+    With ``commit(temp_path, sha256, path)`` the finished part is handed
+    over once its digest is known (content-addressed storage) and ends up
+    wherever ``commit`` puts it; a copy of bytes already stored is dropped
+    and marked ``deduplicated``. ``discard(location)`` removes a committed
+    file during cleanup.
+    """
+    discard = discard or _remove_quietly
+    mimetype, params = parse_options_header(content_type or "")
+    if mimetype != b"multipart/form-data" or b"boundary" not in params:
+        raise MultipartError("Expected a multipart/form-data body")
+
+    # The parser's callbacks are synchronous, so they only record events;
+    # the file I/O they imply is awaited after each chunk is fed in.
+    events: List[Tuple[str, bytes]] = []
+    header_field = bytearray()
+    header_value = bytearray()
+
+    def on_header_field(data, start, end):
+        header_field.extend(data[start:end])
+
+    def on_header_value(data, start, end):
+        header_value.extend(data[start:end])
+
+    def on_header_end():
+        events.append(("header", bytes(header_field).lower() + b"\0" + bytes(header_value)))
+        header_field.clear()
+        header_value.clear()
+
+    callbacks = {
+        "on_part_begin": lambda: events.append(("begin", b"")),
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": lambda: events.append(("headers_finished", b"")),
+        "on_part_data": lambda data, start, end: events.append(("data", bytes(data[start:end]))),
+        "on_part_end": lambda: events.append(("end", b"")),
+    }
+    parser = multipart.MultipartParser(params[b"boundary"], callbacks)
+
+    files: List[IngestedFile] = []
+    fields: Dict[str, str] = {}
+    fields_size = 0
+    headers: Dict[bytes, bytes] = {}
+    writer: Optional[_PartWriter] = None
+    field_name = ""
+    field_value = bytearray()
+    skipping = False
+
+    try:
+        async for chunk in stream:
+            try:
+                parser.write(chunk)
+            except Exception as e:
+                raise MultipartError(f"Malformed multipart body: {str(e)}") from e
+
+            for kind, data in events:
+                if kind == "begin":
+                    headers = {}
+                    writer = None
+                    skipping = False
+                    field_value.clear()
+                elif kind == "header":
+                    name, _, value = data.partition(b"\0")
+                    headers[name] = value
+                elif kind == "headers_finished":
+                    _, disposition = parse_options_header(headers.get(b"content-disposition", b""))
+                    field_name = disposition.get(b"name", b"").decode("utf-8", "replace")
+                    if b"filename" in disposition:
+                        filename = disposition[b"filename"].decode("utf-8", "replace")
+                        part_type = headers.get(b"content-type", b"application/octet-stream").decode("latin-1")
+                        target = open_part(field_name, filename, part_type)
+                        if target is None:
+                            skipping = True
+                        else:
+                            path, limit = target if isinstance(target, tuple) else (target, max_file_size)
+                            writer = _PartWriter(field_name, filename, part_type, path, limit)
+                            await writer.open()
+                elif kind == "data":
+                    if writer is not None:
+                        try:
+                            await writer.write(data)
+                        except UploadTooLarge as e:
+                            if on_reject is None:
+                                raise
+                            await writer.abort()
+                            on_reject(writer.filename, str(e))
+                            writer = None
+                            skipping = True
+                    elif not skipping:
+                        fields_size += len(data)
+                        if fields_size > MAX_FIELDS_SIZE:
+                            raise MultipartError("Form fields too large")
+                        field_value.extend(data)
+                elif kind == "end":
+                    if writer is not None:
+                        files.append(await writer.finish(commit))
+                        writer = None
+                    elif not skipping:
+                        fields[field_name] = field_value.decode("utf-8", "replace")
+            events.clear()
+
+        parser.finalize()
+        if writer is not None:
+            raise MultipartError("Multipart body ended inside a file part")
+
+    except BaseException:
+        # Shielded so cleanup still runs when the client disconnects mid-upload
+        with anyio.CancelScope(shield=True):
+            if writer is not None:
+                await writer.abort()
+            for ingested in files:
+                if not ingested.deduplicated:
+                    await anyio.to_thread.run_sync(discard, ingested.path)
+        raise
+
+    return files, fields
+
+
+def archive_kind(filename: str) -> Optional[str]:
+    """Return "zip" or "tar" if the filename names a supported archive"""
+    lowered = filename.lower()
+    for suffix, kind in ARCHIVE_SUFFIXES.items():
+        if lowered.endswith(suffix):
+            return kind
+    return None
+
+
+def _guess_content_type(filename: str) -> str:
+    if filename.lower().endswith((".dcm", ".dicom")):
+        return "application/dicom"
+    return mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+
+class _ExtractionBudget:
+    """Bytes an archive may still expand to, shared by the extracting threads"""
+
+    def __init__(self, limit: Optional[int]):
+        self.limit = limit
+        self.written = 0
+        self.exceeded = False
+        self._lock = threading.Lock()
+
+    def charge(self, size: int) -> None:
+        if self.limit is None:
+            return
+        with self._lock:
+            self.written += size
+            if self.written > self.limit:
+                self.exceeded = True
+        if self.exceeded:
+            raise ArchiveTooLarge(f"Archive expands past {self.limit} bytes")
+
+
+def _store_member(
+    source,
+    name: str,
+    staging_dir: str,
+    max_size: int,
+    commit: Commit,
+    budget: Optional[_ExtractionBudget] = None
+) -> IngestedFile:
+    """Copy one archive member to disk, hashing it, then commit it"""
+    temp_path = os.path.join(staging_dir, f"{uuid.uuid4().hex}.part")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(temp_path, "wb") as target:
+            while True:
+                chunk = source.read(WRITE_BUFFER_SIZE)
+                if not chunk:
+                    break
+                # Checked while reading: declared member sizes can't be trusted
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadTooLarge(f"{name} exceeds {max_size} bytes")
+                if budget is not None:
+                    budget.charge(len(chunk))
+                digest.update(chunk)
+                target.write(chunk)
+        sha256 = digest.hexdigest()
+        path, deduplicated = commit(temp_path, sha256, name)
+    except BaseException:
+        _remove_quietly(temp_path)
+        raise
+    return IngestedFile("archive", name, _guess_content_type(name), path, size, sha256, deduplicated)
+
+
+def extract_archive(
+    archive_path: str,
+    accept: Callable[[str], Optional[str]],
+    max_member_size: int,
+    max_members: int,
+    commit: Commit,
+    staging_dir: str,
+    workers: int = 4,
+    max_total_size: Optional[int] = None,
+    discard: Optional[Callable[[str], None]] = None,
+    max_entries: Optional[int] = None
+) -> List[Tuple[str, Optional[IngestedFile], Optional[str]]]:
+    """Extract image members of a zip/tar archive into content-addressed storage.
+
+    ``accept(member_name)`` returns a rejection reason or None; accepted
+    members are staged under ``staging_dir`` and handed to
+    ``commit(temp_path, sha256, member_name)``. Returns one
+    ``(member_name, ingested_file, error)`` entry per regular member. Zip
+    members are decompressed in parallel, each worker thread holding its own
+    handle on the archive; tar archives can only be read sequentially.
+    Member names are never used as paths, so traversal entries are harmless.
+
+    Only accepted members count toward ``max_members``, so readmes and
+    ``__MACOSX`` entries never crowd out images. At most ``max_entries``
+    regular members are looked at; the first one past it is reported as an
+    error and the rest of the archive is not read.
+
+    Bytes written are counted across all members as they are decompressed;
+    past ``max_total_size`` extraction stops, members already committed
+    (and not deduplicated) are passed to ``discard``, and ArchiveTooLarge
+    is raised.
+    """
+    outcomes: List[Tuple[str, Optional[IngestedFile], Optional[str]]] = []
+    kind = archive_kind(archive_path)
+    budget = _ExtractionBudget(max_total_size)
+
+    if kind == "zip":
+        with zipfile.ZipFile(archive_path) as archive:
+            members = [info for info in archive.infolist() if not info.is_dir()]
+        scanned = members if max_entries is None else members[:max_entries]
+
+        # Names alone decide acceptance, so the member limit is applied before any decompression
+        reasons: List[Optional[str]] = []
+        admitted = 0
+        for info in scanned:
+            reason = accept(info.filename)
+            if not reason:
+                if admitted >= max_members:
+                    reason = "Too many files in request"
+                else:
+                    admitted += 1
+            reasons.append(reason)
+
+        local = threading.local()
+        handles: List[zipfile.ZipFile] = []
+
+        def extract(info: zipfile.ZipInfo, reason: Optional[str]) -> Tuple[str, Optional[IngestedFile], Optional[str]]:
+            if reason:
+                return info.filename, None, reason
+            if budget.exceeded:
+                return info.filename, None, "Archive too large"
+            if not hasattr(local, "archive"):
+                local.archive = zipfile.ZipFile(archive_path)
+                handles.append(local.archive)
+            try:
+                with local.archive.open(info) as source:
+                    member = _store_member(source, info.filename, staging_dir, max_member_size, commit, budget)
+                    return info.filename, member, None
+            except (UploadTooLarge, zipfile.BadZipFile, OSError) as e:
+                return info.filename, None, str(e)
+
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+                outcomes.extend(pool.map(extract, scanned, reasons))
+        finally:
+            for handle in handles:
+                handle.close()
+        if len(scanned) < len(members):
+            outcomes.append((members[len(scanned)].filename, None, TOO_MANY_ENTRIES))
+
+    elif kind == "tar":
+        with tarfile.open(archive_path, "r:*") as archive:
+            entries = admitted = 0
+            for member in archive:
+                if budget.exceeded:
+                    break
+                if not member.isfile():
+                    continue
+                if max_entries is not None and entries >= max_entries:
+                    outcomes.append((member.name, None, TOO_MANY_ENTRIES))
+                    break
+                entries += 1
+                reason = accept(member.name)
+                if reason:
+                    outcomes.append((member.name, None, reason))
+                    continue
+                if admitted >= max_members:
+                    outcomes.append((member.name, None, "Too many files in request"))
+                    continue
+                admitted += 1
+                try:
+                    source = archive.extractfile(member)
+                    stored = _store_member(source, member.name, staging_dir, max_member_size, commit, budget)
+                    outcomes.append((member.name, stored, None))
+                except (UploadTooLarge, tarfile.TarError, OSError) as e:
+                    outcomes.append((member.name, None, str(e)))
+    else:
+        raise ValueError(f"Unsupported archive: {archive_path}")
+
+    if budget.exceeded:
+        for _, stored, _ in outcomes:
+            if stored is not None and not stored.deduplicated and discard is not None:
+                discard(stored.path)
+        raise ArchiveTooLarge(f"Archive expands past {max_total_size} bytes")
+    return outcomes
@@ -0,0 +1,484 @@
+import asyncio
+import contextlib
+import hashlib
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from backend.metrics import MAINTENANCE_RECLAIMED_BYTES, MAINTENANCE_RUNS
+from backend.storage.blobs import BlobStore, blob_store
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, every worker may run maintenance
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MAINTENANCE_ENABLED = os.getenv("MAINTENANCE_ENABLED", "true").lower() not in ("0", "false", "no")
+# How often the scheduler wakes up, and the local-time window ("HH:MM-HH:MM") it may run in
+MAINTENANCE_INTERVAL = float(os.getenv("MAINTENANCE_INTERVAL", "3600"))
+MAINTENANCE_WINDOW = os.getenv("MAINTENANCE_WINDOW", "01:00-05:00")
+# Work budget per run; whatever is left over is picked up by the next run
+MAINTENANCE_MAX_SECONDS = float(os.getenv("MAINTENANCE_MAX_SECONDS", "900"))
+MAINTENANCE_BATCH_SIZE = int(os.getenv("MAINTENANCE_BATCH_SIZE", "200"))
+
+# Policies; 0 disables the step
+STUDY_RETENTION_DAYS = float(os.getenv("STUDY_RETENTION_DAYS", "0"))
+RECOMPRESS_AFTER_DAYS = float(os.getenv("RECOMPRESS_AFTER_DAYS", "30"))
+DERIVED_MAX_AGE_DAYS = float(os.getenv("DERIVED_MAX_AGE_DAYS", "30"))
+TIMELINE_RETENTION_DAYS = float(os.getenv("TIMELINE_RETENTION_DAYS", "90"))
+STAGING_MAX_AGE_HOURS = float(os.getenv("STAGING_MAX_AGE_HOURS", "24"))
+
+# Database compaction: free pages returned per run, and rows sampled per index by ANALYZE
+VACUUM_PAGES = int(os.getenv("VACUUM_PAGES", "10000"))
+ANALYZE_LIMIT = int(os.getenv("ANALYZE_LIMIT", "1000"))
+
+# A file reused by an upload this recently is kept even if the studies that pointed to it expired
+ORPHAN_GRACE_SECONDS = 3600
+
+DAY = 24 * 60 * 60
+
+
+def parse_window(window: str) -> Optional[Tuple[int, int]]:
+    """``"HH:MM-HH:MM"`` as minutes after midnight; None (any time) when empty"""
+    if not window.strip():
+        return None
+    start_text, _, end_text = window.partition("-")
+
+    def minutes(text: str) -> int:
+        hours, _, mins = text.strip().partition(":")
+        return int(hours) * 60 + int(mins or 0)
+
+    return minutes(start_text), minutes(end_text)
+
+
+def in_window(window: Optional[Tuple[int, int]], now: Optional[datetime] = None) -> bool:
+    if window is None:
+        return True
+    now = now or datetime.now()
+    minute = now.hour * 60 + now.minute
+    start, end = window
+    # Windows may wrap midnight, e.g. 22:00-04:00
+    return start <= minute < end if start <= end else minute >= start or minute < end
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+# Lossless re-encoders: (encode(source, target) -> bool, decode pixels for verification)
+def _encode_png(source: str, target: str) -> bool:
+    from PIL import Image, PngImagePlugin
+
+    with Image.open(source) as image:
+        info = PngImagePlugin.PngInfo()
+        for key, value in getattr(image, "text", {}).items():
+            info.add_text(key, value)
+        extra = {key: image.info[key] for key in ("dpi", "icc_profile", "gamma", "transparency") if key in image.info}
+        image.save(target, format="PNG", optimize=True, compress_level=9, pnginfo=info, **extra)
+    return True
+
+
+def _png_pixels(path: str):
+    import numpy as np
+    from PIL import Image
+
+    with Image.open(path) as image:
+        return image.mode, np.asarray(image)
+
+
+def _encode_dicom(source: str, target: str) -> bool:
+    import pydicom
+    from pydicom.uid import RLELossless
+
+    dataset = pydicom.dcmread(source)
+    if "PixelData" not in dataset or dataset.file_meta.TransferSyntaxUID.is_compressed:
+        # Already encapsulated (JPEG, JPEG 2000, RLE, ...): leave it as uploaded
+        return False
+    # RLE Lossless is a standard transfer syntax every DICOM reader can decode
+    dataset.compress(RLELossless)
+    dataset.save_as(target)
+    return True
+
+
+def _dicom_pixels(path: str):
+    import pydicom
+
+    dataset = pydicom.dcmread(path)
+    return dataset.get("PhotometricInterpretation"), dataset.pixel_array
+
+
+RECOMPRESSORS: Dict[str, Tuple[Callable[[str, str], bool], Callable[[str], Any]]] = {
+    ".png": (_encode_png, _png_pixels),
+    ".dcm": (_encode_dicom, _dicom_pixels),
+    ".dicom": (_encode_dicom, _dicom_pixels),
+}
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def recompress_blob(store: BlobStore, location: str) -> Optional[Tuple[str, int, int]]:
+    """Re-encode a stored original losslessly; returns (new location, size before, size after).
+
+    The new encoding is only kept when it is smaller and decodes to exactly
+    the same pixels. It is stored under the digest of its own bytes, next to
+    the original, which is left as it is: moving studies over and deleting
+    the original is up to the caller. Returns None when nothing was stored.
+    JPEG originals are never touched.
+    """
+    import numpy as np
+
+    extension = os.path.splitext(location)[1].lower()
+    if extension not in RECOMPRESSORS:
+        return None
+    encode, pixels = RECOMPRESSORS[extension]
+    with store.local_file(location) as source:
+        staged = store.staging_path(extension)
+        try:
+            if not encode(source, staged):
+                return None
+            before, after = os.path.getsize(source), os.path.getsize(staged)
+            if after >= before:
+                return None
+            (kind, original), (new_kind, recompressed) = pixels(source), pixels(staged)
+            if kind != new_kind or original.dtype != recompressed.dtype or not np.array_equal(original, recompressed):
+                logger.warning("Recompressed %s does not decode identically; keeping the original", location)
+                return None
+            new_location, _ = store.commit(staged, _sha256(staged), extension)
+            return new_location, before, after
+        finally:
+            _remove_quietly(staged)
+
+
+@contextlib.contextmanager
+def _exclusive(path: str) -> Iterator[bool]:
+    """Non-blocking lock shared by every worker on the host; yields whether it was acquired"""
+    if fcntl is None:
+        yield True
+        return
+    with open(path, "a") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class MaintenanceScheduler:
+    """Background retention, recompression and database compaction.
+
+    Wakes every ``interval`` seconds and, inside the off-peak ``window``,
+    runs each enabled step within a time budget: recompress old originals
+    losslessly, delete expired studies with their files and derived data,
+    purge derived images nobody has viewed recently, abandoned staging
+    files and old timeline events, then vacuum and analyze the database.
+    Work is done in small batches so requests keep flowing, and only one
+    worker per host runs at a time. Each run reports the space it reclaimed.
+    """
+
+    def __init__(
+        self,
+        store: BlobStore = blob_store,
+        enabled: bool = MAINTENANCE_ENABLED,
+        interval: float = MAINTENANCE_INTERVAL,
+        window: str = MAINTENANCE_WINDOW,
+        max_seconds: float = MAINTENANCE_MAX_SECONDS,
+        batch_size: int = MAINTENANCE_BATCH_SIZE,
+        study_retention_days: float = STUDY_RETENTION_DAYS,
+        recompress_after_days: float = RECOMPRESS_AFTER_DAYS,
+        derived_max_age_days: float = DERIVED_MAX_AGE_DAYS,
+        timeline_retention_days: float = TIMELINE_RETENTION_DAYS,
+        staging_max_age_hours: float = STAGING_MAX_AGE_HOURS,
+        vacuum_pages: int = VACUUM_PAGES,
+        analyze_limit: int = ANALYZE_LIMIT
+    ):
+        self.store = store
+        self.enabled = enabled
+        self.interval = interval
+        self.window_text = window
+        self.window = parse_window(window)
+        self.max_seconds = max_seconds
+        self.batch_size = batch_size
+        self.study_retention_days = study_retention_days
+        self.recompress_after_days = recompress_after_days
+        self.derived_max_age_days = derived_max_age_days
+        self.timeline_retention_days = timeline_retention_days
+        self.staging_max_age_hours = staging_max_age_hours
+        self.vacuum_pages = vacuum_pages
+        self.analyze_limit = analyze_limit
+        self._worker: Optional[asyncio.Task] = None
+        self._running: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.reclaimed_bytes = 0
+        self.last_report: Optional[Dict[str, Any]] = None
+
+    def start(self) -> None:
+        """Start the scheduler on the running event loop"""
+        if not self.enabled or (self._worker is not None and not self._worker.done()):
+            return
+        self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        for task in (self._worker, self._running):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+        self._worker = self._running = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            if in_window(self.window):
+                try:
+                    await self.run_once()
+                except Exception as e:
+                    logger.error("❌ Maintenance run failed: %s", e)
+
+    async def run_once(self, force: bool = False) -> Dict[str, Any]:
+        """Run every step now; concurrent callers share the same run.
+
+        A forced run outside the window never does a full ``VACUUM``.
+        """
+        if self._running is None or self._running.done():
+            self._running = asyncio.get_running_loop().create_task(self._run_locked(force))
+        return await asyncio.shield(self._running)
+
+    async def _run_locked(self, force: bool) -> Dict[str, Any]:
+        from backend.storage.database import DB_PATH
+
+        with _exclusive(f"{DB_PATH}.maintenance.lock") as acquired:
+            if not acquired:
+                logger.info("Maintenance skipped: another worker is running it")
+                return {"skipped": "another worker is running maintenance"}
+            return await self._run_steps(force)
+
+    async def _run_steps(self, force: bool) -> Dict[str, Any]:
+        started = time.perf_counter()
+        deadline = started + self.max_seconds
+        report: Dict[str, Any] = {"started_at": datetime.now().isoformat(), "forced": force, "errors": []}
+        logger.info("🧹 Maintenance run started")
+
+        steps = (
+            # Expire first so nothing is recompressed only to be deleted
+            ("expired", self._expire_studies),
+            ("recompressed", self._recompress),
+            ("derived", self._purge_derived),
+            ("staging", self._purge_staging),
+            ("timeline", self._purge_timeline),
+            ("database", lambda deadline: self._compact(full_vacuum=in_window(self.window))),
+        )
+        for name, step in steps:
+            try:
+                report[name] = await step(deadline)
+            except Exception as e:
+                # One failing step must not keep the others from running
+                logger.error("❌ Maintenance step %s failed: %s", name, e)
+                report["errors"].append(f"{name}: {str(e)}")
+
+        reclaimed = 0
+        for name in ("expired", "recompressed", "derived", "staging", "database"):
+            freed = (report.get(name) or {}).get("reclaimed_bytes", 0)
+            if freed:
+                MAINTENANCE_RECLAIMED_BYTES.labels(name).inc(freed)
+            reclaimed += freed
+        report["reclaimed_bytes"] = reclaimed
+        report["duration_seconds"] = round(time.perf_counter() - started, 3)
+
+        self.runs += 1
+        self.reclaimed_bytes += reclaimed
+        self.last_report = report
+        MAINTENANCE_RUNS.inc()
+        logger.info(
+            f"🧹 Maintenance reclaimed {reclaimed / (1024 * 1024):.1f}MB in {report['duration_seconds']:.1f}s"
+        )
+        return report
+
+    async def _blocking(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, function, *args)
+
+    async def _recompress(self, deadline: float) -> Optional[Dict[str, int]]:
+        from backend.storage.database import (
+            AsyncSessionLocal, get_recompress_candidates, mark_recompressed, move_recompressed
+        )
+
+        if self.recompress_after_days <= 0:
+            return None
+        cutoff = datetime.utcnow() - timedelta(days=self.recompress_after_days)
+        result = {"files": 0, "unchanged": 0, "failed": 0, "reclaimed_bytes": 0}
+        while time.perf_counter() < deadline:
+            async with AsyncSessionLocal() as db:
+                locations = await get_recompress_candidates(db, cutoff, self.batch_size)
+            done = []
+            for location in locations:
+                if time.perf_counter() >= deadline:
+                    break
+                try:
+                    last_modified = await self._blocking(self.store.last_modified, location)
+                    outcome = await self._blocking(recompress_blob, self.store, location)
+                except Exception as e:
+                    logger.warning("Could not recompress %s: %s", location, e)
+                    result["failed"] += 1
+                    outcome = None
+                else:
+                    result["unchanged" if outcome is None else "files"] += 1
+                if outcome is None:
+                    # Marked either way: a file that cannot shrink is not retried every night
+                    done.append(location)
+                    continue
+                new_location, before, after = outcome
+                async with AsyncSessionLocal() as db:
+                    await move_recompressed(db, location, new_location, after)
+                if await self._blocking(self._delete_replaced, location, last_modified):
+                    result["reclaimed_bytes"] += before - after
+            async with AsyncSessionLocal() as db:
+                await mark_recompressed(db, done)
+            if len(locations) < self.batch_size:
+                break
+        return result
+
+    async def _expire_studies(self, deadline: float) -> Optional[Dict[str, int]]:
+        from backend.ai.preprocess import preprocessor
+        from backend.storage.database import AsyncSessionLocal, purge_expired_studies
+        from backend.storage.pyramid import derived_images
+
+        if self.study_retention_days <= 0:
+            return None
+        cutoff = datetime.utcnow() - timedelta(days=self.study_retention_days)
+        result = {"studies": 0, "files": 0, "kept_recently_reused": 0, "reclaimed_bytes": 0}
+        while time.perf_counter() < deadline:
+            async with AsyncSessionLocal() as db:
+                purged = await purge_expired_studies(db, cutoff, self.batch_size)
+            result["studies"] += len(purged["studies"])
+            for location in purged["orphaned_files"]:
+                result["reclaimed_bytes"] += await self._blocking(self._delete_orphan, location, result)
+            for content_hash in purged["orphaned_hashes"]:
+                result["reclaimed_bytes"] += await self._blocking(preprocessor.cache.discard, content_hash)
+                result["reclaimed_bytes"] += await self._blocking(derived_images.discard, content_hash)
+            for study in purged["studies"]:
+                if not study["content_hash"]:
+                    result["reclaimed_bytes"] += await self._blocking(
+                        derived_images.discard, f"study-{study['study_id']}"
+                    )
+            if len(purged["studies"]) < self.batch_size:
+                break
+        return result
+
+    def _delete_replaced(self, location: str, last_modified: float) -> bool:
+        """Delete an original whose studies moved to its recompressed copy, unless an upload just reused it"""
+        try:
+            if self.store.last_modified(location) != last_modified:
+                # Identical bytes were uploaded meanwhile; that study will point here
+                return False
+        except FileNotFoundError:
+            return False
+        self.store.delete(location)
+        return True
+
+    def _delete_orphan(self, location: str, result: Dict[str, int]) -> int:
+        try:
+            if time.time() - self.store.last_modified(location) < ORPHAN_GRACE_SECONDS:
+                # Just reused by a deduplicated upload whose study may not be saved yet
+                result["kept_recently_reused"] += 1
+                return 0
+            size = self.store.size(location)
+        except FileNotFoundError:
+            return 0
+        self.store.delete(location)
+        result["files"] += 1
+        return size
+
+    async def _purge_derived(self, deadline: float) -> Optional[Dict[str, int]]:
+        from backend.storage.pyramid import derived_images
+
+        if self.derived_max_age_days <= 0:
+            return None
+        entries, freed = await self._blocking(derived_images.purge, self.derived_max_age_days * DAY)
+        return {"entries": entries, "reclaimed_bytes": freed}
+
+    async def _purge_staging(self, deadline: float) -> Optional[Dict[str, int]]:
+        if self.staging_max_age_hours <= 0:
+            return None
+        return await self._blocking(self._remove_stale_staging, self.staging_max_age_hours * 60 * 60)
+
+    def _remove_stale_staging(self, max_age: float) -> Dict[str, int]:
+        """Partial uploads and downloads left behind by a crash or restart"""
+        cutoff = time.time() - max_age
+        result = {"files": 0, "reclaimed_bytes": 0}
+        if not os.path.isdir(self.store.staging_dir):
+            return result
+        for entry in os.scandir(self.store.staging_dir):
+            try:
+                stat = entry.stat()
+                if not entry.is_file() or stat.st_mtime >= cutoff:
+                    continue
+                os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+            result["files"] += 1
+            result["reclaimed_bytes"] += stat.st_size
+        return result
+
+    async def _purge_timeline(self, deadline: float) -> Optional[Dict[str, int]]:
+        from backend.storage.database import AsyncSessionLocal, purge_processing_logs
+
+        if self.timeline_retention_days <= 0:
+            return None
+        # Timeline events carry local timestamps
+        cutoff = datetime.now() - timedelta(days=self.timeline_retention_days)
+        limit = self.batch_size * 25
+        deleted = 0
+        while time.perf_counter() < deadline:
+            async with AsyncSessionLocal() as db:
+                count = await purge_processing_logs(db, cutoff, limit)
+            deleted += count
+            if count < limit:
+                break
+        return {"events": deleted}
+
+    async def _compact(self, full_vacuum: bool) -> Dict[str, Any]:
+        from backend.storage.database import compact_database
+
+        return await compact_database(self.vacuum_pages, self.analyze_limit, full_vacuum=full_vacuum)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "window": self.window_text or None,
+            "in_window": in_window(self.window),
+            "interval_seconds": self.interval,
+            "running": self._running is not None and not self._running.done(),
+            "policies": {
+                "study_retention_days": self.study_retention_days,
+                "recompress_after_days": self.recompress_after_days,
+                "derived_max_age_days": self.derived_max_age_days,
+                "timeline_retention_days": self.timeline_retention_days,
+                "staging_max_age_hours": self.staging_max_age_hours,
+                "vacuum_pages": self.vacuum_pages,
+                "analyze_limit": self.analyze_limit
+            },
+            "runs": self.runs,
+            "reclaimed_bytes_total": self.reclaimed_bytes,
+            "last_run": self.last_report
+        }
+
+
+maintenance = MaintenanceScheduler()
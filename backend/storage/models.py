@@ -1,14 +1,20 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float, Text, JSON
+from sqlalchemy import Column, Integer, String, DateTime, Float, Text, JSON, Index, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Mapping
 
 Base = declarative_base()
 
 class Study(Base):
     """Database model for medical imaging studies"""
     __tablename__ = "studies"
+    __table_args__ = (
+        # Keyset pagination walks (created_at, id); the prediction variant
+        # serves the filtered listing without a sort step
+        Index("ix_studies_created_at_id", "created_at", "id"),
+        Index("ix_studies_prediction_created_at_id", "prediction", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     study_id = Column(String(50), unique=True, index=True, nullable=False)
@@ -16,12 +22,14 @@ class Study(Base):
     file_path = Column(String(500), nullable=False)
     content_type = Column(String(100), nullable=False)
     file_size = Column(Integer, nullable=False)
+    content_hash = Column(String(64), index=True, nullable=True)  # SHA-256 of the file bytes
+    recompressed_at = Column(DateTime, nullable=True)  # Set once maintenance has recompressed the stored file
     
     # AI Results
     prediction = Column(String(50), nullable=True)  # normal, suspicious
     confidence = Column(Float, nullable=True)
     processing_time = Column(Float, nullable=True)
-    regions = Column(JSON, nullable=True)  # List of regions of interest
+    regions = Column(JSON, nullable=True)  # Legacy; regions now live in study_regions
     
     # Metadata
     model_version = Column(String(50), nullable=True)
@@ -38,6 +46,11 @@ class Study(Base):
             "id": self.id,
             "study_id": self.study_id,
             "filename": self.filename,
+            "file_path": self.file_path,
+            "content_type": self.content_type,
+            "file_size": self.file_size,
+            "content_hash": self.content_hash,
+            "recompressed_at": self.recompressed_at.isoformat() if self.recompressed_at else None,
             "prediction": self.prediction,
             "confidence": self.confidence,
             "processing_time": self.processing_time,
@@ -45,17 +58,109 @@ class Study(Base):
             "model_version": self.model_version,
             "image_quality": self.image_quality,
             "processing_date": self.processing_date.isoformat() if self.processing_date else None,
-            "created_at": self.created_at.isoformat() if self.created_at else None
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None
         }
 
+class StudyRegion(Base):
+    """Database model for one classifier region of interest, in image pixel coordinates.
+    
+    Regions live in their own rows so they can be searched by confidence,
+    type and size with indexes, and by location through the
+    ``study_regions_rtree`` R*Tree kept in sync by triggers (see
+    ``database.create_region_index``).
+    """
+    __tablename__ = "study_regions"
+    __table_args__ = (
+        # Assembling a study's regions in classifier order is one index range scan
+        Index("ix_study_regions_study_id_position", "study_id", "position"),
+        # Searches by confidence, optionally within one lesion type, seek instead of scanning
+        Index("ix_study_regions_confidence", "confidence"),
+        Index("ix_study_regions_type_confidence", "type", "confidence"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    study_id = Column(String(50), nullable=False)
+    position = Column(Integer, nullable=False)  # Index in the classifier's regions list
+    label = Column(String(50), nullable=True)  # The classifier's region id, e.g. region_1
+    x = Column(Float, nullable=False)
+    y = Column(Float, nullable=False)
+    width = Column(Float, nullable=False)
+    height = Column(Float, nullable=False)
+    area = Column(Float, nullable=False)
+    confidence = Column(Float, nullable=True)
+    type = Column(String(50), nullable=True)
+    severity = Column(String(20), nullable=True)
+    description = Column(Text, nullable=True)
+    details = Column(JSON, nullable=True)  # Any other keys the classifier returned
+    
+    # Keys stored in columns; everything else round-trips through ``details``
+    COLUMN_KEYS = ("x", "y", "width", "height", "confidence", "type", "severity", "description")
+    
+    @classmethod
+    def row_from_region(cls, study_id: str, position: int, region: Dict[str, Any]) -> Dict[str, Any]:
+        """Insert parameters for one classifier region"""
+        row = {key: region.get(key) for key in cls.COLUMN_KEYS}
+        for key in ("x", "y", "width", "height"):
+            row[key] = float(row[key] or 0)
+        extra = {key: value for key, value in region.items() if key not in cls.COLUMN_KEYS and key != "id"}
+        row.update(
+            study_id=study_id,
+            position=position,
+            label=region.get("id"),
+            area=row["width"] * row["height"],
+            details=extra or None
+        )
+        return row
+    
+    @classmethod
+    def region_from_row(cls, row: Mapping[str, Any]) -> Dict[str, Any]:
+        """The classifier's region dict back from a selected row mapping"""
+        region = {"id": row["label"], **{key: row[key] for key in cls.COLUMN_KEYS}}
+        region.update(row["details"] or {})
+        return region
+
+class StudyStats(Base):
+    """Database model for screening aggregates: one row per day and result combination.
+    
+    Rows are adjusted in the same transaction as the study writes they
+    summarize (see ``database.adjust_study_stats``), so dashboards read a
+    handful of rows per day instead of scanning ``studies``. Key columns use
+    ``''``, ``pending`` and ``-1`` instead of NULL so they stay unique.
+    """
+    __tablename__ = "study_stats"
+    __table_args__ = (
+        # Also the index for day-range reads
+        UniqueConstraint(
+            "day", "model_version", "prediction", "image_quality", "confidence_bucket",
+            name="uq_study_stats_key"
+        ),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    day = Column(String(10), nullable=False)  # UTC date the study was created, YYYY-MM-DD
+    model_version = Column(String(50), nullable=False)
+    prediction = Column(String(50), nullable=False)
+    image_quality = Column(String(50), nullable=False)
+    confidence_bucket = Column(Integer, nullable=False)  # floor(confidence * CONFIDENCE_BUCKETS)
+    studies = Column(Integer, nullable=False, default=0)
+    confidence_sum = Column(Float, nullable=False, default=0)
+    processing_time_sum = Column(Float, nullable=False, default=0)
+    processing_time_count = Column(Integer, nullable=False, default=0)
+    
+    CONFIDENCE_BUCKETS = 10
+
 class ProcessingLog(Base):
-    """Database model for processing logs"""
+    """Database model for processing logs: one timeline event per row"""
     __tablename__ = "processing_logs"
     
     id = Column(Integer, primary_key=True, index=True)
     study_id = Column(String(50), index=True, nullable=False)
     level = Column(String(20), nullable=False)  # INFO, WARNING, ERROR
     message = Column(Text, nullable=False)
+    stage = Column(String(50), nullable=True)  # upload_received, file_written, db_saved, ...
+    duration_ms = Column(Float, nullable=True)
+    details = Column(JSON, nullable=True)
     timestamp = Column(DateTime, default=func.now())
     
     def to_dict(self) -> Dict[str, Any]:
@@ -65,5 +170,35 @@ class ProcessingLog(Base):
             "study_id": self.study_id,
             "level": self.level,
             "message": self.message,
+            "stage": self.stage,
+            "duration_ms": self.duration_ms,
+            "details": self.details,
             "timestamp": self.timestamp.isoformat() if self.timestamp else None
-        } 
\ No newline at end of file
+        }
+
+class InferenceCache(Base):
+    """Database model for classifier results keyed by image content and model version"""
+    __tablename__ = "inference_cache"
+    __table_args__ = (
+        UniqueConstraint("content_hash", "model_version", name="uq_inference_cache_hash_version"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    content_hash = Column(String(64), nullable=False)
+    model_version = Column(String(50), nullable=False)
+    prediction = Column(String(50), nullable=False)
+    confidence = Column(Float, nullable=True)
+    processing_time = Column(Float, nullable=True)
+    regions = Column(JSON, nullable=True)
+    image_quality = Column(String(50), nullable=True)
+    created_at = Column(DateTime, default=func.now())
+    
+    def to_result(self) -> Dict[str, Any]:
+        """Convert to the classifier result format"""
+        return {
+            "prediction": self.prediction,
+            "confidence": self.confidence,
+            "regions": self.regions or [],
+            "model_version": self.model_version,
+            "image_quality": self.image_quality
+        }
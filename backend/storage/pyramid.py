@@ -0,0 +1,288 @@
+import asyncio
+import logging
+import math
+import os
+import shutil
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from backend.ai.preprocess import decode_image
+
+logger = logging.getLogger(__name__)
+
+# Derived images live next to the uploads they are rendered from
+DERIVED_DIR = os.getenv("DERIVED_DIR", "uploads/.derived")
+TILE_SIZE = int(os.getenv("TILE_SIZE", "254"))
+TILE_OVERLAP = int(os.getenv("TILE_OVERLAP", "1"))
+TILE_QUALITY = int(os.getenv("TILE_QUALITY", "85"))
+THUMBNAIL_SIZES = tuple(int(size) for size in os.getenv("THUMBNAIL_SIZES", "128,256,512").split(","))
+# Images are never rendered larger than this on their long side
+MAX_RENDER_SIDE = int(os.getenv("MAX_RENDER_SIDE", "16384"))
+DERIVED_WORKERS = int(os.getenv("DERIVED_WORKERS", "2"))
+
+DESCRIPTOR_NAME = "image.dzi"
+
+DZI_TEMPLATE = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<Image xmlns="http://schemas.microsoft.com/deepzoom/2008" '
+    'Format="jpg" Overlap="{overlap}" TileSize="{tile_size}">\n'
+    '  <Size Width="{width}" Height="{height}"/>\n'
+    '</Image>\n'
+)
+
+
+def _render(source_path: str, max_side: int = MAX_RENDER_SIDE):
+    """Decode a mammogram (DICOM windowing included) to an 8-bit grayscale image"""
+    import numpy as np
+    from PIL import Image
+
+    pixels = decode_image(source_path, max_side=max_side)
+    return Image.fromarray(np.round(pixels * 255).astype(np.uint8))
+
+
+def _tree_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _save_jpeg(image, path: str) -> None:
+    image.save(path, format="JPEG", quality=TILE_QUALITY, optimize=True)
+
+
+def _write_tiles(image, level_dir: str, tile_size: int, overlap: int) -> None:
+    os.makedirs(level_dir)
+    width, height = image.size
+    for col in range(math.ceil(width / tile_size)):
+        for row in range(math.ceil(height / tile_size)):
+            left = max(0, col * tile_size - overlap)
+            top = max(0, row * tile_size - overlap)
+            right = min(width, (col + 1) * tile_size + overlap)
+            bottom = min(height, (row + 1) * tile_size + overlap)
+            _save_jpeg(image.crop((left, top, right, bottom)), os.path.join(level_dir, f"{col}_{row}.jpg"))
+
+
+class DerivedImageStore:
+    """Thumbnails and DeepZoom tile pyramids, rendered on first request.
+
+    Output is keyed by content hash (uploads are content-addressed), so every
+    study sharing an image shares its derived files. Thumbnails and the
+    pyramid are rendered independently: a thumbnail decodes the original
+    straight to its own size, and the pyramid is only rendered when a
+    viewer asks for the descriptor or a tile. Each file or pyramid is
+    written under a temporary name and renamed into place when complete,
+    so whatever exists is whole and never rewritten.
+    """
+
+    def __init__(
+        self,
+        directory: str = DERIVED_DIR,
+        tile_size: int = TILE_SIZE,
+        overlap: int = TILE_OVERLAP,
+        thumbnail_sizes: Tuple[int, ...] = THUMBNAIL_SIZES,
+        workers: int = DERIVED_WORKERS
+    ):
+        self.directory = directory
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.thumbnail_sizes = thumbnail_sizes
+        self.workers = workers
+        self._slots: Optional[asyncio.Semaphore] = None
+        # (key, "pyramid" | "thumbnail_{size}") -> render in progress
+        self._in_flight: Dict[Tuple[str, str], asyncio.Task] = {}
+        self.rendered = 0
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def thumbnail_path(self, key: str, size: int) -> str:
+        return os.path.join(self.path_for(key), f"thumbnail_{size}.jpg")
+
+    def pyramid_path(self, key: str) -> str:
+        return os.path.join(self.path_for(key), "pyramid")
+
+    def descriptor_path(self, key: str) -> str:
+        return os.path.join(self.pyramid_path(key), DESCRIPTOR_NAME)
+
+    def tile_path(self, key: str, level: int, col: int, row: int) -> str:
+        return os.path.join(self.pyramid_path(key), "tiles", str(level), f"{col}_{row}.jpg")
+
+    def build_thumbnail(self, key: str, source_path: str, size: int) -> str:
+        """Render one thumbnail, decoding the original at that size (blocking)"""
+        from PIL import Image
+
+        path = self.thumbnail_path(key, size)
+        if os.path.exists(path):
+            return path
+        image = _render(source_path, max_side=size)
+        image.thumbnail((size, size), Image.LANCZOS)
+
+        os.makedirs(self.path_for(key), exist_ok=True)
+        staging = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            _save_jpeg(image, staging)
+            os.replace(staging, path)
+        finally:
+            if os.path.exists(staging):
+                os.remove(staging)
+        return path
+
+    def build_pyramid(self, key: str, source_path: str) -> str:
+        """Render every DeepZoom level and the descriptor for an image (blocking)"""
+        from PIL import Image
+
+        target = self.pyramid_path(key)
+        if os.path.isdir(target):
+            return target
+        started = time.perf_counter()
+        image = _render(source_path)
+        width, height = image.size
+
+        staging = f"{target}.{uuid.uuid4().hex}.tmp"
+        os.makedirs(staging)
+        try:
+            # DeepZoom levels: the top level is full size, each one below is
+            # half the one above (rounded up), down to 1x1 at level 0
+            top_level = math.ceil(math.log2(max(width, height))) if max(width, height) > 1 else 0
+            level_image = image
+            for level in range(top_level, -1, -1):
+                _write_tiles(level_image, os.path.join(staging, "tiles", str(level)), self.tile_size, self.overlap)
+                if level:
+                    size = (max(1, math.ceil(level_image.width / 2)), max(1, math.ceil(level_image.height / 2)))
+                    level_image = level_image.resize(size, Image.LANCZOS)
+
+            with open(os.path.join(staging, DESCRIPTOR_NAME), "w") as f:
+                f.write(DZI_TEMPLATE.format(
+                    overlap=self.overlap, tile_size=self.tile_size, width=width, height=height
+                ))
+            try:
+                os.rename(staging, target)
+            except OSError:
+                # Another worker finished the same image first; keep theirs
+                if not os.path.isdir(target):
+                    raise
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+        logger.info(
+            "Rendered %dx%d pyramid (%d levels) for %s in %.3fs",
+            width, height, top_level + 1, key, time.perf_counter() - started
+        )
+        return target
+
+    def discard(self, key: str) -> int:
+        """Remove an image's derived files; returns the bytes freed"""
+        target = self.path_for(key)
+        size = _tree_size(target)
+        shutil.rmtree(target, ignore_errors=True)
+        return size
+
+    def purge(self, max_age: float) -> Tuple[int, int]:
+        """Remove derived images unused for ``max_age`` seconds, and abandoned renders.
+
+        Returns ``(entries, bytes)`` removed. Anything purged is rendered
+        again on its next request.
+        """
+        cutoff = time.time() - max_age
+        entries = freed = 0
+        if not os.path.isdir(self.directory):
+            return entries, freed
+        busy = {key for key, _ in self._in_flight}
+        for entry in os.scandir(self.directory):
+            key = entry.name.split(".", 1)[0]
+            if key in busy or not entry.is_dir():
+                continue
+            try:
+                if entry.stat().st_mtime >= cutoff:
+                    # In use; only clear renders abandoned inside it
+                    freed += self._purge_staging(entry.path, cutoff)
+                    continue
+            except FileNotFoundError:
+                continue
+            freed += _tree_size(entry.path)
+            shutil.rmtree(entry.path, ignore_errors=True)
+            entries += 1
+        return entries, freed
+
+    @staticmethod
+    def _purge_staging(path: str, cutoff: float) -> int:
+        freed = 0
+        for entry in os.scandir(path):
+            if not entry.name.endswith(".tmp"):
+                continue
+            try:
+                if entry.stat().st_mtime >= cutoff:
+                    continue
+            except FileNotFoundError:
+                continue
+            if entry.is_dir():
+                freed += _tree_size(entry.path)
+                shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                freed += entry.stat().st_size
+                os.remove(entry.path)
+        return freed
+
+    async def _build(self, job: Tuple[str, str], build: Callable[..., str], *args: Any) -> str:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+        try:
+            async with self._slots:
+                path = await asyncio.get_running_loop().run_in_executor(None, build, *args)
+            self.rendered += 1
+            return path
+        finally:
+            self._in_flight.pop(job, None)
+
+    async def _ensure(self, key: str, item: str, path: str, build: Callable[..., str], *args: Any) -> str:
+        """``path``, rendering it with ``build`` if needed (single-flight per key and item)"""
+        if os.path.exists(path):
+            try:
+                # mtime records last use, so maintenance purges what nobody views
+                os.utime(self.path_for(key))
+            except OSError:
+                pass
+            return path
+        job = (key, item)
+        task = self._in_flight.get(job)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(self._build(job, build, *args))
+            self._in_flight[job] = task
+        return await asyncio.shield(task)
+
+    async def thumbnail(self, key: str, source_path: str, size: int) -> str:
+        """Path of a thumbnail, rendering only that thumbnail if needed"""
+        return await self._ensure(
+            key, f"thumbnail_{size}", self.thumbnail_path(key, size), self.build_thumbnail, key, source_path, size
+        )
+
+    async def pyramid(self, key: str, source_path: str) -> str:
+        """Directory of the tile pyramid, rendering it on first use"""
+        return await self._ensure(key, "pyramid", self.pyramid_path(key), self.build_pyramid, key, source_path)
+
+    async def shutdown(self) -> None:
+        """Cancel renders still in flight"""
+        tasks = list(self._in_flight.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._in_flight.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "directory": self.directory,
+            "in_flight": len(self._in_flight),
+            "rendered": self.rendered,
+            "tile_size": self.tile_size,
+            "overlap": self.overlap,
+            "thumbnail_sizes": list(self.thumbnail_sizes)
+        }
+
+
+derived_images = DerivedImageStore()
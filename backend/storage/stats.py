@@ -0,0 +1,33 @@
+"""Rebuild the screening statistics summary table from the studies table.
+
+    python -m backend.storage.stats rebuild
+
+Run with the same DB_PATH and working directory as the app. The
+table is filled automatically when it is first created and kept current by
+every study write; rebuild after restoring a backup or editing studies by
+hand. Safe while the app is running: the rebuild is one transaction.
+"""
+import argparse
+import asyncio
+
+from backend.storage.database import close_db, init_db, rebuild_study_stats
+
+
+async def _rebuild() -> int:
+    await init_db()
+    try:
+        return await rebuild_study_stats()
+    finally:
+        await close_db()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args()
+    rows = asyncio.run(_rebuild())
+    print(f"Rebuilt study statistics: {rows} summary rows")
+
+
+if __name__ == "__main__":
+    main()
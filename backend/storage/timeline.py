@@ -0,0 +1,178 @@
+import asyncio
+import contextlib
+import itertools
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Buffered events are written when this many are waiting or after the interval
+TIMELINE_BATCH_SIZE = int(os.getenv("TIMELINE_BATCH_SIZE", "500"))
+TIMELINE_FLUSH_INTERVAL = float(os.getenv("TIMELINE_FLUSH_INTERVAL", "1.0"))
+# Events held in memory while the database is slow; the oldest are dropped beyond this
+TIMELINE_MAX_BUFFER = int(os.getenv("TIMELINE_MAX_BUFFER", "50000"))
+# Failed writes of the same batch before it is dropped so later events can still be written
+TIMELINE_MAX_ATTEMPTS = int(os.getenv("TIMELINE_MAX_ATTEMPTS", "3"))
+
+
+class TimelineRecorder:
+    """Collects per-study span events and writes them to ``ProcessingLog`` in batches.
+
+    ``record`` and ``span`` only append to an in-memory buffer, so they are
+    safe to call on the request path; a background task inserts buffered
+    events with one ``executemany`` per batch. Events leave the buffer only
+    once their batch is committed; a batch that keeps failing is dropped
+    after ``max_attempts`` writes, and every lost event is counted.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = TIMELINE_BATCH_SIZE,
+        flush_interval: float = TIMELINE_FLUSH_INTERVAL,
+        max_buffer: int = TIMELINE_MAX_BUFFER,
+        max_attempts: int = TIMELINE_MAX_ATTEMPTS
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max(1, max_attempts)
+        self._buffer: Deque[Dict[str, Any]] = deque(maxlen=max_buffer)
+        self._wake: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._flushing: Optional[asyncio.Lock] = None
+        # Failed writes of the batch at the head of the buffer
+        self._attempts = 0
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed_batches = 0
+
+    def record(
+        self,
+        study_id: str,
+        stage: str,
+        duration: Optional[float] = None,
+        level: str = "INFO",
+        message: Optional[str] = None,
+        **details: Any
+    ) -> None:
+        """Buffer one event; ``duration`` is in seconds"""
+        if len(self._buffer) == self._buffer.maxlen:
+            self.dropped += 1
+        self._buffer.append({
+            "study_id": study_id,
+            "stage": stage,
+            "level": level,
+            "message": message or stage.replace("_", " "),
+            "duration_ms": round(duration * 1000, 3) if duration is not None else None,
+            "details": details or None,
+            "timestamp": datetime.now()
+        })
+        self.recorded += 1
+        if self._wake is not None and len(self._buffer) >= self.batch_size:
+            self._wake.set()
+
+    @contextlib.contextmanager
+    def span(self, study_id: str, stage: str, **details: Any) -> Iterator[Dict[str, Any]]:
+        """Time a block and record it; the yielded dict adds details from inside the block"""
+        extra: Dict[str, Any] = {}
+        started = time.perf_counter()
+        try:
+            yield extra
+        except Exception as e:
+            self.record(study_id, stage, time.perf_counter() - started, level="ERROR",
+                        message=f"{stage.replace('_', ' ')} failed: {e}", **details, **extra)
+            raise
+        self.record(study_id, stage, time.perf_counter() - started, **details, **extra)
+
+    def pending(self, study_id: str) -> List[Dict[str, Any]]:
+        """Buffered events for a study that have not been written yet"""
+        return [dict(event) for event in list(self._buffer) if event["study_id"] == study_id]
+
+    def start(self) -> None:
+        """Start the background writer on the running event loop"""
+        if self._worker is not None and not self._worker.done():
+            return
+        self._wake = asyncio.Event()
+        self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the writer after writing everything still buffered"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        await self.flush()
+        if self._buffer:
+            self.dropped += len(self._buffer)
+            logger.warning("Dropped %d timeline events left unwritten at shutdown", len(self._buffer))
+            self._buffer.clear()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    def _remove(self, batch: List[Dict[str, Any]]) -> None:
+        """Take a written batch off the head of the buffer.
+
+        Events that overflowed the buffer while the batch was being written
+        are already gone, so only those still at the head are removed.
+        """
+        for event in batch:
+            if self._buffer and self._buffer[0] is event:
+                self._buffer.popleft()
+
+    async def flush(self) -> None:
+        """Write buffered events in batches of ``batch_size``"""
+        from backend.storage.database import AsyncSessionLocal, save_processing_logs
+
+        if self._flushing is None:
+            self._flushing = asyncio.Lock()
+        async with self._flushing:
+            while self._buffer:
+                batch = list(itertools.islice(self._buffer, self.batch_size))
+                try:
+                    async with AsyncSessionLocal() as db:
+                        await save_processing_logs(db, batch)
+                        self._remove(batch)
+                except Exception as e:
+                    # The timeline is diagnostic; never let it take the app down
+                    self.failed_batches += 1
+                    self._attempts += 1
+                    if self._attempts < self.max_attempts:
+                        logger.warning(
+                            "Timeline write failed, keeping %d events for retry: %s", len(self._buffer), e
+                        )
+                        return
+                    self._attempts = 0
+                    self._remove(batch)
+                    self.dropped += len(batch)
+                    logger.warning(
+                        "Dropped %d timeline events after %d failed writes: %s", len(batch), self.max_attempts, e
+                    )
+                    continue
+                self._attempts = 0
+                self.written += len(batch)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "buffered": len(self._buffer),
+            "recorded": self.recorded,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed_batches": self.failed_batches
+        }
+
+
+timeline = TimelineRecorder()
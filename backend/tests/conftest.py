@@ -0,0 +1,26 @@
+import os
+import sys
+import tempfile
+
+# Make both `main` and the `backend` package importable when running from backend/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+# Point the storage layer at a throwaway database before anything imports it
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(), "test.db"))
+
+# Keep the mock classifier's simulated latency out of the test run
+os.environ.setdefault("MOCK_MIN_DELAY", "0")
+os.environ.setdefault("MOCK_MAX_DELAY", "0")
+
+# Uploaded originals, preprocessed arrays and derived images go to throwaway directories too
+os.environ.setdefault("STORAGE_ROOT", tempfile.mkdtemp())
+os.environ.setdefault("PREPROCESS_DIR", tempfile.mkdtemp())
+os.environ.setdefault("DERIVED_DIR", tempfile.mkdtemp())
+
+# The whole suite runs as one client; per-client rate limits are tested separately
+os.environ.setdefault("ADMISSION_UPLOAD_RATE", "0")
+os.environ.setdefault("ADMISSION_INFERENCE_RATE", "0")
+
+# Administrative endpoints are disabled unless a token is configured
+os.environ.setdefault("ADMIN_TOKEN", "test-admin-token")
@@ -0,0 +1,127 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from backend.api.admission import (
+    AdmissionController,
+    AdmissionMiddleware,
+    ConcurrencyLimiter,
+    EndpointClass,
+    Overloaded,
+    TokenBuckets,
+    default_classes,
+)
+
+
+def test_token_bucket_allows_bursts_then_paces():
+    buckets = TokenBuckets(rate=2, burst=3)
+    assert [buckets.take("a", now=0.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert buckets.take("a", now=0.0) == pytest.approx(0.5)
+    # Other clients have their own bucket
+    assert buckets.take("b", now=0.0) == 0.0
+    assert buckets.take("a", now=0.5) == 0.0
+    assert buckets.take("a", now=0.5) > 0
+
+
+def test_limiter_queues_hands_off_and_sheds():
+    """Test waiters get freed slots in order and arrivals beyond the queue are shed"""
+    async def scenario():
+        limiter = ConcurrencyLimiter(concurrency=1, queue=1)
+        await limiter.acquire(timeout=1)
+        waiting = asyncio.ensure_future(limiter.acquire(timeout=1))
+        await asyncio.sleep(0)
+        assert limiter.queued == 1
+        with pytest.raises(Overloaded) as full:
+            await limiter.acquire(timeout=1)
+        assert full.value.reason == "queue_full"
+
+        limiter.release(0.2)
+        await waiting
+        assert (limiter.active, limiter.queued) == (1, 0)
+
+        with pytest.raises(Overloaded) as timed_out:
+            await limiter.acquire(timeout=0.01)
+        assert timed_out.value.reason == "queue_timeout"
+        assert limiter.queued == 0
+        limiter.release(0.2)
+        assert limiter.active == 0
+
+    asyncio.run(scenario())
+
+
+def _app(controller):
+    app = FastAPI()
+    app.add_middleware(AdmissionMiddleware, controller=controller)
+    release = asyncio.Event()
+
+    @app.post("/api/inference/{study_id}")
+    async def slow(study_id: str):
+        await release.wait()
+        return {"study_id": study_id}
+
+    @app.get("/api/health")
+    async def health():
+        return {"status": "healthy"}
+
+    return app, release
+
+
+def test_overload_is_shed_with_retry_after_and_health_keeps_capacity():
+    controller = AdmissionController(
+        classes=[
+            EndpointClass("health", ("GET",), r"^/api/health", concurrency=4, queue=4),
+            EndpointClass("inference", ("POST",), r"^/api/inference/", concurrency=1, queue=1, rate=1, burst=3),
+        ],
+        queue_timeout=5
+    )
+    app, release = _app(controller)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            running = asyncio.ensure_future(client.post("/api/inference/a"))
+            queued = asyncio.ensure_future(client.post("/api/inference/b"))
+            await asyncio.sleep(0.05)
+
+            shed = await client.post("/api/inference/c")
+            assert shed.status_code == 503
+            assert shed.json()["reason"] == "queue_full"
+            assert int(shed.headers["retry-after"]) >= 1
+
+            # Probes never wait behind inference
+            assert (await client.get("/api/health")).status_code == 200
+
+            limited = await client.post("/api/inference/d")
+            assert limited.status_code == 429
+            assert limited.headers["retry-after"] == "1"
+
+            release.set()
+            assert [(await task).status_code for task in (running, queued)] == [200, 200]
+
+    asyncio.run(scenario())
+    stats = controller.get_stats()["classes"]["inference"]
+    assert stats["rejected"] == {"queue_full": 1, "rate_limited": 1}
+    assert (stats["active"], stats["queued"], stats["admitted"]) == (0, 0, 2)
+
+
+def test_default_classes_separate_probes_images_and_reads():
+    """Image renders and the detailed health report never take probe or result-read capacity"""
+    controller = AdmissionController(classes=default_classes())
+    expected = {
+        "/api/health": "health",
+        "/api/health/live": "health",
+        "/api/health/ready": "health",
+        "/metrics": "health",
+        "/api/health/detailed": "read",
+        "/api/health/workers": "read",
+        "/api/images/abc/thumbnail": "images",
+        "/api/images/abc/pyramid_files/9/0_0.jpg": "images",
+        "/api/images/abc/original": "images",
+        "/api/inference/abc": "read",
+        "/api/upload/abc": "read",
+        "/api/studies": "read",
+    }
+    for path, name in expected.items():
+        assert controller.classify("GET", path).name == name, path
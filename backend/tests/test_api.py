@@ -1,11 +1,21 @@
+import asyncio
+import hashlib
+
 import pytest
 from fastapi.testclient import TestClient
 from main import app
 import os
 
-client = TestClient(app)
+from backend.storage.blobs import STORAGE_ROOT
+from backend.storage.pyramid import derived_images
+
+@pytest.fixture(scope="module")
+def client():
+    # Run startup/shutdown so the database and inference scheduler are live
+    with TestClient(app) as test_client:
+        yield test_client
 
-def test_health_check():
+def test_health_check(client):
     """Test basic health check endpoint"""
     response = client.get("/api/health")
     assert response.status_code == 200
@@ -13,7 +23,33 @@ def test_health_check():
     assert data["status"] == "healthy"
     assert data["service"] == "AI Medical Imaging - Starter Kit"
 
-def test_detailed_health_check():
+def test_liveness_and_readiness(client):
+    """Test liveness always answers and readiness waits for the warm model"""
+    assert client.get("/api/health/live").json() == {"status": "alive"}
+    
+    # The model warms up in the background after startup
+    import time
+    deadline = time.monotonic() + 10
+    response = client.get("/api/health/ready")
+    while response.status_code == 503 and time.monotonic() < deadline:
+        assert response.headers["retry-after"] == "1"
+        time.sleep(0.05)
+        response = client.get("/api/health/ready")
+    assert response.status_code == 200
+    assert response.json()["checks"]["model"] == "ready"
+    
+    detailed = client.get("/api/health/detailed").json()
+    assert detailed["components"]["ai_model"] == "healthy"
+    assert detailed["model"]["warmup_seconds"] is not None
+
+def test_worker_memory(client):
+    """Test the worker memory report lists at least this process"""
+    data = client.get("/api/health/workers").json()
+    assert data["workers"] >= 1
+    assert data["total"]["rss"] > 0
+    assert any(process["current"] for process in data["processes"])
+
+def test_detailed_health_check(client):
     """Test detailed health check endpoint"""
     response = client.get("/api/health/detailed")
     assert response.status_code == 200
@@ -21,7 +57,7 @@ def test_detailed_health_check():
     assert "status" in data
     assert "components" in data
 
-def test_model_info():
+def test_model_info(client):
     """Test model info endpoint"""
     response = client.get("/api/inference/model/info")
     assert response.status_code == 200
@@ -29,7 +65,7 @@ def test_model_info():
     assert "model_info" in data
     assert "status" in data
 
-def test_upload_invalid_file():
+def test_upload_invalid_file(client):
     """Test upload with invalid file"""
     response = client.post(
         "/api/upload",
@@ -37,7 +73,7 @@ def test_upload_invalid_file():
     )
     assert response.status_code == 400
 
-def test_upload_valid_file():
+def test_upload_valid_file(client):
     """Test upload with valid file"""
     # Create a mock image file
     mock_image_content = b"fake image content"
@@ -50,12 +86,541 @@ def test_upload_valid_file():
     assert "study_id" in data
     assert data["status"] == "uploaded"
 
-def test_analysis_nonexistent_study():
+def test_analysis_nonexistent_study(client):
     """Test analysis with non-existent study ID"""
     response = client.post("/api/inference/nonexistent-id")
     assert response.status_code == 404
 
-def test_get_analysis_nonexistent_study():
+def test_get_analysis_nonexistent_study(client):
     """Test get analysis with non-existent study ID"""
     response = client.get("/api/inference/nonexistent-id")
-    assert response.status_code == 404 
\ No newline at end of file
+    assert response.status_code == 404 
+def test_upload_and_analyze(client):
+    """Test uploading a file and running it through the inference scheduler"""
+    upload = client.post(
+        "/api/upload",
+        files={"file": ("scan.png", b"fake image content", "image/png")}
+    )
+    study_id = upload.json()["study_id"]
+    
+    response = client.post(f"/api/inference/{study_id}")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "analyzed"
+    assert data["prediction"] in ("normal", "suspicious")
+    
+    stats = client.get("/api/inference/scheduler/stats").json()
+    assert stats["requests"] >= 1
+
+def test_background_analysis_job(client):
+    """Test 202 job mode with status polling and SSE completion"""
+    upload = client.post(
+        "/api/upload",
+        files={"file": ("scan.png", b"fake image content", "image/png")}
+    )
+    study_id = upload.json()["study_id"]
+    
+    response = client.post(f"/api/inference/{study_id}?background=true")
+    assert response.status_code == 202
+    job = response.json()
+    assert job["job_id"]
+    
+    with client.stream("GET", job["events_url"]) as events:
+        assert events.headers["content-type"].startswith("text/event-stream")
+        body = "".join(events.iter_text())
+    assert "event: completed" in body
+    
+    status = client.get(job["status_url"]).json()
+    assert status["status"] == "completed"
+    assert status["result"]["study_id"] == study_id
+    
+    assert client.get(f"/api/inference/{study_id}").json()["status"] == "analyzed"
+
+def test_analysis_fails_when_result_cannot_be_saved(client, monkeypatch):
+    """Test a job whose result was never written ends failed, not analyzed"""
+    from backend.api import inference
+    
+    async def broken_update(*args, **kwargs):
+        raise RuntimeError("database is locked")
+    
+    monkeypatch.setattr(inference, "update_study_analysis", broken_update)
+    upload = client.post(
+        "/api/upload",
+        files={"file": ("scan.png", os.urandom(256), "image/png")}
+    )
+    study_id = upload.json()["study_id"]
+    
+    job = client.post(f"/api/inference/{study_id}?background=true").json()
+    with client.stream("GET", job["events_url"]) as events:
+        body = "".join(events.iter_text())
+    assert "event: failed" in body and "event: completed" not in body
+    
+    status = client.get(job["status_url"]).json()
+    assert status["status"] == "failed"
+    assert status["error"] == "Failed to save analysis results"
+    assert client.get(f"/api/inference/{study_id}").json()["status"] == "not_analyzed"
+    assert client.post(f"/api/inference/{study_id}").status_code == 500
+
+def test_get_nonexistent_job(client):
+    """Test job lookup with unknown job ID"""
+    response = client.get("/api/inference/jobs/nonexistent-id")
+    assert response.status_code == 404
+
+def test_upload_reports_size_and_digest(client):
+    """Test streaming upload computes size and SHA-256 in one pass"""
+    import hashlib
+    content = os.urandom(3 * 1024 * 1024)
+    response = client.post(
+        "/api/upload",
+        files={"file": ("large.png", content, "image/png")}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["file_size"] == len(content)
+    assert data["sha256"] == hashlib.sha256(content).hexdigest()
+
+def test_upload_stored_under_hash_shards(client):
+    """Test the stored path comes from the digest, never the client's filename"""
+    import hashlib
+    content = os.urandom(4096)
+    sha256 = hashlib.sha256(content).hexdigest()
+    upload = client.post(
+        "/api/upload",
+        files={"file": ("../../etc/evil name.png", content, "image/png")}
+    ).json()
+    study = client.get(f"/api/upload/{upload['study_id']}").json()
+    assert study["file_path"] == os.path.join(STORAGE_ROOT, sha256[:2], sha256[2:4], f"{sha256}.png")
+    assert study["filename"] == "../../etc/evil name.png"
+    assert client.get(f"/api/images/{upload['study_id']}/original").content == content
+
+def test_upload_too_large_leaves_no_file(client, monkeypatch):
+    """Test oversized uploads are aborted and their partial file removed"""
+    from backend.api import upload
+    monkeypatch.setattr(upload, "MAX_FILE_SIZE", 1024)
+    before = set(os.listdir(STORAGE_ROOT))
+    response = client.post(
+        "/api/upload",
+        files={"file": ("big.png", b"x" * 4096, "image/png")}
+    )
+    assert response.status_code == 400
+    assert set(os.listdir(STORAGE_ROOT)) == before
+
+def test_upload_rejected_by_content_length(client, monkeypatch):
+    """Test bodies declared larger than the limit are refused up front"""
+    from backend.api import upload
+    monkeypatch.setattr(upload, "MAX_FILE_SIZE", 1024)
+    monkeypatch.setattr(upload, "MULTIPART_OVERHEAD", 0)
+    response = client.post(
+        "/api/upload",
+        files={"file": ("big.png", b"x" * 4096, "image/png")}
+    )
+    assert response.status_code == 400
+
+def test_upload_missing_file(client):
+    """Test upload without a file part"""
+    response = client.post("/api/upload", data={"other": "value"}, files={"note": (None, "x")})
+    assert response.status_code == 422
+
+def test_duplicate_upload_reuses_file_and_cached_result(client):
+    """Test identical bytes are stored once and not re-analyzed"""
+    content = b"identical mammogram bytes " + os.urandom(16)
+    first = client.post("/api/upload", files={"file": ("a.png", content, "image/png")}).json()
+    second = client.post("/api/upload", files={"file": ("b.png", content, "image/png")}).json()
+    assert first["study_id"] != second["study_id"]
+    assert not first["deduplicated"]
+    assert second["deduplicated"]
+    
+    first_status = client.get(f"/api/upload/{first['study_id']}").json()
+    second_status = client.get(f"/api/upload/{second['study_id']}").json()
+    assert first_status["file_path"] == second_status["file_path"]
+    
+    analyzed = client.post(f"/api/inference/{first['study_id']}").json()
+    assert analyzed["cached"] is False
+    reused = client.post(f"/api/inference/{second['study_id']}").json()
+    assert reused["cached"] is True
+    assert reused["prediction"] == analyzed["prediction"]
+    assert reused["confidence"] == analyzed["confidence"]
+
+def test_polling_returns_304_when_unchanged(client):
+    """Test ETag revalidation on study and analysis polling"""
+    upload = client.post(
+        "/api/upload",
+        files={"file": ("poll.png", b"poll me " + os.urandom(8), "image/png")}
+    )
+    study_id = upload.json()["study_id"]
+    
+    first = client.get(f"/api/inference/{study_id}")
+    etag = first.headers["etag"]
+    unchanged = client.get(f"/api/inference/{study_id}", headers={"If-None-Match": etag})
+    assert unchanged.status_code == 304
+    assert unchanged.content == b""
+    
+    client.post(f"/api/inference/{study_id}")
+    changed = client.get(f"/api/inference/{study_id}", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json()["status"] == "analyzed"
+    
+    status = client.get(f"/api/upload/{study_id}")
+    assert status.json()["prediction"] == changed.json()["prediction"]
+    revalidated = client.get(f"/api/upload/{study_id}", headers={"If-None-Match": status.headers["etag"]})
+    assert revalidated.status_code == 304
+
+def test_bulk_upload_files_and_archive(client):
+    """Test bulk ingest of loose files and a zip archive with per-file outcomes"""
+    import io
+    import zipfile
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("L_CC.dcm", b"left cc " + os.urandom(8))
+        zf.writestr("R_MLO.png", b"right mlo " + os.urandom(8))
+        zf.writestr("notes.txt", b"not an image")
+    
+    response = client.post(
+        "/api/upload/bulk",
+        files=[
+            ("files", ("view1.png", b"view one " + os.urandom(8), "image/png")),
+            ("files", ("bad.txt", b"nope", "text/plain")),
+            ("files", ("series.zip", archive.getvalue(), "application/zip")),
+        ]
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["uploaded"] == 3
+    assert data["rejected"] == 2
+    uploaded = [r for r in data["results"] if r["status"] == "uploaded"]
+    assert {r["filename"] for r in uploaded} == {"view1.png", "series.zip/L_CC.dcm", "series.zip/R_MLO.png"}
+    
+    for result in uploaded:
+        study = client.get(f"/api/upload/{result['study_id']}").json()
+        assert study["content_hash"] == result["sha256"]
+        assert os.path.exists(study["file_path"])
+    assert not os.listdir(os.path.join(STORAGE_ROOT, ".incoming"))
+
+def test_bulk_upload_rejects_archive_expanding_past_limit(client, monkeypatch):
+    """Test an archive that decompresses past MAX_ARCHIVE_EXTRACTED_SIZE fails the request with 413"""
+    import io
+    import zipfile
+    from backend.api import upload
+    monkeypatch.setattr(upload, "MAX_ARCHIVE_EXTRACTED_SIZE", 2 * 1024 * 1024)
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zf:
+        for index in range(4):
+            zf.writestr(f"slice_{index}.dcm", bytes([index]) * (1024 * 1024))
+    
+    response = client.post(
+        "/api/upload/bulk",
+        files=[
+            ("files", ("loose.png", b"loose " + os.urandom(8), "image/png")),
+            ("files", ("bomb.zip", archive.getvalue(), "application/zip")),
+        ]
+    )
+    assert response.status_code == 413
+    assert not os.listdir(os.path.join(STORAGE_ROOT, ".incoming"))
+
+def test_batch_inference(client):
+    """Test batch analysis over many studies with progress and partial results"""
+    study_ids = [
+        client.post(
+            "/api/upload",
+            files={"file": (f"cohort{i}.png", b"cohort " + os.urandom(8), "image/png")}
+        ).json()["study_id"]
+        for i in range(3)
+    ]
+    client.post(f"/api/inference/{study_ids[0]}")
+    
+    response = client.post(
+        "/api/inference/batch",
+        json={"study_ids": study_ids + ["missing-study"]}
+    )
+    assert response.status_code == 202
+    job = response.json()
+    
+    with client.stream("GET", job["events_url"]) as events:
+        body = "".join(events.iter_text())
+    assert "event: progress" in body
+    assert "event: completed" in body
+    
+    result = client.get(job["status_url"]).json()["result"]
+    assert result["total"] == 4
+    assert result["analyzed"] == 2
+    assert result["already_analyzed"] == 1
+    assert result["not_found"] == 1
+    for study_id in study_ids:
+        assert client.get(f"/api/inference/{study_id}").json()["status"] == "analyzed"
+    
+    forced = client.post("/api/inference/batch", json={"study_ids": study_ids, "force": True}).json()
+    with client.stream("GET", forced["events_url"]) as events:
+        "".join(events.iter_text())
+    assert client.get(forced["status_url"]).json()["result"]["analyzed"] == 3
+
+def test_batch_and_single_analysis_share_per_study_jobs(client, monkeypatch):
+    """Test a study is classified once when a batch and single requests overlap"""
+    import time
+    from backend.api import inference
+    
+    calls = []
+    
+    async def slow_classify(image_path):
+        calls.append(image_path)
+        await asyncio.sleep(0.3)
+        return {"prediction": "normal", "confidence": 0.9, "regions": [],
+                "model_version": inference.model.version, "image_quality": "good"}
+    
+    monkeypatch.setattr(inference.scheduler, "classify", slow_classify)
+    first, second = (
+        client.post("/api/upload", files={"file": (f"overlap{i}.png", os.urandom(64), "image/png")}).json()["study_id"]
+        for i in range(2)
+    )
+    
+    def wait_until_analyzing(study_id):
+        deadline = time.monotonic() + 5
+        while client.get(f"/api/inference/{study_id}").json()["status"] != "analyzing":
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+    
+    # A single request for a study the batch is classifying joins the batch's job
+    batch = client.post("/api/inference/batch", json={"study_ids": [first]}).json()
+    wait_until_analyzing(first)
+    single = client.post(f"/api/inference/{first}")
+    assert single.status_code == 200 and single.json()["status"] == "analyzed"
+    with client.stream("GET", batch["events_url"]) as events:
+        "".join(events.iter_text())
+    assert len(calls) == 1
+    
+    # A batch reaching a study with a single job in flight waits for that job
+    job = client.post(f"/api/inference/{second}?background=true").json()
+    wait_until_analyzing(second)
+    batch = client.post("/api/inference/batch", json={"study_ids": [second], "force": True}).json()
+    with client.stream("GET", batch["events_url"]) as events:
+        "".join(events.iter_text())
+    status = client.get(batch["status_url"]).json()
+    assert status["result"]["analyzed"] == 1
+    assert client.get(job["status_url"]).json()["status"] == "completed"
+    assert len(calls) == 2
+
+def test_batch_inference_requires_ids(client):
+    """Test batch analysis validation"""
+    response = client.post("/api/inference/batch", json={"study_ids": []})
+    assert response.status_code == 422
+
+def test_upload_preprocesses_image(client):
+    """Test a decodable upload is preprocessed and inference reads the array"""
+    import io
+    from PIL import Image
+    from backend.ai.preprocess import preprocessor
+    
+    buffer = io.BytesIO()
+    Image.new("L", (80, 60), color=128).save(buffer, format="PNG")
+    upload = client.post(
+        "/api/upload",
+        files={"file": ("real.png", buffer.getvalue(), "image/png")}
+    ).json()
+    
+    response = client.post(f"/api/inference/{upload['study_id']}")
+    assert response.status_code == 200
+    assert os.path.exists(preprocessor.cache.path_for(upload["sha256"]))
+    assert client.get("/api/health/detailed").json()["preprocessing"]["cache"]["entries"] >= 1
+
+def _upload_real_image(client, width=600, height=400):
+    import io
+    import numpy as np
+    from PIL import Image
+    
+    buffer = io.BytesIO()
+    Image.fromarray(np.random.randint(0, 255, (height, width), dtype=np.uint8)).save(buffer, format="PNG")
+    return client.post(
+        "/api/upload",
+        files={"file": ("viewer.png", buffer.getvalue(), "image/png")}
+    ).json(), buffer.getvalue()
+
+def test_thumbnail_and_pyramid(client):
+    """Test derived images are served small, cacheable and revalidatable"""
+    upload, data = _upload_real_image(client)
+    study_id = upload["study_id"]
+    pyramid = derived_images.pyramid_path(hashlib.sha256(data).hexdigest())
+    
+    response = client.get(f"/api/images/{study_id}/thumbnail", params={"size": 128})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/jpeg"
+    assert "immutable" in response.headers["cache-control"]
+    assert len(response.content) < 20000
+    # Thumbnails never wait on the tile pyramid
+    assert not os.path.exists(pyramid)
+    
+    revalidated = client.get(
+        f"/api/images/{study_id}/thumbnail",
+        params={"size": 128},
+        headers={"If-None-Match": response.headers["etag"]}
+    )
+    assert revalidated.status_code == 304
+    
+    descriptor = client.get(f"/api/images/{study_id}/pyramid.dzi")
+    assert descriptor.status_code == 200
+    assert os.path.isdir(pyramid)
+    assert 'Width="600" Height="400"' in descriptor.text
+    
+    assert client.get(f"/api/images/{study_id}/pyramid_files/10/2_1.jpg").status_code == 200
+    assert client.get(f"/api/images/{study_id}/pyramid_files/10/9_9.jpg").status_code == 404
+    assert client.get(f"/api/images/{study_id}/thumbnail", params={"size": 77}).status_code == 400
+
+def test_original_supports_ranges(client):
+    """Test the original is served with byte-range support"""
+    upload, content = _upload_real_image(client, 64, 64)
+    url = f"/api/images/{upload['study_id']}/original"
+    
+    full = client.get(url)
+    assert full.status_code == 200
+    assert full.content == content
+    assert full.headers["accept-ranges"] == "bytes"
+    
+    partial = client.get(url, headers={"Range": "bytes=10-19"})
+    assert partial.status_code == 206
+    assert partial.content == content[10:20]
+    assert partial.headers["content-range"] == f"bytes 10-19/{len(content)}"
+    
+    suffix = client.get(url, headers={"Range": "bytes=-5"})
+    assert suffix.content == content[-5:]
+    
+    unsatisfiable = client.get(url, headers={"Range": f"bytes={len(content)}-"})
+    assert unsatisfiable.status_code == 416
+
+def test_undecodable_image_cannot_be_rendered(client):
+    """Test derived images report 415 for files that don't decode"""
+    upload = client.post(
+        "/api/upload",
+        files={"file": ("broken.png", b"not really a png", "image/png")}
+    ).json()
+    response = client.get(f"/api/images/{upload['study_id']}/thumbnail")
+    assert response.status_code == 415
+    assert client.get("/api/images/missing-study/thumbnail").status_code == 404
+
+def test_list_studies_with_cursor(client):
+    """Test the study listing pages with an opaque cursor"""
+    for i in range(3):
+        client.post("/api/upload", files={"file": (f"list{i}.png", b"list" + os.urandom(8), "image/png")})
+    
+    first = client.get("/api/studies", params={"limit": 2})
+    assert first.status_code == 200
+    page = first.json()
+    assert page["count"] == 2
+    assert page["next_cursor"]
+    
+    second = client.get("/api/studies", params={"limit": 2, "cursor": page["next_cursor"]}).json()
+    first_ids = {item["study_id"] for item in page["items"]}
+    assert not first_ids & {item["study_id"] for item in second["items"]}
+    
+    pending = client.get("/api/studies", params={"prediction": "pending", "limit": 500}).json()
+    assert all(item["prediction"] is None for item in pending["items"])
+    
+    assert client.get("/api/studies", params={"cursor": "garbage"}).status_code == 400
+    assert client.get("/api/studies", params={"min_confidence": 0.9, "max_confidence": 0.1}).status_code == 400
+
+def test_metrics_endpoint(client):
+    """Test Prometheus metrics cover routes and pipeline stages"""
+    client.get("/api/health")
+    upload = client.post("/api/upload", files={"file": ("metrics.png", b"metrics " + os.urandom(8), "image/png")}).json()
+    client.post(f"/api/inference/{upload['study_id']}")
+    
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/health"}' in text
+    assert 'http_requests_total{method="POST",route="/api/inference/{study_id}",status="200"}' in text
+    assert 'db_query_duration_seconds_bucket{operation="select",le="+Inf"}' in text
+    assert "upload_file_write_seconds_count" in text
+    assert "inference_classifier_seconds_count" in text
+    assert "inference_queue_wait_seconds_count" in text
+    assert "upload_received_bytes_total" in text
+    assert "http_requests_in_flight 1" in text
+    # Routes are labelled by template, never by concrete ID
+    assert upload["study_id"] not in text
+
+def test_study_timeline(client):
+    """Test each pipeline stage shows up on the study's timeline"""
+    upload, _ = _upload_real_image(client, 120, 80)
+    study_id = upload["study_id"]
+    assert client.post(f"/api/inference/{study_id}").status_code == 200
+    
+    response = client.get(f"/api/studies/{study_id}/timeline")
+    assert response.status_code == 200
+    data = response.json()
+    stages = [event["stage"] for event in data["events"]]
+    for stage in ("upload_received", "file_written", "db_saved", "classify", "result_committed"):
+        assert stage in stages
+    assert stages.index("db_saved") < stages.index("classify") < stages.index("result_committed")
+    assert data["total_ms"] >= data["stages"]["classify"]
+    
+    assert client.get("/api/studies/nonexistent-id/timeline").status_code == 404
+
+def test_region_search(client):
+    """Test regions stored by analysis are returned with the study and found by box and confidence"""
+    import uuid
+    from backend.storage.database import AsyncSessionLocal, update_study_analysis
+
+    study_id = client.post("/api/upload", files={"file": ("roi.png", b"roi" + os.urandom(8), "image/png")}).json()["study_id"]
+    label = f"mass-{uuid.uuid4().hex[:8]}"
+    regions = [
+        {"id": "region_1", "x": 60, "y": 40, "width": 30, "height": 30, "confidence": 0.91, "type": label},
+        {"id": "region_2", "x": 500, "y": 420, "width": 80, "height": 60, "confidence": 0.65, "type": label},
+    ]
+
+    async def analyze():
+        async with AsyncSessionLocal() as db:
+            await update_study_analysis(db, study_id, "suspicious", 0.9, 0.1, regions=regions)
+
+    client.portal.call(analyze)
+    study = client.get(f"/api/upload/{study_id}").json()
+    assert [region["id"] for region in study["regions"]] == ["region_1", "region_2"]
+
+    first = client.get("/api/regions", params={"type": label, "limit": 1}).json()
+    assert first["items"][0]["study_id"] == study_id
+    assert first["items"][0]["confidence"] == 0.91
+    second = client.get("/api/regions", params={"type": label, "limit": 1, "cursor": first["next_cursor"]}).json()
+    assert [item["id"] for item in second["items"]] == ["region_2"]
+    assert second["next_cursor"] is None
+
+    quadrant = client.get("/api/regions", params={"type": label, "bbox": "0,0,256,256", "contained": True}).json()
+    assert [item["id"] for item in quadrant["items"]] == ["region_1"]
+    assert client.get("/api/regions", params={"type": label, "min_area": 1000}).json()["count"] == 1
+
+    assert client.get("/api/regions", params={"bbox": "10,10,0,0"}).status_code == 400
+    assert client.get("/api/regions", params={"cursor": "garbage"}).status_code == 400
+
+def test_stats_endpoint(client):
+    """Test screening statistics count new uploads and analyses for today"""
+    before = client.get("/api/stats", params={"days": 1}).json()
+    study_id = client.post("/api/upload", files={"file": ("stats.png", b"stats" + os.urandom(8), "image/png")}).json()["study_id"]
+    client.post(f"/api/inference/{study_id}")
+
+    response = client.get("/api/stats", params={"days": 1})
+    assert response.status_code == 200
+    stats = response.json()
+    assert stats["start"] == stats["end"]
+    assert stats["studies"] == before["studies"] + 1
+    assert stats["analyzed"] == before["analyzed"] + 1
+    assert len(stats["confidence_histogram"]) == 10
+    assert sum(bucket["studies"] for bucket in stats["confidence_histogram"]) == stats["analyzed"]
+    assert all(model["mean_processing_time"] is not None for model in stats["models"])
+    assert client.get("/api/stats", params={"days": 1}, headers={"If-None-Match": response.headers["etag"]}).status_code == 304
+
+    assert client.get("/api/stats", params={"start": "2024-02-01", "end": "2024-01-01"}).status_code == 400
+
+def test_admission_rejections_carry_cors_headers(client, monkeypatch):
+    """Test rate-limited responses are readable cross-origin and preflights are never limited"""
+    from backend.api.admission import EndpointClass, admission
+    monkeypatch.setattr(admission, "classes", [
+        EndpointClass("write", (), r"^/", concurrency=4, queue=0, rate=0.001, burst=1),
+    ])
+    origin = {"Origin": "http://localhost:3000"}
+    
+    assert client.get("/", headers=origin).status_code == 200
+    limited = client.get("/", headers=origin)
+    assert limited.status_code == 429
+    assert "access-control-allow-origin" in limited.headers
+    assert "retry-after" in limited.headers["access-control-expose-headers"].lower()
+    
+    preflight = client.options("/api/upload", headers={**origin, "Access-Control-Request-Method": "POST"})
+    assert preflight.status_code == 200
+    # Plain OPTIONS requests reach the app instead of spending the client's tokens
+    assert client.options("/").status_code == 405
@@ -0,0 +1,69 @@
+import copy
+
+import pytest
+
+from benchmarks.harness import compare, percentile, summarize
+
+
+def _results(p95=100.0, p99=120.0, rps=50.0, errors=0, requests=100):
+    return {
+        "endpoints": {
+            "POST /api/upload": {
+                "requests": requests,
+                "errors": errors,
+                "throughput_rps": rps,
+                "latency_ms": {"mean": 80.0, "p50": 70.0, "p95": p95, "p99": p99, "max": 150.0}
+            }
+        }
+    }
+
+
+def test_percentiles_use_nearest_rank():
+    """Percentiles and summaries are computed from raw latencies"""
+    ordered = [i / 1000 for i in range(1, 101)]
+    assert percentile(ordered, 0.50) == 0.050
+    assert percentile(ordered, 0.99) == 0.099
+    stats = summarize(ordered, errors=2, elapsed=2.0)
+    assert stats["throughput_rps"] == 50.0
+    assert stats["latency_ms"]["p95"] == 95.0
+    assert stats["errors"] == 2
+
+
+def test_compare_flags_regressions_past_threshold():
+    """Latency, throughput and error regressions beyond the threshold are reported"""
+    baseline = _results()
+    assert compare(copy.deepcopy(baseline), baseline, threshold=0.2) == []
+    assert compare(_results(p95=115.0), baseline, threshold=0.2) == []
+
+    regressions = compare(_results(p95=130.0, rps=30.0, errors=1), baseline, threshold=0.2)
+    assert len(regressions) == 3
+    assert any("p95" in message for message in regressions)
+    assert any("throughput" in message for message in regressions)
+    assert any("errors" in message for message in regressions)
+
+    # Too few samples to judge latency, but errors still count
+    assert compare(_results(p95=500.0, requests=3), baseline, threshold=0.2) == []
+
+
+def test_serialization_paths_produce_the_same_json():
+    """Before and after serializers agree on the decoded JSON, and timings are reported"""
+    from benchmarks.serialization import run
+
+    results = run(regions=2, min_seconds=0.001)
+    assert set(results["payloads"]) == {"study", "studies_page_50", "studies_page_500", "regions_page_500", "timeline"}
+    for entry in results["payloads"].values():
+        assert entry["before_us"] > 0 and entry["after_us"] > 0
+        assert entry["compression"]["gzip"]["bytes"] < entry["bytes"]
+
+
+def test_inference_benchmark_compares_backends():
+    """Mock, fp32 and int8 cases each report throughput per batch size"""
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("onnx")
+    from benchmarks.inference import run
+
+    results = run(demo=True, quantize=True, threads=[1], batch_sizes=[2], images=2, rounds=1, mock=True)
+    assert set(results["cases"]) == {"mock", "onnx-fp32-t1", "onnx-int8-t1"}
+    assert results["cases"]["onnx-int8-t1"]["precision"] == "int8"
+    for entry in results["cases"].values():
+        assert entry["batch_sizes"]["2"]["images_per_second"] > 0
@@ -0,0 +1,116 @@
+import hashlib
+import os
+
+import pytest
+
+from backend.storage.blobs import BlobStore, LocalBlobStore, S3BlobStore, shard_key
+
+
+def _stage(store, payload, extension=".png"):
+    path = store.staging_path(extension)
+    with open(path, "wb") as f:
+        f.write(payload)
+    return path, hashlib.sha256(payload).hexdigest()
+
+
+def test_shard_key():
+    assert shard_key("abcdef0123", ".PNG") == "ab/cd/abcdef0123.png"
+    assert shard_key("abcdef0123", ".dcm", depth=1, width=3) == "abc/abcdef0123.dcm"
+
+
+def test_local_store_shards_and_deduplicates(tmp_path):
+    """Test files land under hash-prefix directories and a second copy is dropped"""
+    store = LocalBlobStore(str(tmp_path))
+    payload = os.urandom(200_000)
+
+    staged, sha256 = _stage(store, payload)
+    location, deduplicated = store.commit(staged, sha256, ".png")
+    assert location == os.path.join(str(tmp_path), sha256[:2], sha256[2:4], f"{sha256}.png")
+    assert not deduplicated
+    assert not os.path.exists(staged)
+
+    staged, _ = _stage(store, payload)
+    assert store.commit(staged, sha256, ".png") == (location, True)
+    assert not os.listdir(store.staging_dir)
+
+    assert store.size(location) == len(payload)
+    assert b"".join(store.iter_range(location)) == payload
+    assert b"".join(store.iter_range(location, 70_000, 100_000)) == payload[70_000:170_000]
+    with store.local_file(location) as path:
+        assert path == location
+
+
+
+def test_partial_store_cannot_be_created(tmp_path):
+    """A backend missing any storage operation fails at construction, not on first use"""
+    class CommitOnly(BlobStore):
+        def commit(self, staged_path, sha256, extension):
+            return staged_path, False
+
+    with pytest.raises(TypeError):
+        CommitOnly(str(tmp_path))
+
+
+@pytest.fixture
+def s3_store(tmp_path):
+    moto = pytest.importorskip("moto")
+    import boto3
+
+    with moto.mock_s3():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket="studies")
+        yield S3BlobStore(bucket="studies", prefix="originals/", staging_dir=str(tmp_path), client=client)
+
+
+def test_s3_store_roundtrip(s3_store, tmp_path):
+    """Test commit, dedup, ranged streaming reads and local copies against an in-process S3"""
+    payload = os.urandom(300_000)
+
+    staged, sha256 = _stage(s3_store, payload, ".dcm")
+    location, deduplicated = s3_store.commit(staged, sha256, ".dcm")
+    assert location == f"s3://studies/originals/{sha256[:2]}/{sha256[2:4]}/{sha256}.dcm"
+    assert not deduplicated
+    assert not os.path.exists(staged)
+
+    staged, _ = _stage(s3_store, payload, ".dcm")
+    assert s3_store.commit(staged, sha256, ".dcm") == (location, True)
+
+    assert s3_store.exists(location)
+    assert s3_store.filesystem_path(location) is None
+    assert s3_store.size(location) == len(payload)
+    assert b"".join(s3_store.iter_range(location)) == payload
+    assert b"".join(s3_store.iter_range(location, 1000, 150_000)) == payload[1000:151_000]
+
+    with s3_store.local_file(location) as path:
+        assert path.endswith(".dcm")
+        with open(path, "rb") as f:
+            assert f.read() == payload
+    assert not os.path.exists(path)
+
+    s3_store.delete(location)
+    assert not s3_store.exists(location)
+    assert not os.listdir(tmp_path)
+
+
+def test_s3_dedup_hit_protects_object_from_maintenance(s3_store):
+    """Test a duplicate upload marks the object reused, so recompression and retention keep it"""
+    from backend.storage.maintenance import MaintenanceScheduler
+
+    maintenance = MaintenanceScheduler(store=s3_store, enabled=False)
+    staged, sha256 = _stage(s3_store, os.urandom(1000))
+    location, _ = s3_store.commit(staged, sha256, ".png")
+    recorded = s3_store.last_modified(location)
+
+    # A concurrent upload of the same bytes lands while maintenance is working on the object
+    staged, _ = _stage(s3_store, b"")
+    assert s3_store.commit(staged, sha256, ".png") == (location, True)
+    assert s3_store.last_modified(location) > recorded
+    assert not maintenance._delete_replaced(location, recorded)
+    result = {"files": 0, "kept_recently_reused": 0}
+    assert maintenance._delete_orphan(location, result) == 0
+    assert result["kept_recently_reused"] == 1
+    assert s3_store.exists(location)
+
+    # Untouched since it was recorded: deleted
+    assert maintenance._delete_replaced(location, s3_store.last_modified(location))
+    assert not s3_store.exists(location)
@@ -0,0 +1,48 @@
+import time
+
+from backend.storage.cache import StudyCache
+
+
+def test_lru_eviction():
+    cache = StudyCache(max_entries=2, ttl=60)
+    cache.set("a", {"v": 1})
+    cache.set("b", {"v": 2})
+    cache.get("a")
+    cache.set("c", {"v": 3})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"v": 1}
+    assert cache.get("c") == {"v": 3}
+
+
+def test_entries_expire():
+    cache = StudyCache(max_entries=10, ttl=0.01)
+    cache.set("a", {"v": 1})
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert cache.get_stats()["entries"] == 0
+
+
+def test_returned_copies_do_not_alias_cache():
+    cache = StudyCache()
+    cache.set("a", {"v": 1})
+    cache.get("a")["v"] = 2
+    assert cache.get("a") == {"v": 1}
+
+
+def test_nested_values_do_not_alias_cache():
+    cache = StudyCache()
+    study = {"study_id": "a", "regions": [{"x": 1}]}
+    cache.set("a", study)
+    study["regions"][0]["x"] = 2
+    cache.get("a")["regions"].append({"x": 3})
+    assert cache.get("a")["regions"] == [{"x": 1}]
+
+
+def test_invalidate_and_stats():
+    cache = StudyCache()
+    cache.set("a", {"v": 1})
+    cache.invalidate("a")
+    assert cache.get("a") is None
+    stats = cache.get_stats()
+    assert stats["misses"] == 1
+    assert stats["hits"] == 0
@@ -0,0 +1,67 @@
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse, PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from backend.api.compression import CompressionMiddleware, choose_encoding
+
+
+def test_choose_encoding():
+    assert choose_encoding("gzip, deflate, br") == "br"
+    assert choose_encoding("gzip, br;q=0") == "gzip"
+    assert choose_encoding("gzip, deflate, br", brotli_available=False) == "gzip"
+    assert choose_encoding("*") == "br"
+    assert choose_encoding("identity") is None
+    assert choose_encoding("") is None
+
+
+def _app():
+    app = FastAPI(default_response_class=ORJSONResponse)
+    app.add_middleware(CompressionMiddleware, minimum_size=500)
+
+    @app.get("/small")
+    def small():
+        return {"status": "ok"}
+
+    @app.get("/large")
+    def large():
+        return {"items": [{"study_id": f"study-{i}", "prediction": "normal"} for i in range(200)]}
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse((f"line {i}\n" * 50 for i in range(20)), media_type="text/plain")
+
+    @app.get("/events")
+    def events():
+        return StreamingResponse(iter(["data: x\n\n"] * 100), media_type="text/event-stream")
+
+    @app.get("/created")
+    def created():
+        return PlainTextResponse("x" * 2000, status_code=201)
+
+    return app
+
+
+def test_middleware_negotiates_and_skips_small_bodies():
+    """Test large JSON is compressed per Accept-Encoding, small bodies and streams of events are not"""
+    client = TestClient(_app())
+    plain = client.get("/large", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+
+    for encoding in ("br", "gzip"):
+        response = client.get("/large", headers={"Accept-Encoding": encoding})
+        assert response.headers["content-encoding"] == encoding
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert int(response.headers["content-length"]) < len(plain.content)
+        assert response.json() == plain.json()
+
+    small = client.get("/small", headers={"Accept-Encoding": "br"})
+    assert "content-encoding" not in small.headers
+    assert small.headers["vary"] == "Accept-Encoding"
+
+    streamed = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert streamed.headers["content-encoding"] == "gzip"
+    assert streamed.text == "".join(f"line {i}\n" * 50 for i in range(20))
+
+    assert "content-encoding" not in client.get("/events", headers={"Accept-Encoding": "br"}).headers
+    assert "content-encoding" not in client.get("/created", headers={"Accept-Encoding": "br"}).headers
+    assert "content-encoding" not in client.get("/large", headers={"Accept-Encoding": "br", "Range": "bytes=0-9"}).headers
@@ -0,0 +1,414 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import text
+
+from backend.storage.database import (
+    AsyncSessionLocal,
+    engine,
+    get_processing_logs,
+    get_study_stats,
+    get_study,
+    init_db,
+    list_studies,
+    purge_expired_studies,
+    rebuild_study_stats,
+    save_studies,
+    search_regions,
+    save_study,
+    update_study_analysis,
+)
+
+
+@pytest.fixture(autouse=True)
+def _tables():
+    asyncio.run(init_db())
+    yield
+    # Pooled connections belong to the loop that opened them
+    asyncio.run(engine.dispose())
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_sqlite_runs_in_wal_mode():
+    """File-backed database is opened in WAL journal mode"""
+    async def journal_mode():
+        async with engine.connect() as conn:
+            return (await conn.execute(text("PRAGMA journal_mode"))).scalar()
+
+    assert _run(journal_mode()).lower() == "wal"
+
+
+def test_save_update_and_get_study():
+    """Async helpers round-trip a study through the database"""
+    study_id = str(uuid.uuid4())
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            saved = await save_study(
+                db=db,
+                study_id=study_id,
+                filename="scan.png",
+                file_path=f"uploads/{study_id}_scan.png",
+                content_type="image/png",
+                file_size=42,
+            )
+            assert saved["prediction"] is None
+
+            await update_study_analysis(
+                db=db,
+                study_id=study_id,
+                prediction="normal",
+                confidence=0.91,
+                processing_time=0.5,
+                regions=[],
+                model_version="test",
+                image_quality="good",
+            )
+
+        async with AsyncSessionLocal() as db:
+            return await get_study(db, study_id)
+
+    study = _run(scenario())
+    assert study["prediction"] == "normal"
+    assert study["confidence"] == pytest.approx(0.91)
+
+
+def test_concurrent_reads_during_write():
+    """Reads proceed on separate pooled connections while a write is in flight"""
+    study_id = str(uuid.uuid4())
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            await save_study(
+                db=db,
+                study_id=study_id,
+                filename="scan.png",
+                file_path=f"uploads/{study_id}_scan.png",
+                content_type="image/png",
+                file_size=42,
+            )
+
+        async def read():
+            async with AsyncSessionLocal() as db:
+                return await get_study(db, study_id)
+
+        async def write():
+            async with AsyncSessionLocal() as db:
+                return await update_study_analysis(
+                    db=db,
+                    study_id=study_id,
+                    prediction="suspicious",
+                    confidence=0.7,
+                    processing_time=0.1,
+                )
+
+        return await asyncio.gather(write(), *(read() for _ in range(8)))
+
+    results = _run(scenario())
+    assert results[0]["prediction"] == "suspicious"
+    assert all(r["study_id"] == study_id for r in results[1:])
+
+
+def test_upgrade_adds_new_columns_to_existing_database(tmp_path):
+    """Databases created before a column existed gain it at start-up"""
+    import sqlite3
+    from sqlalchemy import create_engine, inspect
+
+    from backend.storage.database import _upgrade_schema
+    from backend.storage.models import Base
+
+    path = tmp_path / "old.db"
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE studies (id INTEGER PRIMARY KEY, study_id VARCHAR(50), filename VARCHAR(255), "
+            "file_path VARCHAR(500), content_type VARCHAR(100), file_size INTEGER)"
+        )
+
+    legacy = create_engine(f"sqlite:///{path}")
+    with legacy.begin() as conn:
+        Base.metadata.create_all(conn)
+        _upgrade_schema(conn)
+        columns = {column["name"] for column in inspect(conn).get_columns("studies")}
+    legacy.dispose()
+
+    assert "content_hash" in columns
+    assert "prediction" in columns
+
+
+def test_keyset_pagination_walks_every_row_once():
+    """Pages never skip or repeat rows, even when timestamps tie"""
+    label = f"keyset-{uuid.uuid4().hex[:8]}"
+    rows = [
+        {
+            "study_id": str(uuid.uuid4()),
+            "filename": f"scan{i}.png",
+            "file_path": f"uploads/scan{i}.png",
+            "content_type": "image/png",
+            "file_size": i,
+            "prediction": label,
+            "confidence": i / 25
+        }
+        for i in range(25)
+    ]
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            await save_studies(db, rows)
+            seen, after = [], None
+            while True:
+                items, after = await list_studies(db, limit=7, after=after, prediction=label)
+                seen.extend(item["study_id"] for item in items)
+                assert "regions" not in items[0] and "file_path" not in items[0]
+                if after is None:
+                    break
+            confident, _ = await list_studies(db, limit=100, prediction=label, min_confidence=0.5, max_confidence=0.8)
+            oldest, _ = await list_studies(db, limit=1, prediction=label, ascending=True)
+            return seen, confident, oldest
+
+    seen, confident, oldest = _run(scenario())
+    assert sorted(seen) == sorted(row["study_id"] for row in rows)
+    assert len(seen) == len(set(seen))
+    assert seen[0] == rows[-1]["study_id"]  # newest first, ties broken by id
+    assert {item["file_size"] for item in confident} == set(range(13, 21))
+    assert oldest[0]["study_id"] == rows[0]["study_id"]
+
+
+def test_listing_uses_composite_index():
+    """Filtered, ordered listing is served by an index without a sort step"""
+    async def plan():
+        async with engine.connect() as conn:
+            result = await conn.execute(text(
+                "EXPLAIN QUERY PLAN SELECT id FROM studies WHERE prediction = 'normal' "
+                "ORDER BY created_at DESC, id DESC LIMIT 50"
+            ))
+            return " ".join(str(row[-1]) for row in result)
+
+    detail = _run(plan())
+    assert "ix_studies_prediction_created_at_id" in detail
+    assert "TEMP B-TREE" not in detail
+
+
+def test_regions_are_indexed_and_searchable():
+    """Regions round-trip through study_regions and are found by confidence, type, area and box"""
+    label = f"regions-{uuid.uuid4().hex[:8]}"
+    study_ids = [str(uuid.uuid4()) for _ in range(3)]
+    regions = [
+        [{"id": "region_1", "x": 10, "y": 10, "width": 20, "height": 20, "confidence": 0.9, "type": label,
+          "severity": "high", "description": "upper left", "mask": [1, 2]}],
+        [{"id": "region_1", "x": 300, "y": 300, "width": 50, "height": 40, "confidence": 0.7, "type": label},
+         {"id": "region_2", "x": 40, "y": 0, "width": 100, "height": 100, "confidence": 0.8, "type": label}],
+        [],
+    ]
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            await save_studies(db, [
+                {"study_id": study_id, "filename": "scan.png", "file_path": "uploads/scan.png",
+                 "content_type": "image/png", "file_size": 1}
+                for study_id in study_ids
+            ])
+            for study_id, study_regions in zip(study_ids, regions):
+                stored = await update_study_analysis(
+                    db, study_id, "suspicious" if study_regions else "normal", 0.8, 0.1, regions=study_regions
+                )
+                assert len(stored["regions"]) == len(study_regions)
+            # Re-analysis replaces the previous regions
+            await update_study_analysis(db, study_ids[1], "suspicious", 0.8, 0.1, regions=regions[1])
+
+        from backend.storage.database import study_cache
+        study_cache.clear()
+        async with AsyncSessionLocal() as db:
+            first = await get_study(db, study_ids[0])
+            second = await get_study(db, study_ids[1])
+            third = await get_study(db, study_ids[2])
+            confident, _ = await search_regions(db, region_type=label, min_confidence=0.75)
+            large, _ = await search_regions(db, region_type=label, min_area=1500)
+            upper_left, _ = await search_regions(db, region_type=label, bbox=(0, 0, 50, 50))
+            inside, _ = await search_regions(db, region_type=label, bbox=(0, 0, 50, 50), contained=True)
+            pages, after = [], None
+            while True:
+                items, after = await search_regions(db, limit=2, after=after, region_type=label)
+                pages.append(items)
+                if after is None:
+                    break
+            return first, second, third, confident, large, upper_left, inside, pages
+
+    first, second, third, confident, large, upper_left, inside, pages = _run(scenario())
+    assert first["regions"] == [{**regions[0][0], "x": 10.0, "y": 10.0, "width": 20.0, "height": 20.0}]
+    assert [region["id"] for region in second["regions"]] == ["region_1", "region_2"]
+    assert third["regions"] == []
+    assert [item["confidence"] for item in confident] == [0.9, 0.8]
+    assert {item["area"] for item in large} == {2000.0, 10000.0}
+    assert {(item["study_id"], item["id"]) for item in upper_left} == {(study_ids[0], "region_1"), (study_ids[1], "region_2")}
+    assert [item["study_id"] for item in inside] == [study_ids[0]]
+    assert [len(page) for page in pages] == [2, 1]
+    assert [item["confidence"] for page in pages for item in page] == [0.9, 0.8, 0.7]
+
+
+def test_region_searches_use_indexes():
+    """Box searches go through the R*Tree and confidence searches seek the confidence index"""
+    async def plan(sql):
+        async with engine.connect() as conn:
+            result = await conn.execute(text("EXPLAIN QUERY PLAN " + sql))
+            return " ".join(str(row[-1]) for row in result)
+
+    spatial = _run(plan(
+        "SELECT r.id FROM study_regions r JOIN study_regions_rtree t ON t.id = r.id "
+        "WHERE t.min_x <= 50 AND t.max_x >= 0 AND t.min_y <= 50 AND t.max_y >= 0"
+    ))
+    by_confidence = _run(plan(
+        "SELECT id FROM study_regions WHERE confidence >= 0.8 ORDER BY confidence DESC, id DESC LIMIT 50"
+    ))
+    assert "VIRTUAL TABLE INDEX" in spatial
+    assert "ix_study_regions_confidence" in by_confidence
+    assert "TEMP B-TREE" not in by_confidence
+
+
+def _stats_today(model_version=None):
+    async def read():
+        today = datetime.now(timezone.utc).date()
+        async with AsyncSessionLocal() as db:
+            return await get_study_stats(db, today - timedelta(days=1), today, model_version=model_version)
+
+    return _run(read())
+
+
+def test_study_stats_follow_writes_and_match_rebuild():
+    """Summary rows move with saves, re-analysis and purges, and a rebuild reproduces them"""
+    model = f"stats-{uuid.uuid4().hex[:8]}"
+    study_ids = [str(uuid.uuid4()) for _ in range(4)]
+    before = _stats_today()
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            for study_id in study_ids[:2]:
+                await save_study(db, study_id, "scan.png", "uploads/scan.png", "image/png", 1)
+            await save_studies(db, [
+                {"study_id": study_id, "filename": "scan.png", "file_path": "uploads/scan.png",
+                 "content_type": "image/png", "file_size": 1}
+                for study_id in study_ids[2:]
+            ])
+            await update_study_analysis(db, study_ids[0], "normal", 0.62, 0.2, model_version=model, image_quality="good")
+            await update_study_analysis(db, study_ids[1], "normal", 0.95, 0.4, model_version=model, image_quality="fair")
+            # Re-analysis moves the study rather than counting it twice
+            await update_study_analysis(db, study_ids[1], "suspicious", 0.91, 0.6, model_version=model, image_quality="good")
+            await update_study_analysis(db, study_ids[2], "suspicious", 0.83, 0.5, model_version=model, image_quality="good")
+
+    _run(scenario())
+    stats = _stats_today(model)
+    assert stats["studies"] == stats["analyzed"] == 3
+    assert stats["predictions"] == {"normal": 1, "suspicious": 2}
+    assert stats["image_quality"] == {"good": 3}
+    assert [bucket["studies"] for bucket in stats["confidence_histogram"]][6:] == [1, 0, 1, 1]
+    assert stats["models"] == [
+        {"model_version": model, "studies": 3, "mean_confidence": pytest.approx(0.7867, abs=1e-4),
+         "mean_processing_time": pytest.approx(0.4333, abs=1e-4)}
+    ]
+    overall = _stats_today()
+    assert overall["studies"] == before["studies"] + 4
+    assert overall["predictions"]["pending"] == before["predictions"].get("pending", 0) + 1
+
+    _run(rebuild_study_stats())
+    assert _stats_today() == overall
+
+    async def backdate():
+        async with engine.begin() as conn:
+            await conn.execute(
+                text("UPDATE studies SET created_at = datetime('now', '-5000 days') WHERE study_id = :study_id"),
+                {"study_id": study_ids[0]}
+            )
+
+    async def purge():
+        async with AsyncSessionLocal() as db:
+            await purge_expired_studies(db, datetime.now() - timedelta(days=4000))
+            old_day = datetime.now(timezone.utc).date() - timedelta(days=5000)
+            return await get_study_stats(db, old_day, old_day, model_version=model)
+
+    # Edits behind the app's back need a rebuild; purges then keep the table current
+    _run(backdate())
+    _run(rebuild_study_stats())
+    assert _run(purge())["studies"] == 0
+    assert _stats_today(model)["predictions"] == {"suspicious": 2}
+
+
+def test_stats_read_only_summary_rows():
+    """The dashboard query seeks the summary key by day and never touches studies"""
+    async def plan():
+        async with engine.connect() as conn:
+            result = await conn.execute(text(
+                "EXPLAIN QUERY PLAN SELECT * FROM study_stats WHERE day BETWEEN '2024-01-01' AND '2024-01-31'"
+            ))
+            return " ".join(str(row[-1]) for row in result)
+
+    detail = _run(plan())
+    assert "SEARCH study_stats USING INDEX" in detail
+    assert "studies" not in detail.replace("study_stats", "")
+
+
+def test_timeline_recorder_batches_writes():
+    """Buffered timeline events are written in batches and read back in order"""
+    from backend.storage.timeline import TimelineRecorder
+
+    study_id = str(uuid.uuid4())
+    recorder = TimelineRecorder(batch_size=2, flush_interval=60)
+    recorder.record(study_id, "upload_received", 0.005, size=10)
+    with recorder.span(study_id, "db_saved"):
+        pass
+    with pytest.raises(ValueError):
+        with recorder.span(study_id, "classify"):
+            raise ValueError("boom")
+    assert [event["stage"] for event in recorder.pending(study_id)] == ["upload_received", "db_saved", "classify"]
+
+    async def flush_and_read():
+        await recorder.stop()
+        async with AsyncSessionLocal() as db:
+            return await get_processing_logs(db, study_id)
+
+    events = _run(flush_and_read())
+    assert [event["stage"] for event in events] == ["upload_received", "db_saved", "classify"]
+    assert events[0]["duration_ms"] == pytest.approx(5.0)
+    assert events[0]["details"] == {"size": 10}
+    assert events[2]["level"] == "ERROR" and "boom" in events[2]["message"]
+    assert recorder.pending(study_id) == []
+    assert recorder.get_stats()["written"] == 3
+
+
+def test_timeline_recorder_keeps_events_until_written(monkeypatch):
+    """A failed batch stays buffered for retry; one that keeps failing is dropped and counted"""
+    from backend.storage import database
+    from backend.storage.timeline import TimelineRecorder
+
+    write = database.save_processing_logs
+    failures = {"left": 1}
+
+    async def flaky_write(db, events):
+        if failures["left"] or any(event["stage"] == "poison" for event in events):
+            failures["left"] = max(0, failures["left"] - 1)
+            raise RuntimeError("database is locked")
+        await write(db, events)
+
+    monkeypatch.setattr(database, "save_processing_logs", flaky_write)
+    study_id = str(uuid.uuid4())
+    recorder = TimelineRecorder(batch_size=2, flush_interval=60, max_attempts=2)
+    for stage in ("upload_received", "db_saved", "poison", "classify"):
+        recorder.record(study_id, stage)
+
+    async def run():
+        await recorder.flush()
+        kept = [event["stage"] for event in recorder.pending(study_id)]
+        await recorder.flush()
+        await recorder.flush()
+        async with AsyncSessionLocal() as db:
+            return kept, await get_processing_logs(db, study_id)
+
+    kept, events = _run(run())
+    assert kept == ["upload_received", "db_saved", "poison", "classify"]
+    assert [event["stage"] for event in events] == ["upload_received", "db_saved"]
+    stats = recorder.get_stats()
+    assert stats["written"] == 2 and stats["dropped"] == 2 and stats["buffered"] == 0
+    assert stats["failed_batches"] == 3
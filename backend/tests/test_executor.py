@@ -0,0 +1,57 @@
+import asyncio
+import os
+
+import pytest
+
+from backend.ai.executor import InferencePool
+from backend.ai.mock import MockMammographyClassifier
+from backend.ai.scheduler import BatchScheduler
+
+
+@pytest.fixture(scope="module")
+def pool():
+    inference_pool = InferencePool(MockMammographyClassifier, workers=2, threads_per_worker=1)
+    inference_pool.start()
+    yield inference_pool
+    inference_pool.shutdown()
+
+
+@pytest.fixture(scope="module")
+def images(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("images")
+    paths = []
+    for i in range(6):
+        path = directory / f"img{i}.png"
+        path.write_bytes(b"fake image content")
+        paths.append(str(path))
+    return paths
+
+
+def test_workers_are_warm_and_separate_processes(pool):
+    """Workers are started and have loaded their model before any request"""
+    stats = pool.get_stats()
+    assert stats["running"]
+    assert stats["worker_pids"]
+    assert os.getpid() not in stats["worker_pids"]
+
+
+def test_scheduler_runs_batches_in_pool(pool, images):
+    """The scheduler dispatches batches to worker processes concurrently"""
+    async def scenario():
+        scheduler = BatchScheduler(
+            MockMammographyClassifier(), max_batch_size=2, max_wait_ms=5,
+            pool=pool, max_concurrent_batches=2
+        )
+        try:
+            return await asyncio.gather(*(scheduler.classify(path) for path in images))
+        finally:
+            await scheduler.stop()
+
+    results = asyncio.run(scenario())
+    assert len(results) == 6
+    assert all(r["prediction"] in ("normal", "suspicious") for r in results)
+
+
+def test_classify_before_start_fails(images):
+    with pytest.raises(RuntimeError):
+        asyncio.run(InferencePool(MockMammographyClassifier).classify_batch(images[:1]))
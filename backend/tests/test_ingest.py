@@ -0,0 +1,118 @@
+import io
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+from backend.storage.ingest import TOO_MANY_ENTRIES, ArchiveTooLarge, archive_kind, extract_archive
+
+
+def _commit(root):
+    def commit(temp_path, sha256, name):
+        path = os.path.join(root, sha256 + os.path.splitext(name)[1])
+        os.replace(temp_path, path)
+        return path, False
+    return commit
+
+
+def test_archive_kind():
+    assert archive_kind("series.zip") == "zip"
+    assert archive_kind("SERIES.TAR.GZ") == "tar"
+    assert archive_kind("image.png") is None
+
+
+def test_extract_tar_enforces_member_limits(tmp_path):
+    archive_path = tmp_path / "series.tar.gz"
+    with tarfile.open(archive_path, "w:gz") as tar:
+        for name, payload in [("a.dcm", b"a" * 10), ("../../escape.png", b"b" * 10), ("huge.png", b"c" * 100)]:
+            info = tarfile.TarInfo(name)
+            info.size = len(payload)
+            tar.addfile(info, io.BytesIO(payload))
+
+    store = tmp_path / "store"
+    store.mkdir()
+    outcomes = extract_archive(
+        str(archive_path),
+        accept=lambda name: None,
+        max_member_size=50,
+        max_members=10,
+        commit=_commit(str(store)),
+        staging_dir=str(tmp_path)
+    )
+
+    stored = {name: member for name, member, error in outcomes if member}
+    errors = {name: error for name, member, error in outcomes if error}
+    assert set(stored) == {"a.dcm", "../../escape.png"}
+    assert "huge.png" in errors
+    # Member names never become paths: everything lands in the store
+    assert all(os.path.dirname(member.path) == str(store) for member in stored.values())
+    assert not list(tmp_path.glob("*.part"))
+
+
+def test_extract_zip_enforces_total_size(tmp_path):
+    """A small archive of highly compressible members stops once its expansion passes the cap"""
+    archive_path = tmp_path / "bomb.zip"
+    with zipfile.ZipFile(archive_path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for index in range(8):
+            archive.writestr(f"{index}.png", bytes([index]) * (1024 * 1024))
+    assert archive_path.stat().st_size < 100 * 1024
+
+    store = tmp_path / "store"
+    store.mkdir()
+    with pytest.raises(ArchiveTooLarge):
+        extract_archive(
+            str(archive_path),
+            accept=lambda name: None,
+            max_member_size=2 * 1024 * 1024,
+            max_members=10,
+            commit=_commit(str(store)),
+            staging_dir=str(tmp_path),
+            workers=2,
+            max_total_size=3 * 1024 * 1024,
+            discard=os.remove
+        )
+    # Nothing committed before the cap was hit is left behind
+    assert not os.listdir(store)
+    assert not list(tmp_path.glob("*.part"))
+
+
+@pytest.mark.parametrize("suffix", [".zip", ".tar"])
+def test_extract_counts_only_images_toward_member_limit(tmp_path, suffix):
+    """Readmes and __MACOSX entries never crowd out images; the entry cap still bounds the scan"""
+    names = ["README.txt", "__MACOSX/._a.png", "a.png", "notes.txt", "b.png", "c.png", "d.png"]
+    archive_path = tmp_path / f"series{suffix}"
+    if suffix == ".zip":
+        with zipfile.ZipFile(archive_path, "w") as archive:
+            for index, name in enumerate(names):
+                archive.writestr(name, bytes([index]) * 10)
+    else:
+        with tarfile.open(archive_path, "w") as tar:
+            for index, name in enumerate(names):
+                info = tarfile.TarInfo(name)
+                info.size = 10
+                tar.addfile(info, io.BytesIO(bytes([index]) * 10))
+
+    def accept(name):
+        if "__MACOSX" in name or not name.endswith(".png"):
+            return "Unsupported file type"
+        return None
+
+    def extract(**limits):
+        store = tmp_path / f"store-{len(os.listdir(tmp_path))}"
+        store.mkdir()
+        outcomes = extract_archive(
+            str(archive_path), accept=accept, max_member_size=50, commit=_commit(str(store)),
+            staging_dir=str(tmp_path), **limits
+        )
+        return [name for name, member, _ in outcomes if member], {name: error for name, _, error in outcomes if error}
+
+    stored, errors = extract(max_members=3)
+    assert stored == ["a.png", "b.png", "c.png"]
+    assert errors["d.png"] == "Too many files in request"
+    assert errors["README.txt"] == errors["notes.txt"] == "Unsupported file type"
+
+    stored, errors = extract(max_members=10, max_entries=5)
+    assert stored == ["a.png", "b.png"]
+    assert errors["c.png"] == TOO_MANY_ENTRIES
+    assert "d.png" not in errors
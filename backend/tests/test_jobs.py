@@ -0,0 +1,121 @@
+import asyncio
+
+from backend.ai.jobs import COMPLETED, FAILED, JobManager
+
+
+def test_concurrent_submissions_share_one_job():
+    """Requests for a study already in flight attach instead of re-running"""
+    calls = []
+
+    async def work(job):
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"prediction": "normal"}
+
+    async def scenario():
+        manager = JobManager()
+        first = manager.submit("study-1", work)
+        second = manager.submit("study-1", work)
+        other = manager.submit("study-2", work)
+        await asyncio.gather(first.wait(), second.wait(), other.wait())
+        return first, second, other
+
+    first, second, other = asyncio.run(scenario())
+    assert first is second
+    assert first.attached == 1
+    assert other is not first
+    assert len(calls) == 2
+    assert first.status == COMPLETED
+    assert first.result == {"prediction": "normal"}
+
+
+def test_failed_job_records_error_and_releases_study():
+    async def work(job):
+        raise RuntimeError("model crashed")
+
+    async def scenario():
+        manager = JobManager()
+        job = await manager.submit("study-1", work).wait()
+        return job, manager.get_active("study-1")
+
+    job, active = asyncio.run(scenario())
+    assert job.status == FAILED
+    assert job.error == "model crashed"
+    assert active is None
+
+
+def test_subscribers_receive_state_changes():
+    async def work(job):
+        await asyncio.sleep(0.01)
+        return {}
+
+    async def scenario():
+        manager = JobManager()
+        job = manager.submit("study-1", work)
+        updates = job.subscribe()
+        await job.wait()
+        seen = []
+        while not updates.empty():
+            seen.append(updates.get_nowait()[0])
+        return seen
+
+    assert asyncio.run(scenario())[-1] == COMPLETED
+
+
+def test_finished_jobs_expire():
+    async def work(job):
+        return {}
+
+    async def scenario():
+        manager = JobManager(retention_seconds=0)
+        old = await manager.submit("study-1", work).wait()
+        manager.submit("study-2", work)
+        return manager.get(old.job_id)
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_progress_reports_reach_subscribers():
+    async def work(job):
+        job.report_progress(done=1, total=2)
+        return {}
+
+    async def scenario():
+        manager = JobManager()
+        job = manager.submit("batch", work)
+        updates = job.subscribe()
+        await job.wait()
+        events = []
+        while not updates.empty():
+            events.append(updates.get_nowait())
+        return job, events
+
+    job, events = asyncio.run(scenario())
+    assert ("progress", job.to_dict()["progress"]) == (events[-2][0], events[-2][1]["progress"])
+    assert job.progress == {"done": 1, "total": 2}
+
+
+def test_adopted_jobs_take_submissions_until_settled():
+    """A study claimed by a larger job turns away a second claim and absorbs single submissions"""
+    calls = []
+
+    async def work(job):
+        calls.append(1)
+        return {"prediction": "suspicious"}
+
+    async def scenario():
+        manager = JobManager()
+        member = manager.adopt("study-1")
+        assert manager.adopt("study-1") is None
+        attached = manager.submit("study-1", work)
+        waiter = asyncio.ensure_future(attached.wait())
+        await asyncio.sleep(0)
+        assert not waiter.done()
+        manager.settle(member, result={"prediction": "normal"})
+        await waiter
+        return member, attached, manager.get_active("study-1")
+
+    member, attached, active = asyncio.run(scenario())
+    assert attached is member and member.attached == 1
+    assert member.status == COMPLETED and member.result == {"prediction": "normal"}
+    assert active is None and not calls
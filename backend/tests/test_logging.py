@@ -0,0 +1,66 @@
+import logging
+import queue
+import threading
+import types
+
+from fastapi.testclient import TestClient
+
+# Importing the app sets up logging, which replaces the root handlers
+import main
+from backend import logging_config
+from backend.logging_config import NonBlockingQueueHandler, RouteLogSampler
+
+
+class _Unformattable:
+    """Argument that records whether (and on which thread) it was formatted"""
+
+    def __init__(self):
+        self.formatted_on = None
+
+    def __str__(self):
+        self.formatted_on = threading.current_thread().name
+        return "value"
+
+
+def test_queue_handler_defers_formatting_and_drops_when_full():
+    """Records are enqueued unformatted and never block when the queue is full"""
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=2))
+    logger = logging.getLogger("test_queue_handler")
+    logger.propagate = False
+    logger.addHandler(handler)
+    try:
+        argument = _Unformattable()
+        logger.warning("deferred %s", argument)
+        logger.warning("second")
+        logger.warning("dropped")
+    finally:
+        logger.removeHandler(handler)
+
+    assert argument.formatted_on is None
+    assert handler.dropped == 1
+    record = handler.queue.get_nowait()
+    assert record.getMessage() == "deferred value"
+
+
+def test_route_sampler_limits_listed_routes_only(monkeypatch, caplog):
+    """Listed routes log a burst, then one line reporting what was suppressed once tokens refill"""
+    clock = [1000.0]
+    monkeypatch.setattr(logging_config, "time", types.SimpleNamespace(monotonic=lambda: clock[0]))
+    monkeypatch.setattr(main, "request_log_sampler", RouteLogSampler(["GET /api/health/live"], per_second=1, burst=2))
+    caplog.set_level(logging.INFO)
+
+    client = TestClient(main.app)
+    for _ in range(5):
+        assert client.get("/api/health/live").status_code == 200
+        assert client.get("/api/health").status_code == 200
+    clock[0] += 1
+    assert client.get("/api/health/live").status_code == 200
+
+    def lines(path):
+        return [record.getMessage() for record in caplog.records if record.getMessage().startswith(f"GET {path} ->")]
+
+    sampled = lines("/api/health/live")
+    assert len(sampled) == 3
+    assert not any("not logged" in line for line in sampled[:2])
+    assert sampled[2].endswith("(3 similar requests not logged)")
+    assert len(lines("/api/health")) == 5
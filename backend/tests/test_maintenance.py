@@ -0,0 +1,174 @@
+import hashlib
+import io
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+from sqlalchemy import text
+
+from backend.storage.blobs import LocalBlobStore
+from backend.storage.maintenance import in_window, maintenance, parse_window, recompress_blob
+
+ADMIN = {"Authorization": f"Bearer {os.environ['ADMIN_TOKEN']}"}
+
+
+def _png_bytes(seed, side=256):
+    pixels = np.random.default_rng(seed).integers(0, 4, (side, side), dtype=np.uint8) * 60
+    buffer = io.BytesIO()
+    # Stored without compression, as some modality exports do
+    Image.fromarray(pixels).save(buffer, format="PNG", compress_level=0)
+    return buffer.getvalue()
+
+
+def test_maintenance_window():
+    window = parse_window("22:00-04:30")
+    assert in_window(window, datetime(2024, 1, 1, 23, 15))
+    assert in_window(window, datetime(2024, 1, 1, 4, 0))
+    assert not in_window(window, datetime(2024, 1, 1, 12, 0))
+    assert not in_window(parse_window("01:00-05:00"), datetime(2024, 1, 1, 5, 0))
+    assert in_window(parse_window(""), datetime(2024, 1, 1, 12, 0))
+
+
+def test_recompress_is_lossless(tmp_path):
+    """Test PNG and uncompressed DICOM shrink with identical pixels; JPEG is left alone"""
+    store = LocalBlobStore(str(tmp_path))
+    png = tmp_path / "scan.png"
+    png.write_bytes(_png_bytes(1))
+    before = np.asarray(Image.open(png))
+
+    new_location, size_before, size_after = recompress_blob(store, str(png))
+    assert size_before == len(_png_bytes(1)) > size_after == os.path.getsize(new_location)
+    # Stored under the digest of the new bytes; the original is never rewritten
+    with open(new_location, "rb") as f:
+        assert new_location == store.path_for(hashlib.sha256(f.read()).hexdigest(), ".png")
+    assert png.read_bytes() == _png_bytes(1)
+    assert np.array_equal(np.asarray(Image.open(new_location)), before)
+    # Already optimal: a second pass changes nothing
+    assert recompress_blob(store, new_location) is None
+
+    jpeg = tmp_path / "scan.jpg"
+    Image.fromarray(before).save(jpeg)
+    assert recompress_blob(store, str(jpeg)) is None
+    assert not os.listdir(store.staging_dir)
+
+    pydicom = pytest.importorskip("pydicom")
+    source = pytest.importorskip("pydicom.data").get_testdata_file("CT_small.dcm")
+    if source is None:
+        pytest.skip("pydicom test data not available")
+    dicom = tmp_path / "scan.dcm"
+    dicom.write_bytes(open(source, "rb").read())
+    original = pydicom.dcmread(str(dicom)).pixel_array
+    outcome = recompress_blob(store, str(dicom))
+    if outcome is not None:
+        dataset = pydicom.dcmread(outcome[0])
+        assert dataset.file_meta.TransferSyntaxUID.is_compressed
+        assert np.array_equal(dataset.pixel_array, original)
+
+
+@pytest.fixture
+def client():
+    from main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def test_maintenance_run_recompresses_expires_and_compacts(client, monkeypatch):
+    """Test one forced run recompresses old files, purges expired studies and reports reclaimed space"""
+    monkeypatch.setattr(maintenance, "recompress_after_days", 30)
+    monkeypatch.setattr(maintenance, "study_retention_days", 365)
+
+    # Fresh content each run: uploads are content-addressed and the store outlives the test
+    kept_png, expired_png = _png_bytes(None), _png_bytes(None)
+    kept = client.post("/api/upload", files={"file": ("kept.png", kept_png, "image/png")}).json()
+    expired = client.post("/api/upload", files={"file": ("old.png", expired_png, "image/png")}).json()
+    assert client.get(f"/api/images/{expired['study_id']}/thumbnail?size=128").status_code == 200
+    kept_path = client.get(f"/api/upload/{kept['study_id']}").json()["file_path"]
+    expired_path = client.get(f"/api/upload/{expired['study_id']}").json()["file_path"]
+
+    from backend.storage.database import engine
+
+    async def backdate():
+        async with engine.begin() as conn:
+            for study_id, days in ((kept["study_id"], 60), (expired["study_id"], 400)):
+                await conn.execute(
+                    text("UPDATE studies SET created_at = datetime('now', :age) WHERE study_id = :study_id"),
+                    {"age": f"-{days} days", "study_id": study_id}
+                )
+
+    client.portal.call(backdate)
+    # Past the grace period that protects files just reused by a deduplicated upload
+    old = time.time() - 2 * 24 * 60 * 60
+    os.utime(expired_path, (old, old))
+
+    assert client.post("/api/maintenance/run").status_code == 401
+    response = client.post("/api/maintenance/run", headers=ADMIN)
+    assert response.status_code == 200
+    report = response.json()
+    assert not report["errors"]
+    assert report["recompressed"]["files"] >= 1
+    assert report["expired"]["studies"] >= 1
+    assert report["expired"]["files"] >= 1
+    assert report["database"]["auto_vacuum"] == "incremental"
+    assert report["reclaimed_bytes"] >= report["recompressed"]["reclaimed_bytes"] + report["expired"]["reclaimed_bytes"]
+
+    assert client.get(f"/api/upload/{expired['study_id']}").status_code == 404
+    assert not os.path.exists(expired_path)
+
+    study = client.get(f"/api/upload/{kept['study_id']}").json()
+    assert study["recompressed_at"] is not None
+    original = client.get(f"/api/images/{kept['study_id']}/original")
+    assert original.headers["etag"].endswith('-r"')
+    assert len(original.content) < len(kept_png)
+    assert np.array_equal(
+        np.asarray(Image.open(io.BytesIO(original.content))),
+        np.asarray(Image.open(io.BytesIO(kept_png)))
+    )
+    # Moved to the recompressed copy; the original blob is gone
+    assert study["file_path"] != kept_path and not os.path.exists(kept_path)
+    assert study["file_size"] == os.path.getsize(study["file_path"]) == len(original.content)
+
+    # The same bytes uploaded again are stored afresh, not served from the recompressed copy
+    again = client.post("/api/upload", files={"file": ("again.png", kept_png, "image/png")}).json()
+    again_study = client.get(f"/api/upload/{again['study_id']}").json()
+    assert again_study["file_path"] == kept_path and again_study["recompressed_at"] is None
+    again_original = client.get(f"/api/images/{again['study_id']}/original")
+    assert again_original.content == kept_png
+    assert not again_original.headers["etag"].endswith('-r"')
+
+    stats = client.get("/api/maintenance").json()
+    assert stats["runs"] >= 1
+    assert stats["last_run"]["reclaimed_bytes"] == report["reclaimed_bytes"]
+
+
+def test_compact_database_frees_every_page(client):
+    """Test incremental vacuum returns all requested free pages, not just the first"""
+    from backend.storage.database import compact_database, engine
+
+    async def free_pages():
+        async with engine.begin() as conn:
+            await conn.exec_driver_sql("CREATE TABLE IF NOT EXISTS vacuum_scratch (data BLOB)")
+            for _ in range(200):
+                await conn.execute(text("INSERT INTO vacuum_scratch VALUES (randomblob(10240))"))
+        async with engine.begin() as conn:
+            await conn.exec_driver_sql("DROP TABLE vacuum_scratch")
+        async with engine.connect() as conn:
+            return (await conn.exec_driver_sql("PRAGMA freelist_count")).scalar()
+
+    async def compact():
+        # The first pass may switch a pre-existing database to incremental mode
+        await compact_database(vacuum_pages=100000, analysis_limit=100, full_vacuum=True)
+        before = await free_pages()
+        report = await compact_database(vacuum_pages=100000, analysis_limit=100)
+        async with engine.connect() as conn:
+            after = (await conn.exec_driver_sql("PRAGMA freelist_count")).scalar()
+        return before, report, after
+
+    before, report, after = client.portal.call(compact)
+    assert before >= 500
+    assert report["free_pages_before"] == before
+    assert report["free_pages_after"] == after == 0
@@ -0,0 +1,35 @@
+from backend.metrics import Registry
+
+
+def test_histogram_renders_cumulative_buckets():
+    """Observations land in preallocated buckets rendered cumulatively"""
+    registry = Registry()
+    latency = registry.histogram("request_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+    child = latency.labels("/a")
+    for value in (0.05, 0.1, 0.5, 3.0):
+        child.observe(value)
+
+    text = registry.render()
+    assert '# TYPE request_seconds histogram' in text
+    assert 'request_seconds_bucket{route="/a",le="0.1"} 2' in text
+    assert 'request_seconds_bucket{route="/a",le="1"} 3' in text
+    assert 'request_seconds_bucket{route="/a",le="+Inf"} 4' in text
+    assert 'request_seconds_count{route="/a"} 4' in text
+    assert 'request_seconds_sum{route="/a"} 3.65' in text
+
+
+def test_counters_gauges_and_label_escaping():
+    """Counters, gauges and callback gauges render with escaped labels"""
+    registry = Registry()
+    counter = registry.counter("bytes_total", "Bytes", ("kind",))
+    counter.labels('a"b').inc(5)
+    gauge = registry.gauge("in_flight", "In flight")
+    gauge.inc()
+    gauge.inc()
+    gauge.dec()
+    registry.gauge("depth", "Depth", function=lambda: 7)
+
+    text = registry.render()
+    assert 'bytes_total{kind="a\\"b"} 5' in text
+    assert "in_flight 1" in text
+    assert "depth 7" in text
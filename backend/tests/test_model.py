@@ -0,0 +1,65 @@
+import asyncio
+import os
+import subprocess
+import sys
+
+from backend.ai.model import FAILED, READY, ModelManager
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class CountingClassifier:
+    instances = 0
+    batches = []
+
+    def __init__(self):
+        CountingClassifier.instances += 1
+
+    def classify_batch(self, image_paths):
+        CountingClassifier.batches.append(list(image_paths))
+        return [{"prediction": "normal"} for _ in image_paths]
+
+    def get_model_info(self):
+        return {"name": "counting", "version": "1", "model_version": "counting-v1"}
+
+
+class BrokenClassifier:
+    def __init__(self):
+        raise RuntimeError("weights missing")
+
+
+def test_model_loads_once_and_warms_up():
+    """Concurrent loads share one build, and the warm-up batch runs before ready"""
+    CountingClassifier.instances, CountingClassifier.batches = 0, []
+    manager = ModelManager(f"{__name__}:CountingClassifier", warmup=True)
+    assert manager.version is None
+
+    async def load_twice():
+        return await asyncio.gather(manager.load(), manager.load())
+
+    assert asyncio.run(load_twice()) == [True, True]
+    assert manager.state == READY and manager.version == "counting-v1"
+    assert CountingClassifier.instances == 1
+    assert len(CountingClassifier.batches) == 1 and CountingClassifier.batches[0][0].endswith(".npy")
+    assert manager.get_stats()["warmup_seconds"] is not None
+    assert manager.classify_batch(["a", "b"]) == [{"prediction": "normal"}] * 2
+
+
+def test_model_load_failure_is_reported():
+    """A model that cannot be built leaves the manager failed, not half-ready"""
+    manager = ModelManager(f"{__name__}:BrokenClassifier")
+    assert asyncio.run(manager.load()) is False
+    assert manager.state == FAILED and "weights missing" in manager.error
+    assert manager.classifier is None
+
+
+def test_app_import_defers_model_and_numpy():
+    """Importing the app builds no model and imports neither numpy nor the classifier module"""
+    code = (
+        "import sys, backend.main; "
+        "print(sorted(name for name in ('numpy', 'PIL', 'backend.ai.mock') if name in sys.modules))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    assert output.strip() == "[]"
@@ -0,0 +1,93 @@
+import os
+
+import pytest
+
+from backend.ai.base import MammographyClassifier
+from backend.ai.model import MODEL_BACKENDS, import_object, warm_up
+
+
+def test_backends_resolve_to_classifiers():
+    """Every MODEL_BACKEND name names a classifier; unknown names fail with the choices"""
+    for spec in MODEL_BACKENDS.values():
+        assert issubclass(import_object(spec), MammographyClassifier)
+    with pytest.raises(ValueError, match="mock, onnx"):
+        import_object("tensorrt")
+
+
+def test_onnx_classifier_fp32_and_int8(tmp_path):
+    """An fp32 model and its statically quantized copy both classify preprocessed arrays"""
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("onnx")
+    from backend.ai.onnx_runtime import OnnxMammographyClassifier, is_quantized, quantize_model
+    from benchmarks.inference import build_demo_model, write_images
+
+    images = tmp_path / "images"
+    images.mkdir()
+    paths = write_images(str(images), 3, shape=(96, 80))
+    fp32_path = build_demo_model(str(tmp_path / "demo.onnx"), side=64)
+
+    with open(fp32_path, "rb") as f:
+        assert is_quantized(f.read()) is False
+    classifier = OnnxMammographyClassifier(fp32_path, intra_op_threads=1)
+    info = classifier.get_model_info()
+    assert info["precision"] == "fp32" and info["input_shape"] == [None, 1, 64, 64]
+    assert info["intra_op_threads"] == 1
+    results = classifier.classify_batch(paths)
+    assert len(results) == 3
+    for result in results:
+        assert result["prediction"] in ("normal", "suspicious")
+        assert 0.5 <= result["confidence"] <= 1.0
+        assert result["model_version"] == info["model_version"]
+    assert classifier.classify(paths[0]) == results[0]
+    warm_up(classifier, side=32)
+
+    int8_path = str(tmp_path / "demo.int8.onnx")
+    summary = quantize_model(fp32_path, int8_path, calibration_dir=str(images))
+    assert summary["mode"] == "static" and summary["calibration_images"] == 3
+    with open(int8_path, "rb") as f:
+        assert is_quantized(f.read()) is True
+    quantized = OnnxMammographyClassifier(int8_path, intra_op_threads=1)
+    assert quantized.get_model_info()["precision"] == "int8"
+    # Different weights, different cache key
+    assert quantized.model_version != classifier.model_version
+    assert len(quantized.classify_batch(paths)) == 3
+
+    with pytest.raises(FileNotFoundError):
+        OnnxMammographyClassifier(os.path.join(str(tmp_path), "missing.onnx"))
+
+
+def test_is_quantized_reads_operator_types():
+    """Only operator types count, not node or initializer names that mention them"""
+    pytest.importorskip("onnx")
+    import numpy as np
+    from onnx import TensorProto, helper, numpy_helper
+    from backend.ai.onnx_runtime import is_quantized
+
+    def model(op_type, node_name):
+        graph = helper.make_graph(
+            [helper.make_node(op_type, ["x", "QLinearConv_scale"], ["y"], name=node_name)], "g",
+            [helper.make_tensor_value_info("x", TensorProto.FLOAT, [1])],
+            [helper.make_tensor_value_info("y", TensorProto.FLOAT, [1])],
+            [numpy_helper.from_array(np.ones(1, np.float32), "QLinearConv_scale")],
+        )
+        return helper.make_model(graph).SerializeToString()
+
+    assert is_quantized(model("Mul", "MatMulInteger_QuantizeLinear_fused")) is False
+    assert is_quantized(model("QuantizeLinear", "quantize")) is True
+
+
+def test_intra_op_threads_default_to_a_share_of_the_cores(monkeypatch):
+    """Unpinned, each web worker gets cpu_count // WEB_CONCURRENCY threads, at least one"""
+    from backend.ai import onnx_runtime
+
+    monkeypatch.setattr(onnx_runtime, "ONNX_INTRA_OP_THREADS", None)
+    monkeypatch.delenv("OMP_NUM_THREADS", raising=False)
+    monkeypatch.setattr(onnx_runtime.os, "cpu_count", lambda: 8)
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    assert onnx_runtime._default_intra_op_threads() == 2
+    monkeypatch.setenv("WEB_CONCURRENCY", "16")
+    assert onnx_runtime._default_intra_op_threads() == 1
+    monkeypatch.delenv("WEB_CONCURRENCY")
+    assert onnx_runtime._default_intra_op_threads() == 8
+    monkeypatch.setenv("OMP_NUM_THREADS", "3")
+    assert onnx_runtime._default_intra_op_threads() == 3
@@ -0,0 +1,125 @@
+import asyncio
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from backend.ai.preprocess import PreprocessCache, Preprocessor, decode_image, load_array
+
+
+def _write_png(path, width=64, height=48):
+    gradient = np.tile(np.arange(width, dtype=np.uint8) * 4, (height, 1))
+    Image.fromarray(gradient).save(path)
+    return str(path)
+
+
+def test_decode_png_normalizes_and_downsamples(tmp_path):
+    """Test raster decode to a [0, 1] float32 array with the long side capped"""
+    array = decode_image(_write_png(tmp_path / "image.png", 200, 100), max_side=50)
+    assert array.dtype == np.float32
+    assert array.shape == (25, 50)
+    assert array.min() == pytest.approx(0.0)
+    assert array.max() == pytest.approx(1.0, abs=0.05)
+
+
+def test_decode_dicom(tmp_path):
+    """Test DICOM decode with modality/VOI LUTs applied"""
+    data = pytest.importorskip("pydicom.data")
+    path = data.get_testdata_file("CT_small.dcm")
+    if path is None:
+        pytest.skip("pydicom test data not available")
+    array = decode_image(path, max_side=32)
+    assert array.shape == (32, 32)
+    assert 0.0 <= array.min() and array.max() <= 1.0
+
+
+def test_cache_returns_memmap(tmp_path):
+    """Test arrays are written once and read back as read-only memmaps"""
+    cache = PreprocessCache(str(tmp_path / "cache"), max_bytes=10 * 1024 * 1024)
+    source = _write_png(tmp_path / "image.png")
+    path = cache.ensure("abc", source)
+    assert cache.ensure("abc", source) == path
+    array = load_array(path)
+    assert isinstance(array, np.memmap)
+    assert not array.flags.writeable
+    assert cache.get_stats()["hits"] == 1
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    """Test the cache stays under its size limit, dropping the oldest entries"""
+    array = np.zeros((32, 32), dtype=np.float32)
+    entry_size = 32 * 32 * 4 + 128
+    cache = PreprocessCache(str(tmp_path), max_bytes=entry_size * 2, read_grace=0)
+    cache.put("a", array)
+    cache.put("b", array)
+    assert cache.get("a") is not None  # "b" is now least recently used
+    cache.put("c", array)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.get_stats()["evictions"] == 1
+
+    # A fresh instance rebuilds the index from disk
+    assert PreprocessCache(str(tmp_path), max_bytes=entry_size * 2).get_stats()["entries"] == 2
+
+
+def test_cache_keeps_arrays_handed_out_recently(tmp_path):
+    """Test eviction skips arrays a reader may be about to map, even when another worker handed them out"""
+    array = np.zeros((32, 32), dtype=np.float32)
+    entry_size = 32 * 32 * 4 + 128
+    cache = PreprocessCache(str(tmp_path), max_bytes=entry_size * 2, read_grace=60)
+    old = cache.put("old", array)
+    recent = cache.put("recent", array)
+    os.utime(old, (0, 0))
+    # Least recently used in this process, but handed out just now elsewhere
+    other_worker = PreprocessCache(str(tmp_path), max_bytes=entry_size * 2)
+    os.utime(recent, (0, 0))
+    assert other_worker.get("recent") == recent
+
+    cache.put("new", array)
+    assert os.path.exists(recent)
+    assert not os.path.exists(old)
+
+
+def test_preprocessor_single_flight_and_fallback(tmp_path):
+    """Test concurrent resolves share one decode and undecodable files fall back"""
+    preprocessor = Preprocessor(PreprocessCache(str(tmp_path / "cache")))
+    source = _write_png(tmp_path / "image.png")
+    broken = tmp_path / "broken.png"
+    broken.write_bytes(b"not an image")
+
+    async def run():
+        first = preprocessor.submit("good", source)
+        paths = await asyncio.gather(*(preprocessor.resolve({"file_path": source, "content_hash": "good"}) for _ in range(5)))
+        await first
+        fallback = await preprocessor.resolve({"file_path": str(broken), "content_hash": "bad"})
+        return paths, fallback
+
+    paths, fallback = asyncio.run(run())
+    assert len(set(paths)) == 1 and paths[0].endswith(".npy")
+    assert fallback == str(broken)
+    stats = preprocessor.get_stats()
+    assert stats["processed"] == 1
+    assert stats["failed"] == 1
+
+
+def test_preprocessor_retries_failed_images_after_a_while(tmp_path):
+    """Test a failed decode is not retried at once, but is once the retry delay has passed"""
+    preprocessor = Preprocessor(PreprocessCache(str(tmp_path / "cache")), retry_after=0.2)
+    source = tmp_path / "image.png"
+    source.write_bytes(b"still uploading")
+    study = {"file_path": str(source), "content_hash": "late"}
+
+    async def run():
+        first = await preprocessor.resolve(study)
+        _write_png(source)
+        cached_failure = await preprocessor.resolve(study)
+        await asyncio.sleep(0.25)
+        retried = await preprocessor.resolve(study)
+        return first, cached_failure, retried
+
+    first, cached_failure, retried = asyncio.run(run())
+    assert first == cached_failure == str(source)
+    assert retried.endswith(".npy")
+    assert preprocessor.get_stats()["failed"] == 0
@@ -0,0 +1,41 @@
+import os
+
+import numpy as np
+from PIL import Image
+
+from backend.storage.pyramid import DerivedImageStore
+
+
+def test_build_pyramid_levels_and_tiles(tmp_path):
+    """Test DeepZoom levels halve down to 1x1 and tiles carry their overlap"""
+    source = tmp_path / "image.png"
+    Image.fromarray(np.random.randint(0, 255, (300, 500), dtype=np.uint8)).save(source)
+    store = DerivedImageStore(str(tmp_path / "derived"), tile_size=254, overlap=1, thumbnail_sizes=(64,))
+
+    target = store.build_pyramid("abc", str(source))
+    assert store.build_pyramid("abc", str(source)) == target
+
+    # ceil(log2(500)) = 9, so levels 0..9 with level 9 at full size
+    assert sorted(int(level) for level in os.listdir(os.path.join(target, "tiles"))) == list(range(10))
+    assert sorted(os.listdir(os.path.join(target, "tiles", "9"))) == ["0_0.jpg", "0_1.jpg", "1_0.jpg", "1_1.jpg"]
+    with Image.open(store.tile_path("abc", 9, 0, 0)) as tile:
+        assert tile.size == (255, 255)
+    with Image.open(store.tile_path("abc", 0, 0, 0)) as tile:
+        assert tile.size == (1, 1)
+
+    descriptor = open(store.descriptor_path("abc")).read()
+    assert 'Width="500" Height="300"' in descriptor
+    assert not [name for name in os.listdir(store.path_for("abc")) if name.endswith(".tmp")]
+
+
+def test_thumbnail_renders_without_pyramid(tmp_path):
+    """Test a thumbnail is rendered on its own, leaving the pyramid to its first request"""
+    source = tmp_path / "image.png"
+    Image.fromarray(np.random.randint(0, 255, (300, 500), dtype=np.uint8)).save(source)
+    store = DerivedImageStore(str(tmp_path / "derived"), thumbnail_sizes=(64, 128))
+
+    path = store.build_thumbnail("abc", str(source), 64)
+    with Image.open(path) as thumbnail:
+        assert thumbnail.size == (64, 38)
+    assert os.listdir(store.path_for("abc")) == ["thumbnail_64.jpg"]
+    assert not os.path.exists(store.pyramid_path("abc"))
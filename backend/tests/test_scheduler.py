@@ -0,0 +1,86 @@
+import asyncio
+import time
+
+import pytest
+
+from backend.ai.scheduler import BatchScheduler
+
+
+class RecordingClassifier:
+    """Echoes its input and records the batches it was called with"""
+
+    def __init__(self, delay: float = 0.0, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.batches = []
+
+    def classify_batch(self, image_paths):
+        self.batches.append(list(image_paths))
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("model crashed")
+        return [{"prediction": path} for path in image_paths]
+
+
+def test_concurrent_requests_are_batched():
+    """Concurrent callers share batches and each gets its own result"""
+    classifier = RecordingClassifier(delay=0.02)
+
+    async def scenario():
+        scheduler = BatchScheduler(classifier, max_batch_size=4, max_wait_ms=50)
+        scheduler.start()
+        try:
+            results = await asyncio.gather(*(scheduler.classify(f"img{i}") for i in range(10)))
+            return results, scheduler.get_stats()
+        finally:
+            await scheduler.stop()
+
+    results, stats = asyncio.run(scenario())
+
+    assert [r["prediction"] for r in results] == [f"img{i}" for i in range(10)]
+    assert all(len(batch) <= 4 for batch in classifier.batches)
+    assert len(classifier.batches) < 10
+    assert stats["requests"] == 10
+    assert stats["batches"] == len(classifier.batches)
+    assert stats["queue_wait_ms"]["p95"] is not None
+
+
+def test_lone_request_waits_at_most_max_wait():
+    """A single request is dispatched once max_wait_ms elapses"""
+    classifier = RecordingClassifier()
+
+    async def scenario():
+        scheduler = BatchScheduler(classifier, max_batch_size=8, max_wait_ms=20)
+        started = time.perf_counter()
+        result = await scheduler.classify("only")
+        elapsed = time.perf_counter() - started
+        await scheduler.stop()
+        return result, elapsed
+
+    result, elapsed = asyncio.run(scenario())
+    assert result == {"prediction": "only"}
+    assert elapsed < 1.0
+    assert classifier.batches == [["only"]]
+
+
+def test_batch_failure_reaches_every_caller():
+    """An exception from classify_batch is raised in each waiting request"""
+    classifier = RecordingClassifier(fail=True)
+
+    async def scenario():
+        scheduler = BatchScheduler(classifier, max_batch_size=4, max_wait_ms=20)
+        try:
+            return await asyncio.gather(
+                *(scheduler.classify(f"img{i}") for i in range(3)), return_exceptions=True
+            ), scheduler.get_stats()
+        finally:
+            await scheduler.stop()
+
+    results, stats = asyncio.run(scenario())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert stats["failed_batches"] >= 1
+
+
+def test_invalid_batch_size_rejected():
+    with pytest.raises(ValueError):
+        BatchScheduler(RecordingClassifier(), max_batch_size=0)
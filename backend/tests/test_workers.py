@@ -0,0 +1,41 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from backend.workers import MASTER_PID_ENV, get_worker_memory, memory_usage
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def test_memory_usage_of_current_process():
+    """This process reports resident memory, and PSS/USS where /proc has them"""
+    usage = memory_usage()
+    assert usage["rss"] > 0
+    if os.path.exists("/proc/self/smaps_rollup"):
+        assert 0 < usage["uss"] <= usage["pss"] <= usage["rss"]
+
+
+def test_standalone_process_reports_only_itself():
+    """Without a pre-fork master only the current process is listed"""
+    report = get_worker_memory()
+    assert report["master_pid"] is None
+    assert report["workers"] == 1
+    assert [process["pid"] for process in report["processes"]] == [os.getpid()]
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc"), reason="needs /proc")
+def test_worker_lists_master_and_siblings():
+    """A child told its parent is the master reports the parent and every child of it"""
+    code = "import json; from backend.workers import get_worker_memory; print(json.dumps(get_worker_memory()))"
+    env = {**os.environ, MASTER_PID_ENV: str(os.getpid()), "PYTHONPATH": REPO_ROOT}
+    report = json.loads(subprocess.run(
+        [sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True
+    ).stdout)
+    assert report["master_pid"] == os.getpid()
+    roles = {process["pid"]: process["role"] for process in report["processes"]}
+    assert roles[os.getpid()] == "master"
+    assert roles[report["pid"]] == "worker"
+    assert report["total"]["rss"] >= sum(process["rss"] for process in report["processes"] if process["current"])
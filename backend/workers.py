@@ -0,0 +1,93 @@
+import os
+import resource
+import sys
+from typing import Any, Dict, List, Optional
+
+# Set by the pre-fork master (see gunicorn_conf.py) so workers can find each other
+MASTER_PID_ENV = "SERVER_MASTER_PID"
+
+# Fields read from /proc/<pid>/smaps_rollup, in kB
+_SMAPS_FIELDS = {
+    "Rss": "rss",
+    "Pss": "pss",
+    "Shared_Clean": "shared_clean",
+    "Shared_Dirty": "shared_dirty",
+    "Private_Clean": "private_clean",
+    "Private_Dirty": "private_dirty",
+}
+
+
+def memory_usage(pid: Optional[int] = None) -> Optional[Dict[str, int]]:
+    """Memory of one process in bytes.
+
+    ``rss`` counts shared pages in full for every process that maps them;
+    ``pss`` splits each shared page between its users, so the PSS of all
+    workers adds up to what they really cost; ``uss`` is memory only this
+    process holds. Falls back to peak RSS where /proc is unavailable.
+    """
+    try:
+        with open(f"/proc/{pid or 'self'}/smaps_rollup") as f:
+            values = {}
+            for line in f:
+                name, _, rest = line.partition(":")
+                if name in _SMAPS_FIELDS:
+                    values[_SMAPS_FIELDS[name]] = int(rest.split()[0]) * 1024
+    except (OSError, ValueError, IndexError):
+        if pid not in (None, os.getpid()):
+            return None
+        # ru_maxrss is in kB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {"rss": peak if sys.platform == "darwin" else peak * 1024}
+    values["uss"] = values.get("private_clean", 0) + values.get("private_dirty", 0)
+    values["shared"] = values.get("shared_clean", 0) + values.get("shared_dirty", 0)
+    return values
+
+
+def _children(parent_pid: int) -> List[int]:
+    """PIDs whose parent is ``parent_pid``, from /proc/<pid>/stat"""
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces; fields resume after its ')'
+                fields = f.read().rsplit(")", 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        if int(fields[1]) == parent_pid:
+            children.append(int(entry))
+    return sorted(children)
+
+
+def master_pid() -> Optional[int]:
+    """PID of the pre-fork master when this process is one of its workers"""
+    value = os.getenv(MASTER_PID_ENV)
+    if value and value.isdigit() and int(value) == os.getppid():
+        return int(value)
+    return None
+
+
+def get_worker_memory() -> Dict[str, Any]:
+    """Memory of this worker and, under a pre-fork master, of the master and every sibling"""
+    master = master_pid()
+    processes = [{"pid": os.getpid(), "role": "worker", "current": True, **(memory_usage() or {})}]
+    if master is not None and os.path.isdir("/proc"):
+        processes = [{"pid": master, "role": "master", "current": False, **(memory_usage(master) or {})}]
+        for pid in _children(master):
+            usage = memory_usage(pid)
+            if usage is not None:
+                processes.append({"pid": pid, "role": "worker", "current": pid == os.getpid(), **usage})
+
+    totals = {
+        key: sum(process.get(key, 0) for process in processes)
+        for key in ("rss", "pss", "uss")
+        if any(key in process for process in processes)
+    }
+    return {
+        "pid": os.getpid(),
+        "master_pid": master,
+        "workers": sum(1 for process in processes if process["role"] == "worker"),
+        "processes": processes,
+        "total": totals
+    }
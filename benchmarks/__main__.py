@@ -0,0 +1,116 @@
+"""Run the upload/inference benchmark.
+
+    python -m benchmarks --target inprocess --requests 300 --concurrency 16 \
+        --output results.json --baseline benchmarks/baselines/inprocess.json
+
+Exits with status 1 when a baseline is given and any endpoint regressed by
+more than --threshold.
+"""
+import argparse
+import asyncio
+import json
+import sys
+from typing import Dict
+
+from benchmarks.harness import (
+    DEFAULT_MIX,
+    Workload,
+    compare,
+    environment_info,
+    inprocess_client,
+    run_workload,
+    server_client,
+    workload_info,
+)
+
+
+def _parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def _parse_shape(text: str):
+    width, _, height = text.lower().partition("x")
+    return int(height), int(width)
+
+
+def _print_table(results) -> None:
+    print(f"{'endpoint':<40} {'reqs':>6} {'err':>4} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    rows = list(results["endpoints"].items()) + [("TOTAL", results["total"])]
+    for label, stats in rows:
+        latency = stats["latency_ms"]
+        print(
+            f"{label:<40} {stats['requests']:>6} {stats['errors']:>4} {stats['throughput_rps']:>8.1f} "
+            f"{latency['p50']:>9.1f} {latency['p95']:>9.1f} {latency['p99']:>9.1f}"
+        )
+
+
+async def _run(args) -> Dict:
+    workload = Workload(
+        requests=args.requests,
+        concurrency=args.concurrency,
+        mix=_parse_mix(args.mix),
+        formats=tuple(args.formats.split(",")),
+        image_shape=_parse_shape(args.image_size),
+        seed_studies=args.seed_studies,
+        seed=args.seed,
+    )
+    if args.target == "inprocess":
+        client_context = inprocess_client()
+    elif args.target == "server":
+        client_context = server_client(workers=args.workers)
+    else:
+        client_context = server_client(url=args.target)
+
+    async with client_context as client:
+        results = await run_workload(client, workload)
+    results["meta"] = {"target": args.target, "workload": workload_info(workload), **environment_info()}
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", default="inprocess",
+                        help="inprocess (ASGI, no network), server (spawn local uvicorn) or a base URL")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for --target server")
+    parser.add_argument("--requests", type=int, default=200, help="measured requests")
+    parser.add_argument("--concurrency", type=int, default=8, help="simulated concurrent clients")
+    parser.add_argument("--mix", default=",".join(f"{name}={weight}" for name, weight in DEFAULT_MIX.items()),
+                        help="operation weights, e.g. upload=2,analyze=2,poll=5,list=1,thumbnail=1")
+    parser.add_argument("--formats", default="png,dcm", help="payload formats to upload")
+    parser.add_argument("--image-size", default="1664x2048", help="synthetic image WIDTHxHEIGHT")
+    parser.add_argument("--seed-studies", type=int, default=10, help="studies uploaded before measuring")
+    parser.add_argument("--seed", type=int, default=42, help="random seed for payloads and operation order")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--baseline", help="compare against this results JSON")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed regression as a fraction")
+    parser.add_argument("--min-requests", type=int, default=10, help="skip endpoints with fewer samples")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(_run(args))
+    _print_table(results)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.min_requests)
+        if regressions:
+            print(f"\nRegressions against {args.baseline} (threshold {args.threshold:.0%}):")
+            for regression in regressions:
+                print(f"  - {regression}")
+            return 1
+        print(f"\nNo regressions against {args.baseline} (threshold {args.threshold:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
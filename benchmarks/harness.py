@@ -0,0 +1,351 @@
+import asyncio
+import contextlib
+import math
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass, field, asdict
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.payloads import DEFAULT_IMAGE_SHAPE, dicom_bytes, make_unique, png_bytes, synthetic_pixels
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Environment for the app under test unless the caller already set it
+BENCHMARK_ENV_DEFAULTS = {
+    # Simulated model cost per batch; the real classifier would replace this
+    "MOCK_MIN_DELAY": "0.05",
+    "MOCK_MAX_DELAY": "0.1",
+    "LOG_LEVEL": "WARNING",
+    # Every simulated user shares one address; per-client rate limits would throttle the whole run
+    "ADMISSION_UPLOAD_RATE": "0",
+    "ADMISSION_INFERENCE_RATE": "0",
+}
+
+DEFAULT_MIX = {"upload": 2, "analyze": 2, "poll": 5, "list": 1}
+
+
+@dataclass
+class Workload:
+    """What to run; stored with the results so runs can be reproduced"""
+    requests: int = 200
+    concurrency: int = 8
+    mix: Dict[str, float] = field(default_factory=lambda: dict(DEFAULT_MIX))
+    formats: Tuple[str, ...] = ("png", "dcm")
+    image_shape: Tuple[int, int] = DEFAULT_IMAGE_SHAPE
+    seed_studies: int = 10
+    seed: int = 42
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    ordered = sorted(latencies)
+    to_ms = lambda seconds: round(seconds * 1000, 3)
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "throughput_rps": round(len(ordered) / elapsed, 3) if elapsed > 0 else 0.0,
+        "latency_ms": {
+            "mean": to_ms(sum(ordered) / len(ordered)) if ordered else 0.0,
+            "p50": to_ms(percentile(ordered, 0.50)),
+            "p95": to_ms(percentile(ordered, 0.95)),
+            "p99": to_ms(percentile(ordered, 0.99)),
+            "max": to_ms(ordered[-1]) if ordered else 0.0,
+        },
+    }
+
+
+class _Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    async def call(self, label: str, request: Callable[[], Any], expected: Tuple[int, ...] = (200,)) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await request()
+        except httpx.HTTPError:
+            self.latencies[label].append(time.perf_counter() - started)
+            self.errors[label] += 1
+            return None
+        self.latencies[label].append(time.perf_counter() - started)
+        if response.status_code not in expected:
+            self.errors[label] += 1
+        return response
+
+
+class _State:
+    """Studies created during the run, shared by all simulated clients"""
+
+    def __init__(self, workload: Workload):
+        self.workload = workload
+        self.study_ids: List[str] = []
+        self.unanalyzed: Deque[str] = deque()
+        pixels = synthetic_pixels(workload.image_shape, seed=workload.seed)
+        self.payloads = {}
+        if "png" in workload.formats:
+            self.payloads["mammogram.png"] = (png_bytes(pixels), "image/png")
+        if "dcm" in workload.formats:
+            self.payloads["mammogram.dcm"] = (dicom_bytes(pixels), "application/dicom")
+
+
+async def _upload(client: httpx.AsyncClient, state: _State, recorder: _Recorder, rng: random.Random) -> None:
+    filename = rng.choice(sorted(state.payloads))
+    payload, content_type = state.payloads[filename]
+    body = make_unique(payload, filename)
+    response = await recorder.call(
+        "POST /api/upload",
+        lambda: client.post("/api/upload", files={"file": (filename, body, content_type)})
+    )
+    if response is not None and response.status_code == 200:
+        study_id = response.json()["study_id"]
+        state.study_ids.append(study_id)
+        state.unanalyzed.append(study_id)
+
+
+async def _analyze(client: httpx.AsyncClient, state: _State, recorder: _Recorder, rng: random.Random) -> None:
+    if not state.unanalyzed:
+        return await _upload(client, state, recorder, rng)
+    study_id = state.unanalyzed.popleft()
+    await recorder.call("POST /api/inference/{study_id}", lambda: client.post(f"/api/inference/{study_id}"))
+
+
+async def _poll(client: httpx.AsyncClient, state: _State, recorder: _Recorder, rng: random.Random) -> None:
+    if not state.study_ids:
+        return await _upload(client, state, recorder, rng)
+    study_id = rng.choice(state.study_ids)
+    if rng.random() < 0.5:
+        await recorder.call("GET /api/inference/{study_id}", lambda: client.get(f"/api/inference/{study_id}"))
+    else:
+        await recorder.call("GET /api/upload/{study_id}", lambda: client.get(f"/api/upload/{study_id}"))
+
+
+async def _list(client: httpx.AsyncClient, state: _State, recorder: _Recorder, rng: random.Random) -> None:
+    await recorder.call("GET /api/studies", lambda: client.get("/api/studies", params={"limit": 50}))
+
+
+async def _thumbnail(client: httpx.AsyncClient, state: _State, recorder: _Recorder, rng: random.Random) -> None:
+    if not state.study_ids:
+        return await _upload(client, state, recorder, rng)
+    study_id = rng.choice(state.study_ids)
+    await recorder.call(
+        "GET /api/images/{study_id}/thumbnail",
+        lambda: client.get(f"/api/images/{study_id}/thumbnail")
+    )
+
+
+OPERATIONS = {
+    "upload": _upload,
+    "analyze": _analyze,
+    "poll": _poll,
+    "list": _list,
+    "thumbnail": _thumbnail,
+}
+
+
+async def run_workload(client: httpx.AsyncClient, workload: Workload) -> Dict[str, Any]:
+    """Drive the app with the workload and return per-endpoint statistics"""
+    unknown = set(workload.mix) - set(OPERATIONS)
+    if unknown:
+        raise ValueError(f"Unknown operations in mix: {', '.join(sorted(unknown))}")
+    state = _State(workload)
+
+    # Studies to poll and analyze from the first request on; not measured
+    warm_up = _Recorder()
+    seed_rng = random.Random(workload.seed)
+    for _ in range(workload.seed_studies):
+        await _upload(client, state, warm_up, seed_rng)
+
+    # The operation sequence is fixed by the seed, whatever the interleaving
+    rng = random.Random(workload.seed + 1)
+    names = sorted(workload.mix)
+    schedule = deque(rng.choices(names, weights=[workload.mix[name] for name in names], k=workload.requests))
+    recorder = _Recorder()
+
+    async def simulated_client(index: int) -> None:
+        client_rng = random.Random(workload.seed * 1000 + index)
+        while schedule:
+            await OPERATIONS[schedule.popleft()](client, state, recorder, client_rng)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(simulated_client(index) for index in range(workload.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    endpoints = {
+        label: summarize(recorder.latencies[label], recorder.errors[label], elapsed)
+        for label in sorted(recorder.latencies)
+    }
+    all_latencies = [value for values in recorder.latencies.values() for value in values]
+    return {
+        "endpoints": endpoints,
+        "total": summarize(all_latencies, sum(recorder.errors.values()), elapsed),
+        "elapsed_seconds": round(elapsed, 3),
+        "payload_bytes": {name: len(payload) for name, (payload, _) in state.payloads.items()},
+    }
+
+
+def _apply_env_defaults(workdir: str) -> Dict[str, str]:
+    env = dict(BENCHMARK_ENV_DEFAULTS)
+    env.update({
+        "DB_PATH": os.path.join(workdir, "benchmark.db"),
+        "PREPROCESS_DIR": os.path.join(workdir, "preprocessed"),
+        "DERIVED_DIR": os.path.join(workdir, "derived"),
+        "LOG_DIR": os.path.join(workdir, "logs"),
+    })
+    return {name: os.environ.get(name, value) for name, value in env.items()}
+
+
+async def _wait_until_ready(client: httpx.AsyncClient, check: Callable[[], None], timeout: float = 60) -> None:
+    """Poll the readiness probe so measurements never include model warm-up"""
+    deadline = time.monotonic() + timeout
+    while True:
+        check()
+        try:
+            if (await client.get("/api/health/ready")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"app did not become ready within {timeout:.0f}s")
+        await asyncio.sleep(0.2)
+
+
+@contextlib.asynccontextmanager
+async def inprocess_client() -> AsyncIterator[httpx.AsyncClient]:
+    """The real ASGI app, started in this process, behind an in-memory transport"""
+    workdir = tempfile.mkdtemp(prefix="benchmark-")
+    os.environ.update(_apply_env_defaults(workdir))
+    # The app writes uploads relative to the working directory
+    previous_cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        from backend.main import app
+
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=300) as client:
+                await _wait_until_ready(client, lambda: None)
+                yield client
+    finally:
+        os.chdir(previous_cwd)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.asynccontextmanager
+async def server_client(url: Optional[str] = None, workers: int = 1) -> AsyncIterator[httpx.AsyncClient]:
+    """Client for a running server at ``url``, or for a local uvicorn started here"""
+    if url:
+        async with httpx.AsyncClient(base_url=url, timeout=300) as client:
+            yield client
+        return
+
+    workdir = tempfile.mkdtemp(prefix="benchmark-")
+    port = _free_port()
+    env = {**os.environ, **_apply_env_defaults(workdir), "PYTHONPATH": REPO_ROOT}
+    if workers > 1:
+        # The supported multi-worker mode: pre-fork master with the model preloaded
+        env.update(BIND=f"127.0.0.1:{port}", WEB_CONCURRENCY=str(workers))
+        command = [sys.executable, "-m", "gunicorn", "backend.main:app",
+                   "-c", os.path.join(REPO_ROOT, "backend", "gunicorn_conf.py")]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "backend.main:app", "--host", "127.0.0.1",
+                   "--port", str(port), "--no-access-log"]
+    process = subprocess.Popen(
+        command,
+        cwd=workdir,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=300) as client:
+            def check_process() -> None:
+                if process.poll() is not None:
+                    raise RuntimeError(f"uvicorn exited with status {process.returncode}")
+
+            await _wait_until_ready(client, check_process)
+            yield client
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def environment_info() -> Dict[str, Any]:
+    """Machine and revision details stored with every result"""
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+            capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        revision = None
+    return {
+        "revision": revision,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+
+
+def workload_info(workload: Workload) -> Dict[str, Any]:
+    info = asdict(workload)
+    info["formats"] = list(workload.formats)
+    info["image_shape"] = list(workload.image_shape)
+    return info
+
+
+def compare(
+    results: Dict[str, Any],
+    baseline: Dict[str, Any],
+    threshold: float = 0.2,
+    min_requests: int = 10
+) -> List[str]:
+    """Regressions of ``results`` against ``baseline``, one message each.
+
+    An endpoint regresses when its p95 or p99 latency grows, or its
+    throughput drops, by more than ``threshold`` (a fraction), or when it
+    starts returning errors. Endpoints with fewer than ``min_requests``
+    samples in either run are too noisy to judge and are skipped.
+    """
+    regressions = []
+    for label, current in results["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(label)
+        if previous is None:
+            continue
+        if current["errors"] > previous["errors"]:
+            regressions.append(f"{label}: errors {previous['errors']} -> {current['errors']}")
+        if min(current["requests"], previous["requests"]) < min_requests:
+            continue
+        for stat in ("p95", "p99"):
+            before, after = previous["latency_ms"][stat], current["latency_ms"][stat]
+            if before > 0 and after > before * (1 + threshold):
+                regressions.append(f"{label}: {stat} latency {before:.1f}ms -> {after:.1f}ms (+{after / before - 1:.0%})")
+        before, after = previous["throughput_rps"], current["throughput_rps"]
+        if before > 0 and after < before * (1 - threshold):
+            regressions.append(f"{label}: throughput {before:.1f} -> {after:.1f} req/s ({after / before - 1:.0%})")
+    return regressions
@@ -0,0 +1,199 @@
+"""Classifier throughput per inference backend, precision, thread count and batch size.
+
+    python -m benchmarks.inference --model models/mammography.onnx --quantize --threads 1,4 --output inference.json
+    python -m benchmarks.inference --demo --quantize
+
+Runs the classifiers directly, without the app, on synthetic preprocessed
+arrays (the ``.npy`` inputs inference reads from the preprocess cache).
+``--model`` benchmarks an fp32 ONNX model; ``--demo`` builds a small
+convolutional one instead (needs the ``onnx`` package). ``--quantize``
+adds its int8 copy, statically calibrated on the same arrays, and
+``--mock`` adds the mock backend with its configured delays. Each case
+reports load time, images per second and per-batch latency.
+"""
+import argparse
+import functools
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from benchmarks.harness import percentile
+
+
+def build_demo_model(path: str, side: int = 256, seed: int = 0) -> str:
+    """A small CNN (three strided convolutions, pooling, two classes) with random weights"""
+    import numpy as np
+    import onnx
+    from onnx import TensorProto, helper, numpy_helper
+
+    rng = np.random.default_rng(seed)
+    weights, nodes, previous, channels = [], [], "image", 1
+    for index, width in enumerate((16, 32, 64)):
+        kernel, bias = f"conv{index}_w", f"conv{index}_b"
+        weights.append(numpy_helper.from_array(
+            rng.normal(0, (2.0 / (9 * channels)) ** 0.5, (width, channels, 3, 3)).astype(np.float32), kernel))
+        weights.append(numpy_helper.from_array(np.zeros(width, np.float32), bias))
+        nodes.append(helper.make_node("Conv", [previous, kernel, bias], [f"conv{index}"],
+                                      pads=[1, 1, 1, 1], strides=[2, 2]))
+        nodes.append(helper.make_node("Relu", [f"conv{index}"], [f"relu{index}"]))
+        previous, channels = f"relu{index}", width
+    weights.append(numpy_helper.from_array(rng.normal(0, 0.1, (channels, 2)).astype(np.float32), "fc_w"))
+    weights.append(numpy_helper.from_array(np.zeros(2, np.float32), "fc_b"))
+    nodes += [
+        helper.make_node("GlobalAveragePool", [previous], ["pooled"]),
+        helper.make_node("Flatten", ["pooled"], ["features"]),
+        helper.make_node("Gemm", ["features", "fc_w", "fc_b"], ["logits"]),
+    ]
+    graph = helper.make_graph(
+        nodes, "demo_mammography",
+        [helper.make_tensor_value_info("image", TensorProto.FLOAT, ["batch", 1, side, side])],
+        [helper.make_tensor_value_info("logits", TensorProto.FLOAT, ["batch", 2])],
+        weights,
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    # Readable by older runtimes too
+    model.ir_version = 8
+    onnx.checker.check_model(model)
+    onnx.save(model, path)
+    return path
+
+
+def write_images(directory: str, count: int, shape: Tuple[int, int] = (1024, 820), seed: int = 0) -> List[str]:
+    """Synthetic preprocessed arrays in [0, 1], shaped like a downsampled mammogram"""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    paths = []
+    for index in range(count):
+        path = os.path.join(directory, f"image_{index}.npy")
+        np.save(path, rng.random(shape, dtype=np.float32), allow_pickle=False)
+        paths.append(path)
+    return paths
+
+
+def measure(factory: Callable[[], Any], paths: List[str], batch_sizes: List[int], rounds: int) -> Dict[str, Any]:
+    """Load a classifier, warm it up, then time ``rounds`` passes over the images per batch size"""
+    started = time.perf_counter()
+    classifier = factory()
+    entry: Dict[str, Any] = {"load_seconds": round(time.perf_counter() - started, 3), "batch_sizes": {}}
+    info = classifier.get_model_info()
+    entry["model_version"] = info.get("model_version")
+    entry["precision"] = info.get("precision")
+    classifier.classify_batch(paths[:1])
+
+    for batch_size in batch_sizes:
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(rounds):
+            for start in range(0, len(paths), batch_size):
+                batch_started = time.perf_counter()
+                classifier.classify_batch(paths[start:start + batch_size])
+                latencies.append(time.perf_counter() - batch_started)
+        elapsed = time.perf_counter() - started
+        ordered = sorted(latencies)
+        entry["batch_sizes"][str(batch_size)] = {
+            "images_per_second": round(rounds * len(paths) / elapsed, 2),
+            "latency_ms": {
+                "mean": round(sum(ordered) / len(ordered) * 1000, 3),
+                "p50": round(percentile(ordered, 0.50) * 1000, 3),
+                "p95": round(percentile(ordered, 0.95) * 1000, 3),
+            },
+        }
+    return entry
+
+
+def cases(model_path: Optional[str], int8_path: Optional[str], threads: List[int],
+          mock: bool) -> Dict[str, Callable[[], Any]]:
+    """Named classifier factories to compare"""
+    factories: Dict[str, Callable[[], Any]] = {}
+    if mock:
+        from backend.ai.mock import MockMammographyClassifier
+
+        factories["mock"] = MockMammographyClassifier
+    if model_path or int8_path:
+        from backend.ai.onnx_runtime import OnnxMammographyClassifier
+
+        for precision, path in (("fp32", model_path), ("int8", int8_path)):
+            if not path:
+                continue
+            for count in threads:
+                factories[f"onnx-{precision}-t{count}"] = functools.partial(
+                    OnnxMammographyClassifier, path, intra_op_threads=count)
+    return factories
+
+
+def run(model_path: Optional[str] = None, demo: bool = False, quantize: bool = False, threads: List[int] = None,
+        batch_sizes: List[int] = None, images: int = 16, rounds: int = 2, mock: bool = False) -> Dict[str, Any]:
+    threads = threads or [0]
+    batch_sizes = batch_sizes or [1, 4, 8]
+    model_label = model_path or ("demo" if demo else None)
+    workdir = tempfile.mkdtemp(prefix="inference-bench-")
+    try:
+        image_dir = os.path.join(workdir, "images")
+        os.makedirs(image_dir)
+        paths = write_images(image_dir, images)
+        if demo and not model_path:
+            model_path = build_demo_model(os.path.join(workdir, "demo.onnx"))
+        int8_path = None
+        if quantize and model_path:
+            from backend.ai.onnx_runtime import quantize_model
+
+            int8_path = os.path.join(workdir, "model.int8.onnx")
+            quantize_model(model_path, int8_path, calibration_dir=image_dir)
+
+        results = {name: measure(factory, paths, batch_sizes, rounds)
+                   for name, factory in cases(model_path, int8_path, threads, mock).items()}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        "cases": results,
+        "meta": {"images": images, "rounds": rounds, "batch_sizes": batch_sizes, "threads": threads,
+                 "model": model_label,
+                 "cpu_count": os.cpu_count(), "python": sys.version.split()[0]},
+    }
+
+
+def _print_table(results: Dict[str, Any]) -> None:
+    print(f"{'case':<18} {'load s':>7} {'batch':>6} {'images/s':>9} {'p50 ms':>9} {'p95 ms':>9}")
+    for name, entry in results["cases"].items():
+        for batch_size, stats in entry["batch_sizes"].items():
+            print(f"{name:<18} {entry['load_seconds']:>7.3f} {batch_size:>6} {stats['images_per_second']:>9.1f} "
+                  f"{stats['latency_ms']['p50']:>9.2f} {stats['latency_ms']['p95']:>9.2f}")
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(part) for part in value.split(",") if part.strip()]
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.inference", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", help="fp32 ONNX model to benchmark")
+    parser.add_argument("--demo", action="store_true", help="build a small demo model when --model is not given")
+    parser.add_argument("--quantize", action="store_true", help="also benchmark an int8 copy of the model")
+    parser.add_argument("--mock", action="store_true", help="also benchmark the mock backend")
+    parser.add_argument("--threads", type=_int_list, default=[0], help="intra-op thread counts, 0 = all cores")
+    parser.add_argument("--batch-sizes", type=_int_list, default=[1, 4, 8])
+    parser.add_argument("--images", type=int, default=16, help="synthetic images per pass")
+    parser.add_argument("--rounds", type=int, default=2, help="passes over the images per batch size")
+    parser.add_argument("--output", help="write results JSON here")
+    args = parser.parse_args(argv)
+    if not (args.model or args.demo or args.mock):
+        parser.error("give --model, --demo or --mock")
+
+    results = run(args.model, args.demo, args.quantize, args.threads, args.batch_sizes,
+                  args.images, args.rounds, args.mock)
+    _print_table(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+import io
+import os
+import struct
+import uuid
+import zlib
+from typing import Tuple
+
+import numpy as np
+
+# Full-field digital mammograms are typically ~3328x4096 at 12-16 bits;
+# the default is scaled down to keep runs short while staying multi-megabyte
+DEFAULT_IMAGE_SHAPE = (2048, 1664)
+
+
+def synthetic_pixels(shape: Tuple[int, int] = DEFAULT_IMAGE_SHAPE, seed: int = 0) -> np.ndarray:
+    """16-bit breast-like image: a bright elliptical region over dark background, plus noise"""
+    rng = np.random.default_rng(seed)
+    height, width = shape
+    y, x = np.ogrid[:height, :width]
+    tissue = ((x / (width * 0.9)) ** 2 + ((y - height / 2) / (height * 0.45)) ** 2) < 1
+    pixels = np.where(tissue, 2800, 150).astype(np.float32)
+    pixels += rng.normal(0, 120, size=shape).astype(np.float32)
+    return np.clip(pixels, 0, 4095).astype(np.uint16)
+
+
+def png_bytes(pixels: np.ndarray) -> bytes:
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="PNG", compress_level=1)
+    return buffer.getvalue()
+
+
+def dicom_bytes(pixels: np.ndarray) -> bytes:
+    """Uncompressed MONOCHROME2 DICOM with a window centre/width"""
+    from pydicom.dataset import FileDataset, FileMetaDataset
+    from pydicom.uid import ExplicitVRLittleEndian, generate_uid
+
+    meta = FileMetaDataset()
+    meta.MediaStorageSOPClassUID = "1.2.840.10008.5.1.4.1.1.1.2"  # Digital Mammography X-Ray Image
+    meta.MediaStorageSOPInstanceUID = generate_uid()
+    meta.TransferSyntaxUID = ExplicitVRLittleEndian
+
+    dataset = FileDataset(None, {}, file_meta=meta, preamble=b"\0" * 128)
+    dataset.SOPClassUID = meta.MediaStorageSOPClassUID
+    dataset.SOPInstanceUID = meta.MediaStorageSOPInstanceUID
+    dataset.Modality = "MG"
+    dataset.PatientID = "BENCHMARK"
+    dataset.Rows, dataset.Columns = pixels.shape
+    dataset.SamplesPerPixel = 1
+    dataset.PhotometricInterpretation = "MONOCHROME2"
+    dataset.BitsAllocated = 16
+    dataset.BitsStored = 12
+    dataset.HighBit = 11
+    dataset.PixelRepresentation = 0
+    dataset.WindowCenter = 2048
+    dataset.WindowWidth = 4096
+    dataset.PixelData = pixels.tobytes()
+
+    buffer = io.BytesIO()
+    try:
+        dataset.save_as(buffer, enforce_file_format=True)
+    except TypeError:  # pydicom < 3
+        dataset.is_little_endian = True
+        dataset.is_implicit_VR = False
+        dataset.save_as(buffer, write_like_original=False)
+    return buffer.getvalue()
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+
+def make_unique(payload: bytes, filename: str) -> bytes:
+    """Same image, different bytes: defeats content-hash dedup so every upload is stored.
+
+    PNGs get a text chunk before IEND; for DICOM the last few pixels (pixel
+    data is the final element) are overwritten with random 12-bit values.
+    """
+    if filename.endswith(".png"):
+        marker = uuid.uuid4().hex.encode()
+        return payload[:-12] + _png_chunk(b"tEXt", b"benchmark\0" + marker) + payload[-12:]
+    tail = (np.frombuffer(os.urandom(16), dtype="<u2") & 0x0FFF).astype("<u2").tobytes()
+    return payload[:-len(tail)] + tail
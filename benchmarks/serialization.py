@@ -0,0 +1,203 @@
+"""CPU time per response spent turning results into bytes.
+
+    python -m benchmarks.serialization --regions 8 --output serialization.json
+
+Compares, for representative payloads, the serialization path the API used
+before (stdlib json, with FastAPI's jsonable_encoder for dict endpoints and
+an isoformat pass over listing rows) against the current one (orjson
+straight from the row values, pydantic-core response models for dict
+endpoints), and the extra CPU of gzip/brotli at the levels the compression
+middleware uses. Runs without the app; no database or model needed.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from backend.api.compression import COMPRESSION_BROTLI_QUALITY, COMPRESSION_GZIP_LEVEL, brotli, compress
+from backend.api.responses import dumps
+from backend.api.schemas import StudyTimeline
+from backend.storage.database import STUDY_LIST_COLUMNS
+
+
+def _stdlib_dumps(payload: Any) -> bytes:
+    # What conditional_json did before
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _region(rng: random.Random, index: int) -> Dict[str, Any]:
+    return {
+        "id": f"region_{index + 1}",
+        "x": float(rng.randint(50, 2000)),
+        "y": float(rng.randint(50, 2000)),
+        "width": float(rng.randint(20, 300)),
+        "height": float(rng.randint(20, 300)),
+        "confidence": round(rng.uniform(0.6, 0.95), 3),
+        "type": rng.choice(["mass", "calcification", "architectural_distortion", "asymmetry"]),
+        "severity": rng.choice(["low", "moderate", "high"]),
+        "description": "Simulated region of interest",
+    }
+
+
+def _listing_row(rng: random.Random, created: datetime) -> tuple:
+    """A row as list_studies selects it: the listed columns, then id and the key"""
+    values = {
+        "study_id": f"{rng.getrandbits(128):032x}",
+        "filename": f"scan_{rng.randint(0, 10 ** 6)}.dcm",
+        "content_type": "application/dicom",
+        "file_size": rng.randint(10 ** 6, 10 ** 7),
+        "prediction": rng.choice(["normal", "suspicious", None]),
+        "confidence": round(rng.uniform(0.6, 0.95), 3),
+        "model_version": "1.0.0-mock",
+        "image_quality": rng.choice(["good", "fair"]),
+        "processing_date": created,
+        "created_at": created,
+        "updated_at": created,
+    }
+    return tuple(values[name] for name in STUDY_LIST_COLUMNS) + (rng.randint(1, 10 ** 6), str(created))
+
+
+def build_payloads(regions: int, seed: int = 7) -> Dict[str, Dict[str, Callable[[], bytes]]]:
+    """Before/after serializers per response shape"""
+    rng = random.Random(seed)
+    now = datetime(2024, 5, 1, 9, 30)
+
+    study = {
+        "id": 1, "study_id": f"{rng.getrandbits(128):032x}", "filename": "scan.dcm",
+        "file_path": "uploads/ab/cd/abcd.dcm", "content_type": "application/dicom", "file_size": 6_000_000,
+        "content_hash": f"{rng.getrandbits(256):064x}", "recompressed_at": None, "prediction": "suspicious",
+        "confidence": 0.87, "processing_time": 0.41, "regions": [_region(rng, i) for i in range(regions)],
+        "model_version": "1.0.0-mock", "image_quality": "good", "processing_date": now.isoformat(),
+        "created_at": now.isoformat(), "updated_at": now.isoformat(),
+    }
+
+    def listing(size: int):
+        rows = [_listing_row(rng, now - timedelta(seconds=i)) for i in range(size)]
+
+        def before() -> bytes:
+            items = []
+            for row in rows:
+                item = dict(zip(STUDY_LIST_COLUMNS, row))
+                for name in ("processing_date", "created_at", "updated_at"):
+                    if item[name] is not None:
+                        item[name] = item[name].isoformat()
+                items.append(item)
+            return _stdlib_dumps({"items": items, "count": size, "limit": size, "next_cursor": None})
+
+        def after() -> bytes:
+            items = [dict(zip(STUDY_LIST_COLUMNS, row)) for row in rows]
+            return dumps({"items": items, "count": size, "limit": size, "next_cursor": None})
+
+        return {"before": before, "after": after}
+
+    region_page = {
+        "items": [
+            {"study_id": f"{rng.getrandbits(128):032x}", "area": 900.0, **_region(rng, i % 3)} for i in range(500)
+        ],
+        "count": 500, "limit": 500, "next_cursor": "WzAuNzEsIDEyMzRd",
+    }
+
+    events = [
+        {"id": i, "study_id": study["study_id"], "level": "INFO", "message": stage, "stage": stage,
+         "duration_ms": round(rng.uniform(0.1, 50), 3), "details": {"bytes": 6_000_000},
+         "timestamp": (now + timedelta(milliseconds=10 * i)).isoformat()}
+        for i, stage in enumerate(["upload_received", "file_written", "db_saved", "preprocess", "classify",
+                                   "result_committed"] * 4)
+    ]
+    timeline = {"study_id": study["study_id"], "events": events, "count": len(events),
+                "total_ms": 250.0, "stages": {"classify": 40.0}}
+    timeline_model = TypeAdapter(StudyTimeline)
+
+    return {
+        "study": {"before": lambda: _stdlib_dumps(study), "after": lambda: dumps(study)},
+        "studies_page_50": listing(50),
+        "studies_page_500": listing(500),
+        "regions_page_500": {"before": lambda: _stdlib_dumps(region_page), "after": lambda: dumps(region_page)},
+        # Dict endpoint: FastAPI's default encoder path against a typed response model and orjson
+        "timeline": {
+            "before": lambda: _stdlib_dumps(jsonable_encoder(timeline)),
+            "after": lambda: dumps(timeline_model.dump_python(timeline_model.validate_python(timeline), mode="json")),
+        },
+    }
+
+
+def _cpu_us(function: Callable[[], Any], min_seconds: float) -> float:
+    """Mean process CPU time per call in microseconds"""
+    function()
+    calls, started = 0, time.process_time()
+    while True:
+        function()
+        calls += 1
+        elapsed = time.process_time() - started
+        if elapsed >= min_seconds:
+            return elapsed / calls * 1e6
+
+
+def run(regions: int, min_seconds: float) -> Dict[str, Any]:
+    encodings = ["gzip"] + (["br"] if brotli is not None else [])
+    results: Dict[str, Any] = {}
+    for name, serializers in build_payloads(regions).items():
+        body = serializers["after"]()
+        assert json.loads(body) == json.loads(serializers["before"]()), name
+        entry = {
+            "bytes": len(body),
+            "before_us": _cpu_us(serializers["before"], min_seconds),
+            "after_us": _cpu_us(serializers["after"], min_seconds),
+            "compression": {},
+        }
+        entry["speedup"] = entry["before_us"] / entry["after_us"]
+        for encoding in encodings:
+            compressed = compress(body, encoding)
+            entry["compression"][encoding] = {
+                "bytes": len(compressed),
+                "ratio": len(body) / len(compressed),
+                "cpu_us": _cpu_us(lambda: compress(body, encoding), min_seconds),
+            }
+        results[name] = entry
+    return {
+        "payloads": results,
+        "meta": {"regions": regions, "gzip_level": COMPRESSION_GZIP_LEVEL,
+                 "brotli_quality": COMPRESSION_BROTLI_QUALITY, "python": sys.version.split()[0]},
+    }
+
+
+def _print_table(results: Dict[str, Any]) -> None:
+    encodings = sorted({encoding for entry in results["payloads"].values() for encoding in entry["compression"]})
+    header = f"{'payload':<20} {'bytes':>8} {'before us':>10} {'after us':>9} {'speedup':>8}"
+    for encoding in encodings:
+        header += f" {encoding + ' us':>9} {encoding + ' ratio':>9}"
+    print(header)
+    for name, entry in results["payloads"].items():
+        line = (f"{name:<20} {entry['bytes']:>8} {entry['before_us']:>10.1f} {entry['after_us']:>9.1f} "
+                f"{entry['speedup']:>7.1f}x")
+        for encoding in encodings:
+            stats = entry["compression"][encoding]
+            line += f" {stats['cpu_us']:>9.1f} {stats['ratio']:>8.1f}x"
+        print(line)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.serialization", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--regions", type=int, default=8, help="regions on the single-study payload")
+    parser.add_argument("--min-seconds", type=float, default=0.5, help="CPU time spent measuring each case")
+    parser.add_argument("--output", help="write results JSON here")
+    args = parser.parse_args(argv)
+
+    results = run(args.regions, args.min_seconds)
+    _print_table(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
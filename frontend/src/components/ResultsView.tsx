@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import { analyzeImage, getAnalysisResult } from '../services/api';
+import { analyzeImage, getAnalysisResult, getThumbnailUrl } from '../services/api';
 import { AnalysisResult } from '../types';
 
 interface ResultsViewProps {
@@ -174,6 +174,12 @@ export const ResultsView: React.FC<ResultsViewProps> = ({
     <div className="space-y-6">
       {/* Main Result */}
       <div className="bg-gray-50 rounded-lg p-6">
+        <img
+          src={getThumbnailUrl(studyId, 512)}
+          alt="Mammogram preview"
+          className="mx-auto mb-4 max-h-64 rounded"
+          loading="lazy"
+        />
         <div className="flex items-center justify-between mb-4">
           <h3 className="text-lg font-semibold text-gray-900">AI Analysis Result</h3>
           <div className={`flex items-center space-x-2 ${getPredictionColor(result.prediction)}`}>
@@ -2,7 +2,9 @@ import axios from 'axios';
 import { 
   UploadResponse, 
   AnalysisResponse, 
+  AnalysisJob,
   HealthResponse, 
+  StudyPage,
   ModelInfo 
 } from '../types';
 
@@ -46,12 +48,64 @@ export const getUploadStatus = async (studyId: string): Promise<UploadResponse>
   return response.data;
 };
 
+// Study listing; pass the previous page's next_cursor to continue
+export const listStudies = async (params: {
+  limit?: number;
+  cursor?: string;
+  prediction?: string;
+  min_confidence?: number;
+  max_confidence?: number;
+  created_after?: string;
+  created_before?: string;
+} = {}): Promise<StudyPage> => {
+  const response = await api.get('/studies', { params });
+  return response.data;
+};
+
+// Derived images (browser-renderable even for DICOM uploads)
+export const getThumbnailUrl = (studyId: string, size: 128 | 256 | 512 = 256): string =>
+  `${API_BASE_URL}/images/${studyId}/thumbnail?size=${size}`;
+
+export const getPyramidUrl = (studyId: string): string =>
+  `${API_BASE_URL}/images/${studyId}/pyramid.dzi`;
+
 // Analysis
 export const analyzeImage = async (studyId: string): Promise<AnalysisResponse> => {
-  const response = await api.post(`/inference/${studyId}`);
-  return response.data;
+  // Run as a background job so long analyses are not cut off by the request timeout
+  const response = await api.post(`/inference/${studyId}`, null, {
+    params: { background: true },
+  });
+
+  if (response.status !== 202) {
+    return response.data;
+  }
+
+  return waitForJob(response.data);
 };
 
+// Follow a background analysis job over Server-Sent Events until it finishes
+export const waitForJob = (job: AnalysisJob): Promise<AnalysisResponse> =>
+  new Promise((resolve, reject) => {
+    const source = new EventSource(`${API_BASE_URL}/inference/jobs/${job.job_id}/events`);
+
+    source.addEventListener('completed', (event) => {
+      source.close();
+      const data: AnalysisJob = JSON.parse((event as MessageEvent).data);
+      resolve(data.result as AnalysisResponse);
+    });
+
+    source.addEventListener('failed', (event) => {
+      source.close();
+      const data: AnalysisJob = JSON.parse((event as MessageEvent).data);
+      reject(new Error(data.error || 'Analysis failed'));
+    });
+
+    source.onerror = () => {
+      source.close();
+      reject(new Error('Lost connection while waiting for analysis results.'));
+    };
+  });
+
 export const getAnalysisResult = async (studyId: string): Promise<AnalysisResponse> => {
   const response = await api.get(`/inference/${studyId}`);
   return response.data;
@@ -62,10 +116,33 @@ export const getModelInfo = async (): Promise<{ model_info: ModelInfo; status: s
   return response.data;
 };
 
+// Overload handling: the server sheds with 429/503 and says when to come back
+const MAX_RETRIES = 3;
+const MAX_RETRY_DELAY_MS = 30000;
+
+const retryDelayMs = (retryAfter: string | undefined, attempt: number): number => {
+  const seconds = Number(retryAfter);
+  const delay = Number.isFinite(seconds) && seconds > 0 ? seconds * 1000 : 1000 * 2 ** attempt;
+  // Jitter so clients shed together do not all come back at once
+  return Math.min(delay, MAX_RETRY_DELAY_MS) * (1 + Math.random() * 0.2);
+};
+
 // Error handling
 api.interceptors.response.use(
   (response) => response,
-  (error) => {
+  async (error) => {
+    const config = error.config;
+    const status = error.response?.status;
+    if (config && (status === 429 || status === 503)) {
+      const attempt = config.__retryCount || 0;
+      if (attempt < MAX_RETRIES) {
+        config.__retryCount = attempt + 1;
+        const delay = retryDelayMs(error.response.headers?.['retry-after'], attempt);
+        await new Promise((resolve) => setTimeout(resolve, delay));
+        return api(config);
+      }
+    }
+
     console.error('API Error:', error);
     
     if (error.response) {
@@ -15,6 +15,27 @@ export interface Study {
   created_at?: string;
 }
 
+export interface StudySummary {
+  study_id: string;
+  filename: string;
+  content_type: string;
+  file_size: number;
+  prediction?: string | null;
+  confidence?: number | null;
+  model_version?: string | null;
+  image_quality?: string | null;
+  processing_date?: string | null;
+  created_at?: string | null;
+  updated_at?: string | null;
+}
+
+export interface StudyPage {
+  items: StudySummary[];
+  count: number;
+  limit: number;
+  next_cursor: string | null;
+}
+
 export interface Region {
   id: string;
   x: number;
@@ -63,6 +84,16 @@ export interface AnalysisResponse {
   message?: string;
 }
 
+export interface AnalysisJob {
+  job_id: string;
+  study_id: string;
+  status: 'queued' | 'running' | 'completed' | 'failed';
+  result?: AnalysisResponse;
+  error?: string;
+  status_url?: string;
+  events_url?: string;
+}
+
 export interface ModelInfo {
   model_version: string;
   model_type: string;
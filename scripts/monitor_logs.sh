@@ -112,10 +112,8 @@ colorize_log() {
         echo -e "${GREEN}$line${NC}"
     elif echo "$line" | grep -q "DEBUG"; then
         echo -e "${BLUE}$line${NC}"
-    elif echo "$line" | grep -q "Request:"; then
+    elif echo "$line" | grep -qE " -> [0-9]{3} in "; then
         echo -e "${CYAN}$line${NC}"
-    elif echo "$line" | grep -q "Response:"; then
-        echo -e "${PURPLE}$line${NC}"
     else
         echo "$line"
     fi